@@ -0,0 +1,595 @@
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import torch
+from ctgan import CTGAN
+from ctgan.data_sampler import DataSampler
+from ctgan.data_transformer import ColumnTransformInfo, DataTransformer, SpanInfo
+from ctgan.synthesizers.base import random_state
+from ctgan.synthesizers.ctgan import Discriminator, Generator
+from rdt.transformers import OneHotEncoder
+
+from encoded_store import EncodedStore
+
+logger = logging.getLogger(__name__)
+
+# Rows per epoch are split into roughly this many batches; batch sizes stay a multiple of pac
+TARGET_BATCHES_PER_EPOCH = 20
+MIN_BATCH_SIZE = 100
+MAX_BATCH_SIZE = 5000
+PAC = 10
+# Lowest conditional-vector probability of a known category after fine-tuning
+MIN_CATEGORY_PROB = 1e-6
+
+STOP_CONVERGED = "converged"
+STOP_TIME_BUDGET = "time_budget"
+STOP_MAX_EPOCHS = "max_epochs"
+
+
+def scaled_batch_size(num_rows: int) -> int:
+    """Batch size proportional to the row count, clipped and rounded down to a multiple of ``PAC``."""
+    batch_size = num_rows // TARGET_BATCHES_PER_EPOCH
+    batch_size = min(max(batch_size, MIN_BATCH_SIZE), MAX_BATCH_SIZE)
+    return batch_size - batch_size % PAC
+
+
+class _StopTraining(Exception):
+    pass
+
+
+def _dummy_key(value):
+    # NaN != NaN, so missing-value dummies are looked up under one shared key
+    return "__nan__" if isinstance(value, float) and np.isnan(value) else value
+
+
+def _widen_linear(layer: torch.nn.Linear, in_map: List[int], in_features: int, out_map: Optional[List[int]] = None, out_features: Optional[int] = None) -> torch.nn.Linear:
+    """Copy ``layer`` into a wider one; old input ``i`` lands at ``in_map[i]``, old output ``j`` at ``out_map[j]``.
+
+    Weights from new inputs start at zero, so the layer computes the same outputs for old
+    inputs. New outputs get zero weights and the lowest old bias, so new categories start
+    out rare and fine-tuning raises them to their frequency.
+    """
+    out_features = out_features or layer.out_features
+    out_index = torch.as_tensor(out_map if out_map is not None else range(layer.out_features), device=layer.weight.device)
+    in_index = torch.as_tensor(in_map, device=layer.weight.device)
+    wider = torch.nn.Linear(in_features, out_features).to(layer.weight.device)
+    with torch.no_grad():
+        wider.weight.zero_()
+        wider.weight[out_index[:, None], in_index[None, :]] = layer.weight
+        wider.bias.fill_(float(layer.bias.min()))
+        wider.bias[out_index] = layer.bias
+    return wider
+
+
+class StoreDataSampler(DataSampler):
+    """``DataSampler`` that draws training rows from an ``EncodedStore``.
+
+    The upstream sampler needs the whole one-hot training matrix in memory plus a row-id
+    array per category. Here category frequencies come from the store's code counts,
+    rows per category from its on-disk ``rows_by_code`` index, and each minibatch is
+    one-hot encoded from the codes of just its rows.
+    """
+
+    def __init__(self, store: EncodedStore, transformer: DataTransformer, log_frequency: bool):
+        infos = transformer._column_transform_info_list
+        self._store = store
+        self._data_length = len(store)
+        self._n_discrete_columns = len(infos)
+        self._n_categories = sum(info.output_dimensions for info in infos)
+        self._data_dim = transformer.output_dimensions
+        # As upstream, where this is allocated but never filled in
+        self._discrete_column_matrix_st = np.zeros(len(infos), dtype='int32')
+        self._discrete_column_cond_st = np.zeros(len(infos), dtype='int32')
+        self._discrete_column_n_category = np.zeros(len(infos), dtype='int32')
+        self._discrete_column_category_prob = np.zeros((len(infos), max((i.output_dimensions for i in infos), default=0)))
+        # Per column: one-hot position of each store code, and store code of each position
+        self._positions = []
+        self._codes_at = []
+        self._rows_by_code = []
+        start = 0
+        for index, info in enumerate(infos):
+            col = info.column_name
+            slots = {_dummy_key(v): i for i, v in enumerate(info.transform.dummies)}
+            positions = np.array([slots[_dummy_key(v)] for v in store.categories[col]], dtype=np.int64)
+            codes_at = np.full(info.output_dimensions, -1, dtype=np.int64)
+            codes_at[positions] = np.arange(len(positions))
+            category_freq = np.zeros(info.output_dimensions)
+            category_freq[positions] = store.category_counts(col)
+            if log_frequency:
+                category_freq = np.log(category_freq + 1)
+            self._discrete_column_category_prob[index, :info.output_dimensions] = category_freq / np.sum(category_freq)
+            self._discrete_column_cond_st[index] = start
+            self._discrete_column_n_category[index] = info.output_dimensions
+            self._positions.append(positions)
+            self._codes_at.append(codes_at)
+            self._rows_by_code.append(store.rows_by_code(col))
+            start += info.output_dimensions
+
+    def __getstate__(self) -> Dict:
+        # Sampling from a trained model only needs the category probabilities
+        state = dict(self.__dict__)
+        state.update({"_store": None, "_rows_by_code": None})
+        return state
+
+    def sample_data(self, data, n, col, opt):
+        """One-hot rows from the store, matching the sampled conditions like the upstream sampler."""
+        if col is None:
+            rows = np.random.randint(self._data_length, size=n)
+        else:
+            rows = np.empty(n, dtype=np.int64)
+            for c in np.unique(col):
+                picked = np.flatnonzero(col == c)
+                order, offsets = self._rows_by_code[c]
+                codes = self._codes_at[c][opt[picked]]
+                starts, counts = offsets[codes], offsets[codes + 1] - offsets[codes]
+                rows[picked] = order[starts + (np.random.rand(len(picked)) * counts).astype(np.int64)]
+        codes = self._store.take(rows)
+        batch = np.zeros((n, self._data_dim), dtype='float32')
+        for index, positions in enumerate(self._positions):
+            batch[np.arange(n), self._discrete_column_cond_st[index] + positions[codes[:, index]]] = 1
+        return batch
+
+
+class WeightedRows:
+    """Distinct rows of a categorical frame and how often each one occurs.
+
+    All-categorical uploads repeat the same combinations many times over. Training on the
+    distinct rows with their counts as sampling weights draws minibatches from the same
+    distribution as the raw rows, while only the distinct rows are one-hot encoded.
+    ``len`` is the number of distinct rows; ``num_rows`` is the raw row count, which
+    still sets the batch size and the gradient steps per epoch.
+    """
+
+    def __init__(self, frame: pd.DataFrame, counts: np.ndarray):
+        self.frame = frame
+        self.counts = counts
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, columns: List[str]) -> "WeightedRows":
+        sizes = data.groupby(list(columns), observed=True, sort=False, dropna=False).size()
+        frame = sizes.index.to_frame(index=False)
+        frame.columns = list(columns)
+        return cls(frame, sizes.to_numpy(dtype=np.int64))
+
+    @property
+    def columns(self) -> pd.Index:
+        return self.frame.columns
+
+    @property
+    def num_rows(self) -> int:
+        return int(self.counts.sum())
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+
+class WeightedDataSampler(DataSampler):
+    """``DataSampler`` over the distinct rows of ``WeightedRows``, drawing each in proportion to its count.
+
+    Category frequencies for the conditional vector are weighted the same way, so
+    training sees exactly the conditions and rows the raw frame would give it. Rows of
+    each category are kept in one order per column with their cumulative counts, so a
+    batch is drawn with one ``searchsorted`` per column instead of one choice per row.
+    """
+
+    def __init__(self, data: np.ndarray, output_info, log_frequency: bool, counts: np.ndarray):
+        super().__init__(data, output_info, log_frequency)
+        self._rid_by_cat_cols = None
+        self._cumulative = np.cumsum(counts, dtype=np.float64)
+        # Per discrete column: rows ordered by category, their cumulative counts, and category offsets
+        self._rows_by_cat = []
+        column = start = 0
+        for column_info in output_info:
+            width = sum(span_info.dim for span_info in column_info)
+            if len(column_info) == 1 and column_info[0].activation_fn == 'softmax':
+                categories = data[:, start:start + width].argmax(axis=1)
+                category_freq = np.bincount(categories, weights=counts, minlength=width)
+                if log_frequency:
+                    category_freq = np.log(category_freq + 1)
+                self._discrete_column_category_prob[column, :width] = category_freq / np.sum(category_freq)
+                order = np.argsort(categories, kind='stable')
+                offsets = np.searchsorted(categories[order], np.arange(width + 1))
+                cumulative = np.concatenate([[0.0], np.cumsum(counts[order], dtype=np.float64)])
+                self._rows_by_cat.append((order, offsets, cumulative))
+                column += 1
+            start += width
+
+    def __getstate__(self) -> Dict:
+        # Sampling from a trained model only needs the category probabilities
+        state = dict(self.__dict__)
+        state.update({"_cumulative": None, "_rows_by_cat": None})
+        return state
+
+    def sample_data(self, data, n, col, opt):
+        """``n`` rows drawn by count, restricted to the sampled category of each row's column when given."""
+        if col is None:
+            rows = np.searchsorted(self._cumulative, np.random.rand(n) * self._cumulative[-1], side='right')
+            return data[rows]
+        rows = np.empty(n, dtype=np.int64)
+        for c in np.unique(col):
+            picked = np.flatnonzero(col == c)
+            order, offsets, cumulative = self._rows_by_cat[c]
+            low = cumulative[offsets[opt[picked]]]
+            high = cumulative[offsets[opt[picked] + 1]]
+            targets = low + np.random.rand(len(picked)) * (high - low)
+            rows[picked] = order[np.searchsorted(cumulative, targets, side='right') - 1]
+        return data[rows]
+
+
+def _vocabulary_sample(train_data):
+    # Encoders only need each category once
+    if isinstance(train_data, EncodedStore):
+        return train_data.vocabulary_frame()
+    if isinstance(train_data, WeightedRows):
+        return train_data.frame
+    return train_data
+
+
+class AdaptiveCTGAN(CTGAN):
+    """CTGAN that stops once its losses plateau or a wall-clock budget runs out.
+
+    ``fit`` builds the transformer and networks like ``CTGAN.fit`` but keeps the
+    discriminator, so ``fine_tune`` can later extend the vocabulary and continue from the
+    same weights. Both train with ``_train``, a copy of CTGAN's training loop that runs on
+    a data sampler chosen from the input: ``StoreDataSampler`` draws minibatches from an
+    ``EncodedStore`` instead of one transformed matrix, and only the distinct rows of
+    ``WeightedRows`` are transformed, which ``WeightedDataSampler`` draws by count.
+    The loop assigns ``loss_values`` once per epoch, and the property setter passes that
+    epoch's losses and an ETA to ``progress_callback``. It then compares the mean
+    generator and discriminator losses of the last ``patience`` epochs with the window
+    before, and ends training when both moved less than ``tolerance`` (relative) or
+    ``max_train_seconds`` has elapsed. The networks are already usable at that point.
+    """
+
+    def __init__(
+        self,
+        max_train_seconds: Optional[float] = None,
+        patience: int = 10,
+        tolerance: float = 0.02,
+        min_epochs: int = 20,
+        progress_callback: Optional[Callable[[Dict], None]] = None,
+        **kwargs
+    ):
+        # Set before CTGAN.__init__, which assigns loss_values through the property below
+        self._started_at = None
+        self._loss_values = None
+        self._discriminator = None
+        self._run_epochs = None
+        super().__init__(**kwargs)
+        self.max_train_seconds = max_train_seconds
+        self.patience = patience
+        self.tolerance = tolerance
+        self.min_epochs = min_epochs
+        self.progress_callback = progress_callback
+        self.training_summary: Dict = {}
+        self.new_categories: Dict[str, List[str]] = {}
+
+    def __getstate__(self) -> Dict:
+        # The callback belongs to one run; cached and shipped models go without it
+        state = dict(super().__getstate__())
+        state["progress_callback"] = None
+        return state
+
+    @property
+    def loss_values(self) -> pd.DataFrame:
+        return self._loss_values
+
+    @loss_values.setter
+    def loss_values(self, value: pd.DataFrame) -> None:
+        self._loss_values = value
+        if self._started_at is None or value is None or value.empty:
+            return
+        if self.progress_callback is not None:
+            self.progress_callback(self._epoch_progress())
+        reason = self._stop_reason()
+        if reason is not None:
+            raise _StopTraining(reason)
+
+    def _epoch_progress(self) -> Dict:
+        epoch = len(self._loss_values)
+        elapsed = time.monotonic() - self._started_at
+        eta = elapsed / epoch * max(self._run_epochs - epoch, 0)
+        if self.max_train_seconds is not None:
+            eta = min(eta, max(self.max_train_seconds - elapsed, 0.0))
+        last = self._loss_values.iloc[-1]
+        return {
+            "epoch": epoch,
+            "max_epochs": self._run_epochs,
+            "generator_loss": float(last['Generator Loss']),
+            "discriminator_loss": float(last['Discriminator Loss']),
+            "elapsed_seconds": round(elapsed, 2),
+            "eta_seconds": round(eta, 2)
+        }
+
+    def _stop_reason(self) -> Optional[str]:
+        if self.max_train_seconds is not None and time.monotonic() - self._started_at >= self.max_train_seconds:
+            return STOP_TIME_BUDGET
+
+        epochs_run = len(self._loss_values)
+        if epochs_run < max(self.min_epochs, 2 * self.patience):
+            return None
+        losses = self._loss_values[['Generator Loss', 'Discriminator Loss']].to_numpy(dtype=float)
+        recent = losses[-self.patience:].mean(axis=0)
+        previous = losses[-2 * self.patience:-self.patience].mean(axis=0)
+        change = np.abs(recent - previous) / np.maximum(np.abs(previous), 1e-8)
+        if np.all(change < self.tolerance):
+            return STOP_CONVERGED
+        return None
+
+    @random_state
+    def fit(self, train_data, discrete_columns=(), epochs=None):
+        """Fit from scratch. Unlike ``CTGAN.fit`` the discriminator is kept, for ``fine_tune``."""
+        sample = _vocabulary_sample(train_data)
+        self._validate_discrete_columns(sample, discrete_columns)
+        self._validate_null_data(sample, discrete_columns)
+        self._transformer = DataTransformer()
+        self._transformer.fit(sample, discrete_columns)
+        data_dim = self._transformer.output_dimensions
+        cond_dim = self._cond_dimensions()
+        self._generator = Generator(self._embedding_dim + cond_dim, self._generator_dim, data_dim).to(self._device)
+        self._discriminator = Discriminator(data_dim + cond_dim, self._discriminator_dim, pac=self.pac).to(self._device)
+        self.new_categories = {}
+        return self._run_training(train_data, epochs or self._epochs, warm_start=False)
+
+    @random_state
+    def fine_tune(self, train_data, epochs: int, discrete_columns=()) -> "AdaptiveCTGAN":
+        """Continue training from the current weights on new or changed rows.
+
+        Categories the encoders have not seen are appended to them and the networks are
+        widened to match (see ``_extend_vocabulary``), so a refresh never starts over.
+        The batch size is rescaled to the new row count.
+        """
+        if self._discriminator is None:
+            raise ValueError("This model was saved without its discriminator and cannot be fine-tuned")
+        sample = _vocabulary_sample(train_data)
+        self._validate_discrete_columns(sample, discrete_columns)
+        self._validate_null_data(sample, discrete_columns)
+        prior = self._category_prior()
+        self.new_categories = self._extend_vocabulary(sample)
+        self._batch_size = scaled_batch_size(train_data.num_rows if isinstance(train_data, WeightedRows) else len(train_data))
+        return self._run_training(train_data, epochs, warm_start=True, prior=prior)
+
+    def _cond_dimensions(self) -> int:
+        return sum(
+            info.output_dimensions for info in self._transformer._column_transform_info_list
+            if info.column_type == 'discrete'
+        )
+
+    def _category_prior(self) -> Dict[str, Dict]:
+        """Conditional-vector probability of every known category, by column and value."""
+        probs = self._data_sampler._discrete_column_category_prob
+        discrete = [info for info in self._transformer._column_transform_info_list if info.column_type == 'discrete']
+        return {
+            info.column_name: {_dummy_key(v): float(p) for v, p in zip(info.transform.dummies, probs[index])}
+            for index, info in enumerate(discrete)
+        }
+
+    def _merge_category_prior(self, prior: Dict[str, Dict]) -> None:
+        """Blend the saved category probabilities into the ones of the refresh rows.
+
+        ``DataSampler.sample_original_condvec`` flattens the probability matrix and drops
+        its zeros before drawing a one-hot slot, so a category missing from the refresh
+        would shift every later slot by one. Each column's probabilities become the mean
+        of the saved and the refresh ones, floored at ``MIN_CATEGORY_PROB``; a column
+        without refresh frequencies keeps the saved ones. Training has already drawn its
+        conditions from the refresh rows alone, since only those can be matched to data.
+        """
+        probs = self._data_sampler._discrete_column_category_prob
+        discrete = [info for info in self._transformer._column_transform_info_list if info.column_type == 'discrete']
+        for index, info in enumerate(discrete):
+            width = info.output_dimensions
+            refresh = np.nan_to_num(probs[index, :width])
+            known = prior.get(info.column_name, {})
+            saved = np.array([known.get(_dummy_key(v), 0.0) for v in info.transform.dummies])
+            merged = np.maximum(refresh + saved, MIN_CATEGORY_PROB)
+            probs[index, :width] = merged / merged.sum()
+
+    def _widen_raw_dtype(self, col: str, dummies: List) -> None:
+        """Add a column's new categories to the dtype ``inverse_transform`` casts sampled values to.
+
+        ``DataTransformer.fit`` records ``category`` columns with their categories at the
+        time; left as is, every value first seen while fine-tuning would come back as NaN.
+        """
+        raw_dtypes = self._transformer._column_raw_dtypes
+        dtype = raw_dtypes[col]
+        if not isinstance(dtype, pd.CategoricalDtype):
+            return
+        known = set(dtype.categories)
+        added = [v for v in dummies if not pd.isna(v) and v not in known]
+        raw_dtypes[col] = pd.CategoricalDtype(list(dtype.categories) + added, ordered=dtype.ordered)
+
+    def _extend_vocabulary(self, train_data: pd.DataFrame) -> Dict[str, List[str]]:
+        """Append unseen categories to the one-hot encoders and widen both networks.
+
+        Each widened layer copies its old weights to the new positions of the old
+        one-hot and conditional-vector dimensions (see ``_widen_linear``). Returns the new
+        categories per column.
+        """
+        infos = []
+        new_categories = {}
+        data_map, cond_map = [], []
+        data_pos = cond_pos = 0
+        for info in self._transformer._column_transform_info_list:
+            if info.column_type != 'discrete':
+                data_map.extend(range(data_pos, data_pos + info.output_dimensions))
+                data_pos += info.output_dimensions
+                infos.append(info)
+                continue
+            known = list(info.transform.dummies)
+            known_set = set(known)
+            unseen = [v for v in pd.Series(train_data[info.column_name], dtype=object).unique() if v not in known_set]
+            if unseen:
+                encoder = OneHotEncoder()
+                encoder.fit(pd.DataFrame({info.column_name: pd.Series(known + unseen, dtype=object)}), info.column_name)
+                info = ColumnTransformInfo(
+                    column_name=info.column_name,
+                    column_type='discrete',
+                    transform=encoder,
+                    output_info=[SpanInfo(len(encoder.dummies), 'softmax')],
+                    output_dimensions=len(encoder.dummies)
+                )
+                new_categories[info.column_name] = [str(v) for v in unseen]
+                self._widen_raw_dtype(info.column_name, encoder.dummies)
+            # Positions by value: a NaN dummy always moves to the end
+            positions = {_dummy_key(v): i for i, v in enumerate(info.transform.dummies)}
+            for value in known:
+                data_map.append(data_pos + positions[_dummy_key(value)])
+                cond_map.append(cond_pos + positions[_dummy_key(value)])
+            data_pos += info.output_dimensions
+            cond_pos += info.output_dimensions
+            infos.append(info)
+        if not new_categories:
+            return {}
+
+        old_data_dim = self._transformer.output_dimensions
+        old_cond_dim = self._cond_dimensions()
+        self._transformer._column_transform_info_list = infos
+        self._transformer.output_info_list = [info.output_info for info in infos]
+        self._transformer.output_dimensions = data_pos
+
+        # Generator input is [noise, cond]; every residual layer appends its input to its output
+        x_map = list(range(self._embedding_dim)) + [self._embedding_dim + j for j in cond_map]
+        x_features = self._embedding_dim + cond_pos
+        old_x_features = self._embedding_dim + old_cond_dim
+        layers = list(self._generator.seq)
+        for layer in layers[:-1]:
+            hidden = layer.fc.in_features - old_x_features
+            layer.fc = _widen_linear(layer.fc, list(range(hidden)) + [hidden + m for m in x_map], hidden + x_features)
+        hidden = layers[-1].in_features - old_x_features
+        self._generator.seq[-1] = _widen_linear(
+            layers[-1], list(range(hidden)) + [hidden + m for m in x_map], hidden + x_features, data_map, data_pos
+        )
+
+        # Discriminator input is pac rows of [data, cond], flattened into one vector
+        block_map = data_map + [data_pos + j for j in cond_map]
+        block = data_pos + cond_pos
+        first = self._discriminator.seq[0]
+        in_map = [b * block + m for b in range(self.pac) for m in block_map]
+        self._discriminator.seq[0] = _widen_linear(first, in_map, block * self.pac)
+        self._discriminator.pacdim = block * self.pac
+        logger.info(f"Extended CTGAN vocabulary by {sum(map(len, new_categories.values()))} categories ({old_data_dim} -> {data_pos} dimensions)")
+        return new_categories
+
+    def _run_training(self, train_data, epochs: int, warm_start: bool, prior: Optional[Dict[str, Dict]] = None):
+        if isinstance(train_data, EncodedStore):
+            matrix = None
+            self._data_sampler = StoreDataSampler(train_data, self._transformer, self._log_frequency)
+        elif isinstance(train_data, WeightedRows):
+            matrix = self._transformer.transform(train_data.frame)
+            self._data_sampler = WeightedDataSampler(matrix, self._transformer.output_info_list, self._log_frequency, train_data.counts)
+        else:
+            matrix = self._transformer.transform(train_data)
+            self._data_sampler = DataSampler(matrix, self._transformer.output_info_list, self._log_frequency)
+        self._started_at = time.monotonic()
+        self._run_epochs = epochs
+        stop_reason = STOP_MAX_EPOCHS
+        # Distinct rows stand for all their copies, so an epoch takes as many steps as the raw rows would
+        num_rows = train_data.num_rows if isinstance(train_data, WeightedRows) else len(train_data)
+        try:
+            self._train(matrix, num_rows, epochs)
+        except _StopTraining as stop:
+            stop_reason = str(stop)
+        finally:
+            elapsed = time.monotonic() - self._started_at
+            self._started_at = None
+        if prior is not None:
+            self._merge_category_prior(prior)
+
+        losses = self._loss_values if self._loss_values is not None else pd.DataFrame()
+        self.training_summary = {
+            "epochs_run": len(losses),
+            "max_epochs": epochs,
+            "batch_size": self._batch_size,
+            "stop_reason": stop_reason,
+            "train_seconds": round(elapsed, 2),
+            "warm_start": warm_start
+        }
+        if self.new_categories:
+            self.training_summary["new_categories"] = {col: len(values) for col, values in self.new_categories.items()}
+        if len(losses):
+            last = losses.iloc[-1]
+            self.training_summary["final_generator_loss"] = float(last['Generator Loss'])
+            self.training_summary["final_discriminator_loss"] = float(last['Discriminator Loss'])
+        logger.info(f"CTGAN training stopped after {self.training_summary['epochs_run']} epochs ({stop_reason})")
+        return self
+
+    def _train(self, train_data: Optional[np.ndarray], num_rows: int, epochs: int) -> None:
+        """The ``CTGAN.fit`` training loop, on the networks and data sampler already held by the model."""
+        generator, discriminator = self._generator, self._discriminator
+        optimizer_g = torch.optim.Adam(
+            generator.parameters(), lr=self._generator_lr, betas=(0.5, 0.9), weight_decay=self._generator_decay
+        )
+        optimizer_d = torch.optim.Adam(
+            discriminator.parameters(), lr=self._discriminator_lr, betas=(0.5, 0.9), weight_decay=self._discriminator_decay
+        )
+        mean = torch.zeros(self._batch_size, self._embedding_dim, device=self._device)
+        std = mean + 1
+        self.loss_values = pd.DataFrame(columns=['Epoch', 'Generator Loss', 'Discriminator Loss'])
+
+        steps_per_epoch = max(num_rows // self._batch_size, 1)
+        for epoch in range(epochs):
+            for _ in range(steps_per_epoch):
+                for _ in range(self._discriminator_steps):
+                    fakez = torch.normal(mean=mean, std=std)
+                    condvec = self._data_sampler.sample_condvec(self._batch_size)
+                    if condvec is None:
+                        c1 = None
+                        real = self._data_sampler.sample_data(train_data, self._batch_size, None, None)
+                    else:
+                        c1, m1, col, opt = condvec
+                        c1 = torch.from_numpy(c1).to(self._device)
+                        fakez = torch.cat([fakez, c1], dim=1)
+                        perm = np.arange(self._batch_size)
+                        np.random.shuffle(perm)
+                        real = self._data_sampler.sample_data(train_data, self._batch_size, col[perm], opt[perm])
+                        c2 = c1[perm]
+
+                    fakeact = self._apply_activate(generator(fakez))
+                    real = torch.from_numpy(real.astype('float32')).to(self._device)
+                    if c1 is not None:
+                        fake_cat = torch.cat([fakeact, c1], dim=1)
+                        real_cat = torch.cat([real, c2], dim=1)
+                    else:
+                        real_cat, fake_cat = real, fakeact
+
+                    y_fake = discriminator(fake_cat)
+                    y_real = discriminator(real_cat)
+                    pen = discriminator.calc_gradient_penalty(real_cat, fake_cat, self._device, self.pac)
+                    loss_d = -(torch.mean(y_real) - torch.mean(y_fake))
+                    optimizer_d.zero_grad(set_to_none=False)
+                    pen.backward(retain_graph=True)
+                    loss_d.backward()
+                    optimizer_d.step()
+
+                fakez = torch.normal(mean=mean, std=std)
+                condvec = self._data_sampler.sample_condvec(self._batch_size)
+                if condvec is None:
+                    c1 = m1 = None
+                else:
+                    c1, m1, col, opt = condvec
+                    c1 = torch.from_numpy(c1).to(self._device)
+                    m1 = torch.from_numpy(m1).to(self._device)
+                    fakez = torch.cat([fakez, c1], dim=1)
+
+                fake = generator(fakez)
+                fakeact = self._apply_activate(fake)
+                y_fake = discriminator(torch.cat([fakeact, c1], dim=1) if c1 is not None else fakeact)
+                cross_entropy = 0 if condvec is None else self._cond_loss(fake, c1, m1)
+                loss_g = -torch.mean(y_fake) + cross_entropy
+                optimizer_g.zero_grad(set_to_none=False)
+                loss_g.backward()
+                optimizer_g.step()
+
+            epoch_losses = pd.DataFrame({
+                'Epoch': [epoch],
+                'Generator Loss': [loss_g.detach().cpu().item()],
+                'Discriminator Loss': [loss_d.detach().cpu().item()]
+            })
+            # Assigned through the property, which decides whether to stop
+            if self.loss_values is None or self.loss_values.empty:
+                self.loss_values = epoch_losses
+            else:
+                self.loss_values = pd.concat([self.loss_values, epoch_losses]).reset_index(drop=True)
@@ -0,0 +1,430 @@
+import os
+import csv
+import io
+import json
+import math
+import time
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import psutil
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, reservations are not coordinated across processes
+    fcntl = None
+
+from process_utils import pid_alive
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+# Share of the host's memory (as psutil reports it) that admitted jobs may reserve together
+MEMORY_FRACTION = float(os.getenv("ADMISSION_MEMORY_FRACTION", "0.75"))
+# Admitted jobs that will wait for memory (their share of the committed bytes exceeds the
+# budget); beyond this, requests that do not fit get a 429
+MAX_QUEUED = int(os.getenv("ADMISSION_MAX_QUEUED", "8"))
+# Upload prefix parsed to count rows and distinct values before the job is queued
+PROFILE_BYTES = 8 * MB
+# Strings pandas reads as missing by default (pandas.read_csv na_values); the pipeline
+# turns them into one MISSING category
+NA_VALUES = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"
+})
+RESERVE_POLL_SECONDS = 0.5
+DEFAULT_RETRY_AFTER_SECONDS = 30
+
+# Estimator constants, measured on one core with CTGAN's default 128x128 networks. The
+# API process cannot import cardinality or encoded_store (pandas), so their settings are
+# read from the same environment variables here.
+# Resident size of a job process before any data: torch and ctgan through their first
+# training step, or NumPy and pandas alone
+RUNTIME_BYTES = {"ctgan": 900 * MB, "chow_liu": 200 * MB}
+CELL_BYTES = 4              # category codes of the loaded and the preprocessed frame
+ROW_ID_BYTES = 8            # CTGAN's row ids per category, Chow-Liu's int64 codes
+ONE_HOT_BYTES = 8           # CTGAN's transformed training matrix is float64
+OUTPUT_CELL_BYTES = 64      # a sampled value as a Python string in an object column
+CTGAN_HIDDEN = 256          # generator and discriminator units added to the one-hot width per row
+CTGAN_FIT_SECONDS = 5e-7    # per row, epoch and unit of (width + CTGAN_HIDDEN)
+CTGAN_SAMPLE_SECONDS = 1e-7  # per sampled row and unit of (width + CTGAN_HIDDEN)
+CHOW_LIU_FIT_SECONDS = 2e-8  # per row and column pair
+CHOW_LIU_SAMPLE_SECONDS = 5e-8  # per sampled cell
+STORE_METRIC_ROWS = 1_000_000
+# As privacy.NEAR_DUPLICATE_MAX_HASHES: above this many row-column hashes the leakage
+# index keeps only the exact-match hashes
+NEAR_DUPLICATE_MAX_HASHES = 50_000_000
+
+
+def memory_budget() -> int:
+    """Bytes all admitted jobs may hold at once: ``ADMISSION_MEMORY_MB``, or a share of total memory."""
+    configured = os.getenv("ADMISSION_MEMORY_MB")
+    if configured:
+        return int(configured) * MB
+    return int(psutil.virtual_memory().total * MEMORY_FRACTION)
+
+
+class AdmissionError(Exception):
+    """A request the server will not take: 413 when it can never fit, 429 when the queue is full."""
+
+    def __init__(self, status_code: int, message: str, estimate: Dict, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.estimate = estimate
+        self.retry_after = retry_after
+
+    def payload(self) -> Dict:
+        return {"error": str(self), "estimate": self.estimate}
+
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(self.retry_after)} if self.retry_after is not None else {}
+
+
+def profile_upload(path: str, columns: List[str], sample_bytes: int = PROFILE_BYTES) -> Dict:
+    """Rows and distinct values per column, from the first ``sample_bytes`` of a CSV.
+
+    Files that fit in the sample are counted exactly; for larger ones the row count is
+    extrapolated from the sampled bytes per row. ``singletons`` holds, per column, how
+    many values the sample saw once and twice (see ``extrapolate_distinct``).
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        head = f.read(sample_bytes)
+    exact = len(head) >= size
+    if not exact:
+        # Drop the last, probably truncated line
+        head = head[:head.rfind(b"\n") + 1]
+    reader = csv.DictReader(io.StringIO(head.decode("utf-8", errors="replace"), newline=""))
+    counts = {col: {} for col in columns}
+    missing = {col: False for col in columns}
+    rows = 0
+    for record in reader:
+        rows += 1
+        for col in columns:
+            value = record.get(col)
+            if value is None or value in NA_VALUES:
+                missing[col] = True
+            else:
+                counts[col][value] = counts[col].get(value, 0) + 1
+    estimated_rows = rows if exact or not head else int(rows * size / len(head))
+    return {
+        "bytes": size,
+        "rows": estimated_rows,
+        "sampled_rows": rows,
+        "exact": exact,
+        "distinct": {col: len(values) + missing[col] for col, values in counts.items()},
+        "singletons": {col: _singletons(values) for col, values in counts.items()}
+    }
+
+
+def _singletons(counts: Dict[str, int]) -> List[int]:
+    once = sum(1 for count in counts.values() if count == 1)
+    twice = sum(1 for count in counts.values() if count == 2)
+    return [once, twice]
+
+
+def env_number(name: str, cast, default=None):
+    value = os.getenv(name)
+    return cast(value) if value not in (None, "") else default
+
+
+def extrapolate_distinct(distinct: int, sampled_rows: int, total_rows: int, exact: bool, singletons: Optional[List[int]] = None) -> int:
+    """Distinct values expected in the whole file given those seen in a sample of it.
+
+    With the counts of values seen once and twice this is the Chao1 estimate: a column
+    whose values all recur is saturated and stays as sampled, one with many singletons
+    is still growing. Without them (e.g. a sketched column) the count grows like
+    sqrt(rows). Never more than ``total_rows``.
+    """
+    if exact or not sampled_rows:
+        return distinct
+    if singletons is not None:
+        once, twice = singletons
+        return min(total_rows, int(distinct + once * (once - 1) / (2 * (twice + 1))))
+    return min(total_rows, int(distinct * math.sqrt(total_rows / sampled_rows)))
+
+
+def model_width(distinct: int, sampled_rows: int, total_rows: int, exact: bool, max_categories: Optional[int], hash_buckets: Optional[int], singletons: Optional[List[int]] = None) -> int:
+    """One-hot width of a column after the cardinality policy, as ``CardinalityReducer`` would leave it."""
+    near_unique_ratio = env_number("CARDINALITY_NEAR_UNIQUE_RATIO", float, 0.95)
+    buckets = hash_buckets or 1
+    if near_unique_ratio and sampled_rows >= 100 and distinct >= near_unique_ratio * sampled_rows:
+        return buckets
+    distinct = extrapolate_distinct(distinct, sampled_rows, total_rows, exact, singletons)
+    if max_categories and distinct > max_categories:
+        return max_categories + buckets
+    return distinct
+
+
+def estimate_job(
+    profile: Dict,
+    engine: str = "ctgan",
+    epochs: int = 100,
+    num_samples: int = 1000,
+    max_train_seconds: Optional[float] = None,
+    stream: bool = False,
+    chunk_size: int = 10000,
+    max_categories: Optional[int] = None,
+    hash_buckets: Optional[int] = None,
+    metrics_level: str = "basic",
+    privacy_filter: Optional[str] = None
+) -> Dict:
+    """Predict the peak memory and runtime of one pipeline run before it starts.
+
+    Peak memory is the runtime's own footprint, plus the training frames, plus the larger
+    of the fitting structures (CTGAN's one-hot matrix and row ids, or Chow-Liu's codes)
+    and the sampled chunk with the output held at once. Uploads trained from an encoded
+    store skip the frames and the one-hot matrix. Runs with ``full`` metrics or a
+    ``privacy_filter`` also hold the leakage index for the whole run: one hash and count
+    per real row, plus one hash per row and column for near duplicates unless that
+    exceeds ``NEAR_DUPLICATE_MAX_HASHES``. CTGAN's runtime is capped by
+    ``max_train_seconds``.
+    """
+    rows = profile["rows"]
+    cols = len(profile["distinct"])
+    # Per-request overrides win, including 0 (off)
+    if max_categories is None:
+        max_categories = env_number("CARDINALITY_MAX_CATEGORIES", int, 500)
+    if hash_buckets is None:
+        hash_buckets = env_number("CARDINALITY_HASH_BUCKETS", int)
+    singletons = profile.get("singletons", {})
+    widths = {
+        col: model_width(distinct, profile["sampled_rows"], rows, profile["exact"], max_categories, hash_buckets, singletons.get(col))
+        for col, distinct in profile["distinct"].items()
+    }
+    width = sum(widths.values())
+    use_store = profile["bytes"] >= env_number("ENCODED_STORE_MIN_MB", int, 256) * MB
+    stream = stream or use_store
+
+    data_bytes = min(rows, STORE_METRIC_ROWS if use_store else rows) * cols * CELL_BYTES
+    index_bytes = 0
+    if metrics_level == "full" or privacy_filter is not None:
+        near_hashes = rows * cols if rows * cols <= NEAR_DUPLICATE_MAX_HASHES else 0
+        index_bytes = (2 * rows + near_hashes) * ROW_ID_BYTES
+    if engine == "chow_liu":
+        fit_bytes = rows * ROW_ID_BYTES * (3 if use_store else cols + 3)
+        fit_seconds = rows * cols * (cols - 1) / 2 * CHOW_LIU_FIT_SECONDS
+        sample_row_bytes = cols * ROW_ID_BYTES * 2
+        sample_seconds = num_samples * cols * CHOW_LIU_SAMPLE_SECONDS
+    else:
+        # A store only needs one column's sort order in memory while it is built
+        fit_bytes = rows * 16 if use_store else rows * cols * ROW_ID_BYTES + 2 * rows * width * ONE_HOT_BYTES
+        units = width + CTGAN_HIDDEN
+        fit_seconds = epochs * rows * units * CTGAN_FIT_SECONDS
+        if max_train_seconds:
+            fit_seconds = min(fit_seconds, max_train_seconds)
+        sample_row_bytes = 3 * width * ONE_HOT_BYTES
+        sample_seconds = num_samples * units * CTGAN_SAMPLE_SECONDS
+    # Rows are sampled a chunk at a time, but only streamed runs let go of each chunk
+    chunk_rows = min(chunk_size, num_samples)
+    output_rows = chunk_rows if stream else num_samples
+    sample_bytes = chunk_rows * sample_row_bytes + output_rows * cols * OUTPUT_CELL_BYTES
+    peak = RUNTIME_BYTES.get(engine, RUNTIME_BYTES["ctgan"]) + data_bytes + index_bytes + max(fit_bytes, sample_bytes)
+    return {
+        "engine": engine,
+        "rows": rows,
+        "rows_exact": profile["exact"],
+        "one_hot_width": width,
+        "encoded_store": use_store,
+        "leakage_index_mb": round(index_bytes / MB, 1),
+        "peak_bytes": int(peak),
+        "peak_mb": round(peak / MB, 1),
+        "fit_seconds": round(fit_seconds, 1),
+        "sample_seconds": round(sample_seconds, 1),
+        "estimated_seconds": round(fit_seconds + sample_seconds, 1)
+    }
+
+
+class MemoryBudget:
+    """Host-wide memory reservations of admitted jobs, shared by every Gunicorn worker and job process.
+
+    The API admits a job with its estimate into ``pending/``; the pool process running it
+    moves the reservation to ``active/`` once the active reservations leave room for it
+    and no job admitted before it is still waiting, and removes it when the job ends.
+    Both steps run under an ``flock`` on one lock file, and reservations of processes
+    that died are dropped, so a crash never leaks memory from the budget.
+    """
+
+    def __init__(self, state_dir: Optional[str] = None, budget_bytes: Optional[int] = None, max_queued: Optional[int] = None):
+        self.state_dir = os.path.abspath(state_dir or os.getenv("ADMISSION_STATE_DIR", "/tmp/admission"))
+        self.budget_bytes = budget_bytes or memory_budget()
+        self.max_queued = max_queued if max_queued is not None else MAX_QUEUED
+        for kind in ("pending", "active"):
+            os.makedirs(os.path.join(self.state_dir, kind), exist_ok=True)
+
+    def _path(self, kind: str, job_id: str) -> str:
+        return os.path.join(self.state_dir, kind, f"{job_id}.json")
+
+    @contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.state_dir, "lock"), 'a+') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _entries(self, kind: str) -> List[Dict]:
+        entries = []
+        directory = os.path.join(self.state_dir, kind)
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            try:
+                with open(path) as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            if not pid_alive(entry.get("pid")):
+                # Left behind by a worker or job process that died
+                self._remove(path)
+                continue
+            entries.append(entry)
+        return entries
+
+    @staticmethod
+    def _write(path: str, entry: Dict) -> None:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def _retry_after(self, active: List[Dict]) -> int:
+        # Until the first running job is expected to finish
+        now = time.time()
+        remaining = [entry["started"] + entry["estimated_seconds"] - now for entry in active if "started" in entry]
+        return max(1, int(min(remaining))) if remaining else DEFAULT_RETRY_AFTER_SECONDS
+
+    def admit(self, job_id: str, estimate: Dict) -> str:
+        """Record an admitted job and return ``admitted`` or ``queued``; raise ``AdmissionError`` otherwise.
+
+        Jobs admitted earlier but not started yet (``pending/``) usually wait for a pool
+        worker, not for memory, so they count by their bytes: a job is ``admitted`` when the
+        running and pending reservations plus its own fit the budget. Only pending jobs
+        beyond the budget count towards ``max_queued``.
+        """
+        if estimate["peak_bytes"] > self.budget_bytes:
+            raise AdmissionError(
+                413,
+                f"This request needs an estimated {estimate['peak_mb']} MB, more than the server's "
+                f"{self.budget_bytes // MB} MB budget; request fewer rows, fewer or lower-cardinality columns, "
+                "the chow_liu engine or a lower max_categories",
+                estimate
+            )
+        with self._locked():
+            active, pending = self._entries("active"), self._entries("pending")
+            committed = sum(entry["bytes"] for entry in active)
+            waiting_for_memory = 0
+            for entry in pending:
+                committed += entry["bytes"]
+                waiting_for_memory += committed > self.budget_bytes
+            fits = committed + estimate["peak_bytes"] <= self.budget_bytes
+            if not fits and waiting_for_memory >= self.max_queued:
+                raise AdmissionError(
+                    429,
+                    f"The {self.budget_bytes // MB} MB memory budget is committed and {waiting_for_memory} "
+                    "jobs are already queued beyond it; retry later",
+                    estimate,
+                    retry_after=self._retry_after(active)
+                )
+            self._write(self._path("pending", job_id), {
+                "job_id": job_id,
+                "pid": os.getpid(),
+                "bytes": estimate["peak_bytes"],
+                "estimated_seconds": estimate["estimated_seconds"],
+                "since": datetime.now().isoformat(timespec="seconds"),
+                "admitted": time.time_ns()
+            })
+        return "admitted" if fits else "queued"
+
+    @contextmanager
+    def reserve(self, job_id: str, peak_bytes: int, estimated_seconds: float = 0.0, on_wait: Optional[Callable[[], None]] = None):
+        """Wait until ``peak_bytes`` fit next to the running jobs, and hold them for the body.
+
+        Reservations are granted in admission order: while a job admitted earlier is
+        waiting for memory, later jobs wait behind it even if they would fit, so a large
+        job is not starved by a stream of smaller ones. Pending jobs whose pool process
+        has not reached this point yet (no ``waiting`` flag) are not waited for.
+        """
+        path = self._path("active", job_id)
+        pending_path = self._path("pending", job_id)
+        with self._locked():
+            ticket = next((entry for entry in self._entries("pending") if entry["job_id"] == job_id), {"job_id": job_id})
+            ticket.update({"pid": os.getpid(), "bytes": peak_bytes, "waiting": True})
+            ticket.setdefault("admitted", time.time_ns())
+            self._write(pending_path, ticket)
+        order = (ticket["admitted"], job_id)
+        waited = False
+        start = time.monotonic()
+        try:
+            while True:
+                with self._locked():
+                    active = self._entries("active")
+                    ahead = any(
+                        entry.get("waiting") and (entry.get("admitted", 0), entry["job_id"]) < order
+                        for entry in self._entries("pending")
+                    )
+                    # A job alone on the host always runs: admit() already checked it fits the budget
+                    if not ahead and (not active or sum(entry["bytes"] for entry in active) + peak_bytes <= self.budget_bytes):
+                        self._write(path, {
+                            "job_id": job_id,
+                            "pid": os.getpid(),
+                            "bytes": peak_bytes,
+                            "estimated_seconds": estimated_seconds,
+                            "started": time.time()
+                        })
+                        self._remove(pending_path)
+                        break
+                if not waited:
+                    waited = True
+                    logger.info(f"Job {job_id} waits for {peak_bytes // MB} MB of memory")
+                    if on_wait is not None:
+                        on_wait()
+                time.sleep(RESERVE_POLL_SECONDS)
+        except BaseException:
+            # A job that gave up waiting must not hold up the ones admitted after it
+            self.release(job_id)
+            raise
+        try:
+            yield round(time.monotonic() - start, 3)
+        finally:
+            self._remove(path)
+
+    def release(self, job_id: str) -> None:
+        """Drop a job's reservation, e.g. when it failed before its process could."""
+        with self._locked():
+            self._remove(self._path("pending", job_id))
+            self._remove(self._path("active", job_id))
+
+    def state(self) -> Dict:
+        with self._locked():
+            active, pending = self._entries("active"), self._entries("pending")
+        return {
+            "budget_mb": self.budget_bytes // MB,
+            "reserved_mb": sum(entry["bytes"] for entry in active) // MB,
+            "available_mb": psutil.virtual_memory().available // MB,
+            "running": active,
+            "queued": pending
+        }
+
+
+_default_budget = None
+
+
+def get_default_budget() -> MemoryBudget:
+    """Process-wide memory budget configured from the environment."""
+    global _default_budget
+    if _default_budget is None:
+        _default_budget = MemoryBudget()
+    return _default_budget
@@ -7,37 +7,49 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 try:
-    # Check versions before importing other libraries
-    import numpy as np
-    import pandas as pd
-    logger.info(f"NumPy version: {np.__version__}")
-    logger.info(f"Pandas version: {pd.__version__}")
+    # numpy, pandas and torch are not imported here: the API process only needs them in
+    # the job pool, so / and /health answer without paying for them (see job_manager)
+    from importlib.metadata import version, PackageNotFoundError
     
-    try:
-        import torch
-        logger.info(f"PyTorch version: {torch.__version__}")
-    except ImportError as e:
-        logger.warning(f"PyTorch import error: {str(e)}")
-    
-    from fastapi import FastAPI, UploadFile, File, Form
-    from fastapi.responses import FileResponse, JSONResponse
+    from fastapi import Depends, FastAPI, UploadFile, File, Form, Request
+    from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
     from fastapi.middleware.cors import CORSMiddleware
     import traceback
+    import asyncio
+    import json
+    import time
     import shutil
-    import tempfile
+    from typing import List, Optional
     import uvicorn  # Import uvicorn for running the server
     
     try:
-        from synthetic_data_pipeline import SyntheticDataPipeline
-        import time
+        from job_manager import JobManager, read_progress
+        from instrumentation import HTTP_REQUEST_SECONDS, metrics_payload
+        from training_scheduler import get_default_scheduler
+        from output_writers import OUTPUT_FORMATS, media_type, negotiate_format, output_extension
+        from model_registry import valid_model_name
+        from admission import AdmissionError, estimate_job, get_default_budget, profile_upload
+        from column_profile import profile_csv
+        from batch_jobs import BatchStore, parse_batch_plan
+        from pipeline_options import ENGINES, METRIC_LEVELS, PRIVACY_FILTERS
     except ImportError as e:
-        logger.error(f"Failed to import SyntheticDataPipeline: {str(e)}")
+        logger.error(f"Failed to import JobManager: {str(e)}")
         raise
 except ImportError as e:
     logger.error(f"Import error: {str(e)}")
     logger.error("Try checking package compatibility or downgrading packages")
     sys.exit(1)
 
+def package_version(name: str) -> Optional[str]:
+    """Installed version read from package metadata, without importing the package."""
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
+
+for package in ("numpy", "pandas", "torch"):
+    logger.info(f"{package} version: {package_version(package)}")
+
 app = FastAPI(title="Synthetic Data Generator")
 
 # Setup CORS
@@ -49,42 +61,388 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, so job ids do not explode cardinality
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            request.method, route.path if route else "unmatched", str(status)
+        ).observe(time.perf_counter() - start)
+
 # Configuration
 UPLOAD_FOLDER = 'temp_uploads'
 OUTPUT_FOLDER = 'output'
+JOB_FOLDER = 'jobs'
+BATCH_FOLDER = 'batches'
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+STREAM_CHUNK_ROWS = 10000
+STREAM_READ_BYTES = 64 * 1024
+STREAM_POLL_SECONDS = 0.1
+EVENTS_POLL_SECONDS = 0.5
+# Comment lines keep idle event streams open through proxies with read timeouts
+EVENTS_HEARTBEAT_SECONDS = 15
+WORKSPACE_GC_SECONDS = int(os.getenv("WORKSPACE_GC_SECONDS", "300"))
+DEFAULT_METRICS_LEVEL = os.getenv("METRICS_LEVEL", "basic")
+# Default CTGAN training budget, kept under the 300s Gunicorn timeout
+MAX_TRAIN_SECONDS = float(os.getenv("MAX_TRAIN_SECONDS", "240"))
+# Maximum CTGAN epochs; load tests lower it to keep fits short
+TRAIN_EPOCHS = int(os.getenv("TRAIN_EPOCHS", "100"))
 
 # Create necessary directories
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
-def cleanup_output_directory(directory):
-    """Remove all files in the output directory except .gitkeep"""
-    for filename in os.listdir(directory):
-        if filename != '.gitkeep':
-            file_path = os.path.join(directory, filename)
-            try:
-                if os.path.isfile(file_path):
-                    # Add retry logic for locked files
-                    max_retries = 3
-                    for _ in range(max_retries):
-                        try:
-                            os.unlink(file_path)
-                            break
-                        except PermissionError:
-                            time.sleep(1)  # Wait before retry
-                elif os.path.isdir(file_path):
-                    shutil.rmtree(file_path, ignore_errors=True)
-            except Exception as e:
-                logger.error(f'Error deleting {file_path}: {e}')
+# Bounded process pool for pipeline runs (JOB_WORKERS processes per API worker)
+job_manager = JobManager(JOB_FOLDER)
+batch_store = BatchStore(BATCH_FOLDER)
+
+class InvalidRequest(ValueError):
+    """A form field the API cannot use; answered with 400 and the message as ``error``."""
+
+@app.exception_handler(InvalidRequest)
+async def invalid_request_response(request: Request, exc: InvalidRequest) -> JSONResponse:
+    return JSONResponse(status_code=400, content={"error": str(exc)})
+
+def check_choice(name: str, value: Optional[str], allowed) -> None:
+    """Raise ``InvalidRequest`` unless ``value`` is one of ``allowed``."""
+    if value not in allowed:
+        raise InvalidRequest(f"Unknown {name} '{value}', expected one of {', '.join(allowed)}")
+
+def check_model_options(model_name: Optional[str], finetune_epochs: Optional[int]) -> None:
+    """Raise ``InvalidRequest`` for an unusable model name or epoch count."""
+    if model_name is not None and not valid_model_name(model_name):
+        raise InvalidRequest("model_name must be 1-64 letters, digits, '.', '_' or '-', starting with a letter or digit")
+    if finetune_epochs is not None and finetune_epochs <= 0:
+        raise InvalidRequest("finetune_epochs must be positive")
+
+def cardinality_overrides(max_categories: Optional[int], min_frequency: Optional[float], hash_buckets: Optional[int]) -> dict:
+    """Per-request cardinality settings; unset fields fall back to the CARDINALITY_* environment."""
+    return {"max_categories": max_categories, "min_frequency": min_frequency, "hash_buckets": hash_buckets}
+
+def result_filename(output_format: str) -> str:
+    return "synthetic_data" + output_extension(output_format)
+
+def parse_categorical_columns(categorical_columns: str) -> List[str]:
+    """Split the comma-separated form field into clean column names."""
+    return [
+        col.strip()
+        for col in categorical_columns.replace('"', '').replace("'", '').split(',')
+        if col.strip()
+    ]
+
+def parse_conditions(conditions: Optional[str], columns: List[str], num_samples: int) -> Optional[List[dict]]:
+    """Parse the ``conditions`` form field into per-condition row quotas.
+
+    Accepts one object of column values, which gets all ``num_samples`` rows, or a list of
+    ``{"column_values": {...}, "num_rows": n}``. Raises ValueError on malformed input.
+    """
+    if not conditions:
+        return None
+    try:
+        parsed = json.loads(conditions)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"conditions is not valid JSON: {e}")
+    if isinstance(parsed, dict):
+        parsed = [{"column_values": parsed, "num_rows": num_samples}]
+    if not isinstance(parsed, list) or not parsed:
+        raise ValueError("conditions must be an object of column values or a non-empty list of conditions")
+    for condition in parsed:
+        if not isinstance(condition, dict) or not isinstance(condition.get("column_values"), dict) or not condition["column_values"]:
+            raise ValueError("Each condition needs a non-empty column_values object")
+        num_rows = condition.get("num_rows")
+        if not isinstance(num_rows, int) or isinstance(num_rows, bool) or num_rows <= 0:
+            raise ValueError("Each condition needs a positive integer num_rows")
+        unknown = [col for col in condition["column_values"] if col not in columns]
+        if unknown:
+            raise ValueError(f"Condition columns {', '.join(unknown)} are not among the categorical columns")
+    return parsed
+
+def run_options(
+    request: Request,
+    engine: str = Form("ctgan"),
+    max_train_seconds: Optional[float] = Form(None),
+    metrics_level: str = Form(DEFAULT_METRICS_LEVEL),
+    output_format: Optional[str] = Form(None),
+    max_categories: Optional[int] = Form(None),
+    min_category_frequency: Optional[float] = Form(None),
+    hash_buckets: Optional[int] = Form(None),
+    privacy_filter: Optional[str] = Form(None)
+) -> dict:
+    """Form fields shared by /generate, /jobs and /batches, validated into keyword arguments of ``queue_job``."""
+    # Without the form field, the format is negotiated from the Accept header
+    output_format = output_format or negotiate_format(request.headers.get("accept"))
+    check_choice("engine", engine, ENGINES)
+    check_choice("metrics level", metrics_level, METRIC_LEVELS)
+    check_choice("output format", output_format, OUTPUT_FORMATS)
+    if privacy_filter is not None:
+        check_choice("privacy filter", privacy_filter, PRIVACY_FILTERS)
+    return {
+        "engine": engine,
+        "max_train_seconds": max_train_seconds,
+        "metrics_level": metrics_level,
+        "output_format": output_format,
+        "cardinality": cardinality_overrides(max_categories, min_category_frequency, hash_buckets),
+        "privacy_filter": privacy_filter
+    }
+
+def job_options(
+    categorical_columns: str = Form(...),
+    num_samples: int = Form(1000),
+    conditions: Optional[str] = Form(None),
+    model_name: Optional[str] = Form(None),
+    finetune_epochs: Optional[int] = Form(None),
+    options: dict = Depends(run_options)
+) -> dict:
+    """Form fields of a single-dataset job (/generate and /jobs), as keyword arguments of ``create_job``."""
+    categorical_columns_list = parse_categorical_columns(categorical_columns)
+    if not categorical_columns_list:
+        raise InvalidRequest("No valid categorical columns provided")
+    check_model_options(model_name, finetune_epochs)
+    try:
+        conditions_list = parse_conditions(conditions, categorical_columns_list, num_samples)
+    except ValueError as e:
+        raise InvalidRequest(str(e))
+    return {
+        "categorical_columns_list": categorical_columns_list,
+        "num_samples": num_samples,
+        "conditions": conditions_list,
+        "model_name": model_name,
+        "finetune_epochs": finetune_epochs,
+        **options
+    }
+
+async def spool_upload(file: UploadFile, path: str) -> int:
+    """Copy an upload to disk in fixed-size chunks instead of reading it into memory."""
+    size = 0
+    with open(path, 'wb') as f:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            f.write(chunk)
+            size += len(chunk)
+    return size
+
+async def create_job(
+    file: UploadFile,
+    categorical_columns_list: List[str],
+    num_samples: int,
+    stream: bool = False,
+    engine: str = "ctgan",
+    max_train_seconds: Optional[float] = None,
+    metrics_level: str = DEFAULT_METRICS_LEVEL,
+    output_format: str = "csv",
+    cardinality: Optional[dict] = None,
+    conditions: Optional[List[dict]] = None,
+    model_name: Optional[str] = None,
+    finetune_epochs: Optional[int] = None,
+    privacy_filter: Optional[str] = None
+):
+    """Save the upload into a fresh job directory and queue it on the job pool (see ``queue_job``)."""
+    job_id = job_manager.create_job()
+    filepath = job_manager.input_path(job_id)
+    size = await spool_upload(file, filepath)
+    logger.info(f"File saved to {filepath} ({size} bytes)")
+    future = await queue_job(
+        job_id, categorical_columns_list, num_samples,
+        stream=stream,
+        engine=engine,
+        max_train_seconds=max_train_seconds,
+        metrics_level=metrics_level,
+        output_format=output_format,
+        cardinality=cardinality,
+        conditions=conditions,
+        model_name=model_name,
+        finetune_epochs=finetune_epochs,
+        privacy_filter=privacy_filter
+    )
+    return job_id, future
+
+async def queue_job(
+    job_id: str,
+    categorical_columns_list: List[str],
+    num_samples: int,
+    stream: bool = False,
+    engine: str = "ctgan",
+    max_train_seconds: Optional[float] = None,
+    metrics_level: str = DEFAULT_METRICS_LEVEL,
+    output_format: str = "csv",
+    cardinality: Optional[dict] = None,
+    conditions: Optional[List[dict]] = None,
+    model_name: Optional[str] = None,
+    finetune_epochs: Optional[int] = None,
+    privacy_filter: Optional[str] = None,
+    sample_sizes: Optional[List[int]] = None
+):
+    """Queue a job whose upload is already in its directory; returns the future of its result.
+
+    With ``conditions`` the quotas replace ``num_samples``. With ``sample_sizes`` the job
+    trains once and writes one output per size; ``num_samples`` is then their total. With
+    ``model_name`` the job fine-tunes the model saved under that name, if any, and saves
+    the result back. Before queueing, the job's peak memory and runtime are estimated from
+    the upload and admitted to the host's memory budget; ``AdmissionError`` is raised when
+    it is not.
+    """
+    filepath = job_manager.input_path(job_id)
+    logger.info(f"Processing with categorical columns: {categorical_columns_list}")
+    logger.info(f"Number of samples requested: {num_samples}")
+    logger.info(f"Engine: {engine}, output format: {output_format}")
+    if conditions:
+        num_samples = sum(condition["num_rows"] for condition in conditions)
+        logger.info(f"Conditions: {conditions}")
+    fit_options = {"model_name": model_name}
+    if finetune_epochs is not None:
+        fit_options["finetune_epochs"] = finetune_epochs
+
+    # Only the head of the upload is parsed, off the event loop
+    profile = await asyncio.to_thread(profile_upload, filepath, categorical_columns_list)
+    estimate = estimate_job(
+        profile,
+        engine=engine,
+        epochs=TRAIN_EPOCHS,
+        num_samples=num_samples,
+        max_train_seconds=max_train_seconds or MAX_TRAIN_SECONDS,
+        # Conditional rows and every size of a batch are written chunk by chunk
+        stream=stream or bool(conditions) or bool(sample_sizes),
+        chunk_size=STREAM_CHUNK_ROWS,
+        max_categories=(cardinality or {}).get("max_categories"),
+        hash_buckets=(cardinality or {}).get("hash_buckets"),
+        metrics_level=metrics_level,
+        privacy_filter=privacy_filter
+    )
+    try:
+        estimate["decision"] = get_default_budget().admit(job_id, estimate)
+    except AdmissionError as e:
+        logger.warning(f"Rejected job {job_id} ({e.status_code}): {e}")
+        shutil.rmtree(job_manager.job_dir(job_id), ignore_errors=True)
+        raise
+    logger.info(f"Job {job_id} {estimate['decision']}: ~{estimate['peak_mb']} MB, ~{estimate['estimated_seconds']}s")
+
+    try:
+        future = job_manager.submit(
+            job_id,
+            categorical_columns_list,
+            engine=engine,
+            metrics_level=metrics_level,
+            cardinality=cardinality,
+            num_samples=num_samples,
+            epochs=TRAIN_EPOCHS,
+            max_train_seconds=max_train_seconds or MAX_TRAIN_SECONDS,
+            chunk_size=STREAM_CHUNK_ROWS,
+            stream=stream,
+            output_format=output_format,
+            output_file=job_manager.stream_path(job_id, output_format) if stream else None,
+            conditions=conditions,
+            privacy_filter=privacy_filter,
+            sample_sizes=sample_sizes,
+            admission=estimate,
+            **fit_options
+        )
+    except Exception:
+        # Admitted but never submitted: no pool process will release the reservation
+        get_default_budget().release(job_id)
+        shutil.rmtree(job_manager.job_dir(job_id), ignore_errors=True)
+        raise
+    return future
+
+async def follow_job_output(job_id: str, future, output_format: str = "csv"):
+    """Yield the job's output file as the pool process appends to it, until the job ends."""
+    path = job_manager.stream_path(job_id, output_format)
+    while not os.path.exists(path):
+        if future.done():
+            break
+        await asyncio.sleep(STREAM_POLL_SECONDS)
+    if not os.path.exists(path):
+        logger.error(f"Streaming job {job_id} produced no output: {future.exception()}")
+        return
+
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(STREAM_READ_BYTES)
+            if data:
+                yield data
+                continue
+            if future.done():
+                # Drain whatever was written between the last read and completion
+                rest = f.read()
+                if rest:
+                    yield rest
+                break
+            await asyncio.sleep(STREAM_POLL_SECONDS)
+
+    if future.exception() is not None:
+        # Headers are already sent, so the truncated body is the only signal left
+        logger.error(f"Streaming job {job_id} failed: {future.exception()}")
+
+def sse_message(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+async def follow_job_events(job_id: str, offset: int = 0):
+    """Yield a job's progress events as Server-Sent Events until it reaches a terminal state.
+
+    Each event's id is its end offset in the progress log, so a client reconnecting with
+    ``Last-Event-ID`` resumes exactly where it stopped. The stream ends with an ``end``
+    event carrying the final status, also when a crashed pool process never logged one.
+    """
+    job_dir = job_manager.job_dir(job_id)
+    # Status and progress are files; reading them in a thread keeps many streams off the event loop
+    yield sse_message("status", await asyncio.to_thread(job_manager.get_status, job_id) or {})
+    last_sent = time.monotonic()
+    while True:
+        status = await asyncio.to_thread(job_manager.get_status, job_id)
+        for event_id, event in await asyncio.to_thread(read_progress, job_dir, offset):
+            offset = event_id
+            yield sse_message(event.get("event", "progress"), event, event_id)
+            last_sent = time.monotonic()
+        if status is None or status.get("status") in ("completed", "failed"):
+            yield sse_message("end", status or {"job_id": job_id, "status": "unknown"})
+            break
+        if time.monotonic() - last_sent >= EVENTS_HEARTBEAT_SECONDS:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(EVENTS_POLL_SECONDS)
+
+async def collect_workspaces_periodically():
+    """Remove expired job workspaces in the background; safe to run in every worker."""
+    while True:
+        try:
+            await asyncio.to_thread(job_manager.collect_garbage)
+            await asyncio.to_thread(batch_store.collect_garbage, job_manager.get_status)
+        except Exception as e:
+            logger.error(f"Workspace garbage collection failed: {str(e)}")
+        await asyncio.sleep(WORKSPACE_GC_SECONDS)
+
+@app.on_event("startup")
+async def start_workspace_gc():
+    asyncio.create_task(collect_workspaces_periodically())
+
+@app.on_event("shutdown")
+def shutdown_job_pool():
+    job_manager.shutdown()
 
 @app.get("/")
 def root():
-    return {"message": "Synthetic Data Generator API", "numpy_version": np.__version__}
+    return {"message": "Synthetic Data Generator API", "numpy_version": package_version("numpy")}
 
 @app.get("/health")
 def health_check():
     try:
-        return {"status": "healthy", "numpy_version": np.__version__}
+        return {
+            "status": "healthy",
+            "numpy_version": package_version("numpy"),
+            "torch_loaded": "torch" in sys.modules
+        }
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
         return JSONResponse(
@@ -92,86 +450,274 @@ def health_check():
             content={"status": "unhealthy", "error": str(e)}
         )
 
+@app.get("/metrics")
+def metrics():
+    payload, content_type = metrics_payload()
+    return Response(content=payload, media_type=content_type)
+
+@app.get("/scheduler")
+def scheduler_state():
+    """Host-wide training slots (running fits, queued fits, threads per fit) and memory reservations."""
+    return {**get_default_scheduler().state(), "memory": get_default_budget().state()}
+
+@app.post("/profile")
+async def profile_columns(
+    file: UploadFile = File(...),
+    total_bytes: Optional[int] = Form(None),
+    engine: str = Form("ctgan"),
+    max_train_seconds: Optional[float] = Form(None)
+):
+    """Column types, null fractions and approximate cardinalities from the head of an upload.
+
+    Only the first ``PROFILE_SAMPLE_BYTES`` are read, so clients can send just that slice
+    of a large file along with its full size in ``total_bytes``.
+    """
+    check_choice("engine", engine, ENGINES)
+    try:
+        return await asyncio.to_thread(
+            profile_csv, file.file, total_bytes,
+            engine=engine,
+            epochs=TRAIN_EPOCHS,
+            max_train_seconds=max_train_seconds or MAX_TRAIN_SECONDS
+        )
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        logger.error(f"Error in profile_columns: {str(e)}")
+        logger.error(traceback.format_exc())
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
 @app.post("/generate")
 async def generate_synthetic_data(
     file: UploadFile = File(...),
-    categorical_columns: str = Form(...),
-    num_samples: int = Form(1000)
+    stream: bool = Form(False),
+    job: dict = Depends(job_options)
 ):
     try:
-        # Clean up output directory before starting
-        cleanup_output_directory(OUTPUT_FOLDER)
-        logger.info("Cleaned up output directory")
+        output_format = job["output_format"]
+        # Training runs in the job pool; awaiting the future keeps the event loop free
+        job_id, future = await create_job(file, stream=stream, **job)
+        if stream:
+            # Rows are sent chunk by chunk while the pool process is still sampling
+            return StreamingResponse(
+                follow_job_output(job_id, future, output_format),
+                media_type=media_type(output_format),
+                headers={"Content-Disposition": f'attachment; filename="{result_filename(output_format)}"'}
+            )
+        output_path = await asyncio.wrap_future(future)
 
-        # Save uploaded file to temp location
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.csv')
+        logger.info(f"Sending file: {output_path}")
+
+        return FileResponse(
+            path=output_path,
+            filename=result_filename(output_format),
+            media_type=media_type(output_format)
+        )
+
+    except AdmissionError as e:
+        return JSONResponse(status_code=e.status_code, content=e.payload(), headers=e.headers())
+    except Exception as e:
+        logger.error(f"Error in generate_synthetic_data: {str(e)}")
+        logger.error(traceback.format_exc())
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    file: UploadFile = File(...),
+    job: dict = Depends(job_options)
+):
+    try:
+        job_id, _ = await create_job(file, **job)
+        return {
+            "job_id": job_id,
+            "status": "queued",
+            "admission": (job_manager.get_status(job_id) or {}).get("admission"),
+            "status_url": f"/jobs/{job_id}",
+            "result_url": f"/jobs/{job_id}/result"
+        }
+
+    except AdmissionError as e:
+        return JSONResponse(status_code=e.status_code, content=e.payload(), headers=e.headers())
+    except Exception as e:
+        logger.error(f"Error in submit_job: {str(e)}")
+        logger.error(traceback.format_exc())
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
+@app.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    status = job_manager.get_status(job_id)
+    if status is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown job {job_id}"})
+    return status
+
+@app.get("/jobs/{job_id}/events")
+def get_job_events(job_id: str, request: Request):
+    """Server-Sent Events with per-epoch losses and ETA, sampling progress and status changes."""
+    if job_manager.get_status(job_id) is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown job {job_id}"})
+    last_event_id = request.headers.get("last-event-id", "")
+    return StreamingResponse(
+        follow_job_events(job_id, int(last_event_id) if last_event_id.isdigit() else 0),
+        media_type="text/event-stream",
+        # Stop reverse proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    status = job_manager.get_status(job_id)
+    if status is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown job {job_id}"})
+    if status["status"] == "failed":
+        return JSONResponse(status_code=500, content={"error": status.get("error"), "status": status["status"]})
+    if status["status"] != "completed":
+        return JSONResponse(
+            status_code=409,
+            content={"error": "Job has not finished yet", "status": status["status"]}
+        )
+
+    output_format = status.get("output_format", "csv")
+    return FileResponse(
+        path=status["result_file"],
+        filename=result_filename(output_format),
+        media_type=media_type(output_format)
+    )
+
+def link_upload(source: str, target: str) -> None:
+    """Give a job its own name for a spooled upload; the job deletes its input when it ends."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+@app.post("/batches", status_code=202)
+async def submit_batch(
+    files: List[UploadFile] = File(...),
+    plan: str = Form(...),
+    options: dict = Depends(run_options)
+):
+    """Queue one job per dataset of ``plan``, each trained once and sampled at all its sizes.
+
+    Every upload is spooled once and linked into the workspaces of the datasets that use
+    it. Jobs run on the job pool like any other, so datasets train concurrently up to the
+    pool size and the host's training slots. Datasets that admission control rejects or
+    that fail to queue are recorded as failed; the batch itself is only rejected when
+    none could be queued.
+    """
+    try:
         try:
-            contents = await file.read()
-            temp_file.write(contents)
-            temp_file.close()
-            filepath = temp_file.name
-            
-            logger.info(f"File saved to {filepath}")
-            
-            # Parse categorical columns
-            categorical_columns_list = [
-                col.strip() 
-                for col in categorical_columns.replace('"', '').replace("'", '').split(',')
-                if col.strip()
-            ]
-            
-            if not categorical_columns_list:
-                return JSONResponse(
-                    status_code=400,
-                    content={"error": "No valid categorical columns provided"}
-                )
-            
-            logger.info(f"Processing with categorical columns: {categorical_columns_list}")
-            logger.info(f"Number of samples requested: {num_samples}")
-            
-            # Run pipeline with kwargs
-            pipeline = SyntheticDataPipeline(
-                input_file=filepath,
-                categorical_columns=categorical_columns_list,
-                output_dir=os.path.abspath(OUTPUT_FOLDER)
-            )
-            
-            pipeline.run_pipeline(
-                num_samples=num_samples,
-                epochs=100,
-                chunk_size=10000
-            )
-            
-            # Get latest generated file
-            output_dir = pipeline.output_dir
-            files = [f for f in os.listdir(output_dir) if f.startswith("synthetic_data_")]
-            
-            if not files:
-                raise Exception("No output file generated")
-                
-            latest_file = sorted(files)[-1]
-            output_path = os.path.join(output_dir, latest_file)
-            
-            logger.info(f"Sending file: {output_path}")
-            
-            return FileResponse(
-                path=output_path,
-                filename="synthetic_data.csv",
-                media_type="text/csv"
-            )
+            datasets = parse_batch_plan(plan, len(files))
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+
+        batch_id = batch_store.create()
+        upload_paths = []
+        for index, file in enumerate(files):
+            upload_paths.append(batch_store.upload_path(batch_id, index))
+            size = await spool_upload(file, upload_paths[-1])
+            logger.info(f"Batch {batch_id}: saved {file.filename} ({size} bytes)")
+
+        rejection = None
+        failure = None
+        manifest = None
+        try:
+            for index, dataset in enumerate(datasets):
+                job_id = None
+                try:
+                    job_id = job_manager.create_job()
+                    link_upload(upload_paths[dataset["file"]], job_manager.input_path(job_id))
+                    await queue_job(
+                        job_id, dataset["categorical_columns"], sum(dataset["sample_sizes"]),
+                        sample_sizes=dataset["sample_sizes"],
+                        **options
+                    )
+                    dataset["job_id"] = job_id
+                except AdmissionError as e:
+                    rejection = rejection or e
+                    dataset.update({"status": "failed", "error": str(e)})
+                except Exception as e:
+                    logger.error(f"Batch {batch_id}: could not queue dataset {index}: {e}")
+                    failure = failure or e
+                    dataset.update({"status": "failed", "error": str(e)})
+                    if job_id is not None:
+                        # Never queued: nothing else will clean up after it
+                        get_default_budget().release(job_id)
+                        shutil.rmtree(job_manager.job_dir(job_id), ignore_errors=True)
         finally:
-            # Clean up temp file
-            if os.path.exists(filepath):
-                os.unlink(filepath)
+            # Each job holds its own link to the upload it trains on
+            for path in upload_paths:
+                if os.path.exists(path):
+                    os.unlink(path)
+            # Queued jobs run regardless, so they stay reachable even if this request is cut short
+            if any(dataset.get("job_id") for dataset in datasets):
+                shared = {key: options[key] for key in ("engine", "metrics_level", "output_format", "privacy_filter")}
+                manifest = batch_store.save(batch_id, [file.filename for file in files], datasets, shared)
+
+        if manifest is None:
+            shutil.rmtree(batch_store.batch_dir(batch_id), ignore_errors=True)
+            raise rejection or failure
+        logger.info(f"Queued batch {batch_id} with {len(datasets)} dataset(s)")
+        return {
+            **batch_store.status(manifest, job_manager.get_status),
+            "status_url": f"/batches/{batch_id}",
+            "archive_url": f"/batches/{batch_id}/archive"
+        }
 
+    except AdmissionError as e:
+        return JSONResponse(status_code=e.status_code, content=e.payload(), headers=e.headers())
     except Exception as e:
-        logger.error(f"Error in generate_synthetic_data: {str(e)}")
+        logger.error(f"Error in submit_batch: {str(e)}")
         logger.error(traceback.format_exc())
         return JSONResponse(
             status_code=500,
             content={"error": str(e)}
         )
 
+@app.get("/batches/{batch_id}")
+def get_batch_status(batch_id: str):
+    manifest = batch_store.load(batch_id)
+    if manifest is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown batch {batch_id}"})
+    return batch_store.status(manifest, job_manager.get_status)
+
+@app.get("/batches/{batch_id}/outputs/{index}/{num_samples}")
+def get_batch_output(batch_id: str, index: int, num_samples: int):
+    manifest = batch_store.load(batch_id)
+    if manifest is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown batch {batch_id}"})
+    path = batch_store.output_path(manifest, index, num_samples, job_manager.get_status)
+    if path is None:
+        return JSONResponse(status_code=404, content={"error": f"No completed output of dataset {index} with {num_samples} rows"})
+    output_format = manifest["options"]["output_format"]
+    return FileResponse(
+        path=path,
+        filename=f"synthetic_data_{index}_{num_samples}_rows{output_extension(output_format)}",
+        media_type=media_type(output_format)
+    )
+
+@app.get("/batches/{batch_id}/archive")
+async def get_batch_archive(batch_id: str):
+    manifest = batch_store.load(batch_id)
+    if manifest is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown batch {batch_id}"})
+    status = batch_store.status(manifest, job_manager.get_status)
+    if status["status"] in ("queued", "running"):
+        return JSONResponse(
+            status_code=409,
+            content={"error": "Batch has not finished yet", "status": status["status"]}
+        )
+    path = await asyncio.to_thread(batch_store.build_archive, batch_id, status, job_manager.get_status)
+    return FileResponse(path=path, filename=f"batch_{batch_id}.zip", media_type="application/zip")
+
 # Add this section to run the server when the script is executed directly
 if __name__ == "__main__":
     # Get port from environment variable or use default
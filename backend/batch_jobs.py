@@ -0,0 +1,242 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import zipfile
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from job_manager import COMPLETED, QUEUED, RUNNING, TERMINAL_STATES, WORKSPACE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "batch.json"
+ARCHIVE_FILE = "outputs.zip"
+# Datasets (file and column set pairs) per batch; each one is a pool job
+BATCH_MAX_DATASETS = int(os.getenv("BATCH_MAX_DATASETS", "20"))
+# Output formats that are compressed by their writer are stored in the archive as is
+STORED_EXTENSIONS = (".gz", ".parquet", ".arrow")
+
+
+def _split_columns(columns) -> List[str]:
+    if isinstance(columns, str):
+        columns = columns.split(",")
+    if not isinstance(columns, list) or not all(isinstance(col, str) for col in columns):
+        raise ValueError("categorical_columns must be a list of column names or a comma-separated string")
+    return [col.strip() for col in columns if col.strip()]
+
+
+def _positive_ints(value) -> List[int]:
+    values = value if isinstance(value, list) else [value]
+    if not values or not all(isinstance(v, int) and not isinstance(v, bool) and v > 0 for v in values):
+        raise ValueError("num_samples must be a positive integer or a non-empty list of them")
+    return values
+
+
+def parse_batch_plan(plan: str, num_files: int) -> List[Dict]:
+    """Parse the ``plan`` form field into one entry per dataset to train.
+
+    The plan is a JSON list of ``{"file": i, "categorical_columns": [...], "num_samples": n}``
+    where ``file`` indexes the uploaded files (default 0) and ``num_samples`` is one size
+    or a list of them. Entries for the same file and column set are merged, so each
+    dataset is trained once and sampled at every size asked for. Raises ValueError on
+    malformed input.
+    """
+    try:
+        parsed = json.loads(plan)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"plan is not valid JSON: {e}")
+    if not isinstance(parsed, list) or not parsed:
+        raise ValueError("plan must be a non-empty list of datasets")
+    datasets: Dict[tuple, Dict] = {}
+    for entry in parsed:
+        if not isinstance(entry, dict):
+            raise ValueError("Each plan entry must be an object")
+        file_index = entry.get("file", 0)
+        if not isinstance(file_index, int) or isinstance(file_index, bool) or not 0 <= file_index < num_files:
+            raise ValueError(f"file must index one of the {num_files} uploaded file(s)")
+        columns = _split_columns(entry.get("categorical_columns", []))
+        if not columns:
+            raise ValueError("Each plan entry needs categorical_columns")
+        sizes = _positive_ints(entry.get("num_samples", 1000))
+        dataset = datasets.setdefault((file_index, tuple(columns)), {
+            "file": file_index,
+            "categorical_columns": columns,
+            "sample_sizes": []
+        })
+        dataset["sample_sizes"] = sorted(set(dataset["sample_sizes"]) | set(sizes))
+    if len(datasets) > BATCH_MAX_DATASETS:
+        raise ValueError(f"plan has {len(datasets)} datasets, at most {BATCH_MAX_DATASETS} are allowed")
+    return list(datasets.values())
+
+
+def _archive_folder(index: int, filename: str, columns: List[str]) -> str:
+    stem = os.path.splitext(os.path.basename(filename or "upload"))[0]
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", f"{stem}-{'_'.join(columns)}")[:80]
+    return f"{index:02d}_{name}"
+
+
+class BatchStore:
+    """Manifests of batch requests, one directory per batch under ``root``.
+
+    A batch is a set of ordinary pool jobs, one per dataset; its manifest records which
+    job serves which file, column set and sample sizes, so any Gunicorn worker can report
+    on it and serve its outputs. Uploads are spooled here once and linked into the job
+    workspaces, and the zip of all outputs is built here on first download. Batch
+    directories are removed once all their jobs have finished and outlived their TTL.
+    """
+
+    def __init__(self, root: str = "batches"):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def batch_dir(self, batch_id: str) -> str:
+        return os.path.join(self.root, batch_id)
+
+    def create(self) -> str:
+        batch_id = uuid.uuid4().hex
+        os.makedirs(self.batch_dir(batch_id))
+        return batch_id
+
+    def upload_path(self, batch_id: str, index: int) -> str:
+        return os.path.join(self.batch_dir(batch_id), f"upload_{index}.csv")
+
+    def save(self, batch_id: str, files: List[str], datasets: List[Dict], options: Dict) -> Dict:
+        """Write the manifest: uploaded file names, datasets with their job ids, and shared options."""
+        manifest = {
+            "batch_id": batch_id,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "files": files,
+            "options": options,
+            "datasets": datasets
+        }
+        path = os.path.join(self.batch_dir(batch_id), MANIFEST_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, path)
+        return manifest
+
+    def load(self, batch_id: str) -> Optional[Dict]:
+        if not batch_id.isalnum():
+            return None
+        try:
+            with open(os.path.join(self.batch_dir(batch_id), MANIFEST_FILE)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def status(self, manifest: Dict, get_status: Callable[[str], Optional[Dict]]) -> Dict:
+        """The manifest with each dataset's job status and output URLs, and an overall status.
+
+        The batch is ``queued`` or ``running`` until every job has finished, then
+        ``completed``, ``failed`` when none completed, or ``partial``.
+        """
+        batch_id = manifest["batch_id"]
+        datasets = []
+        for index, dataset in enumerate(manifest["datasets"]):
+            job = get_status(dataset["job_id"]) if dataset.get("job_id") else None
+            state = job["status"] if job else dataset.get("status", "failed")
+            entry = {**dataset, "status": state}
+            if job and job.get("error"):
+                entry["error"] = job["error"]
+            if state == COMPLETED:
+                entry["outputs"] = [
+                    {"num_samples": size, "url": f"/batches/{batch_id}/outputs/{index}/{size}"}
+                    for size in dataset["sample_sizes"]
+                ]
+            datasets.append(entry)
+        states = [entry["status"] for entry in datasets]
+        if not all(state in TERMINAL_STATES for state in states):
+            overall = QUEUED if all(state == QUEUED for state in states) else RUNNING
+        elif all(state == COMPLETED for state in states):
+            overall = COMPLETED
+        elif COMPLETED not in states:
+            overall = "failed"
+        else:
+            overall = "partial"
+        return {**manifest, "status": overall, "datasets": datasets}
+
+    def output_path(self, manifest: Dict, index: int, num_samples: int, get_status: Callable[[str], Optional[Dict]]) -> Optional[str]:
+        """Result file of one dataset at one size, or None when it does not exist (yet)."""
+        if not 0 <= index < len(manifest["datasets"]):
+            return None
+        job_id = manifest["datasets"][index].get("job_id")
+        job = get_status(job_id) if job_id else None
+        if not job or job.get("status") != COMPLETED:
+            return None
+        return (job.get("result_files") or {}).get(str(num_samples))
+
+    def build_archive(self, batch_id: str, status: Dict, get_status: Callable[[str], Optional[Dict]]) -> str:
+        """Zip every completed output with its metadata, plus the batch status as ``manifest.json``.
+
+        Built once per batch into its directory; concurrent builders each write a temporary
+        file and the last rename wins, which is harmless since they hold the same content.
+        """
+        path = os.path.join(self.batch_dir(batch_id), ARCHIVE_FILE)
+        if os.path.exists(path):
+            return path
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with zipfile.ZipFile(tmp_path, 'w') as archive:
+            archive.writestr("manifest.json", json.dumps(status, indent=2))
+            for index, dataset in enumerate(status["datasets"]):
+                if dataset["status"] != COMPLETED:
+                    continue
+                folder = _archive_folder(index, status["files"][dataset["file"]], dataset["categorical_columns"])
+                for size in dataset["sample_sizes"]:
+                    output_file = self.output_path(status, index, size, get_status)
+                    if output_file is None:
+                        continue
+                    output_dir = os.path.dirname(output_file)
+                    for name in sorted(os.listdir(output_dir)):
+                        compression = zipfile.ZIP_STORED if name.endswith(STORED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+                        archive.write(os.path.join(output_dir, name), f"{folder}/{size}_rows/{name}", compress_type=compression)
+        os.replace(tmp_path, path)
+        logger.info(f"Built archive of batch {batch_id} at {path}")
+        return path
+
+    def _finished_at(self, batch_id: str, manifest: Dict, get_status: Callable[[str], Optional[Dict]]) -> float:
+        """When the batch last changed: its manifest was saved or its last job finished."""
+        finished = os.path.getmtime(os.path.join(self.batch_dir(batch_id), MANIFEST_FILE))
+        for dataset in manifest["datasets"]:
+            job = get_status(dataset["job_id"]) if dataset.get("job_id") else None
+            if job and job.get("finished_at"):
+                finished = max(finished, datetime.fromisoformat(job["finished_at"]).timestamp())
+        return finished
+
+    def collect_garbage(self, get_status: Callable[[str], Optional[Dict]], ttl_seconds: int = WORKSPACE_TTL_SECONDS) -> int:
+        """Remove batch directories whose jobs all finished more than ``ttl_seconds`` ago.
+
+        A batch with a queued or running job is kept however long it has been going, so
+        its manifest and outputs stay reachable for the whole run. A directory without a
+        manifest belongs to a submission that never queued anything and is judged by its
+        modification time. Returns the number of batches removed.
+        """
+        if not os.path.isdir(self.root):
+            return 0
+        now = time.time()
+        removed = 0
+        for batch_id in os.listdir(self.root):
+            path = self.batch_dir(batch_id)
+            if not os.path.isdir(path):
+                continue
+            manifest = self.load(batch_id)
+            try:
+                if manifest is None:
+                    finished = os.path.getmtime(path)
+                elif self.status(manifest, get_status)["status"] in (QUEUED, RUNNING):
+                    continue
+                else:
+                    finished = self._finished_at(batch_id, manifest, get_status)
+            except FileNotFoundError:
+                continue  # Collected concurrently by another worker
+            if now - finished < ttl_seconds:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        if removed:
+            logger.info(f"Removed {removed} stale batch(es) from {self.root}")
+        return removed
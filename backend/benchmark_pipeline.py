@@ -0,0 +1,214 @@
+"""Benchmark SyntheticDataPipeline stages over a grid of generated categorical datasets.
+
+Example:
+
+    python benchmark_pipeline.py --rows 1000,100000 --columns 5,50 --cardinality 5,100 \\
+        --engine chow_liu --output bench.json
+    python benchmark_pipeline.py ... --output new.json --compare bench.json
+
+Each stage is timed and its peak RSS is sampled in a background thread. Results are
+written as JSON, tagged with the current git commit. ``--compare`` reports stages that
+got slower than ``--threshold`` against an earlier results file.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import platform
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import psutil
+
+from instrumentation import PeakRssSampler
+from synthetic_data_pipeline import SyntheticDataPipeline
+
+# Pipeline order, in which stages are reported
+STAGES = (
+    "load_data", "preprocess_data", "fit", "sample",
+    "validate_synthetic_data", "save_outputs", "compress_files"
+)
+RSS_SAMPLE_SECONDS = 0.02
+
+
+def generate_dataset(rows: int, columns: int, cardinality: int, seed: int = 0) -> pd.DataFrame:
+    """Categorical frame with Zipf-skewed values, each column partly copying the previous one.
+
+    The copy probability gives the pairwise dependencies a synthesizer has to learn, so
+    benchmarks do not only measure independent columns.
+    """
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, cardinality + 1)
+    weights /= weights.sum()
+    data = {}
+    previous = None
+    for i in range(columns):
+        codes = rng.choice(cardinality, size=rows, p=weights)
+        if previous is not None:
+            copy = rng.random(rows) < 0.5
+            codes[copy] = previous[copy]
+        data[f"col_{i}"] = np.char.add(f"c{i}_", codes.astype(str))
+        previous = codes
+    return pd.DataFrame(data)
+
+
+@contextmanager
+def stage(results: Dict, name: str):
+    with PeakRssSampler(RSS_SAMPLE_SECONDS) as sampler:
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+    results[name] = {"seconds": round(elapsed, 4), "peak_rss_mb": round(sampler.peak / 1024 ** 2, 1)}
+
+
+def run_case(rows: int, columns: int, cardinality: int, args) -> Dict:
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_file = os.path.join(work_dir, "input.csv")
+        dataset = generate_dataset(rows, columns, cardinality, seed=args.seed)
+        dataset.to_csv(input_file, index=False)
+        del dataset
+
+        pipeline = SyntheticDataPipeline(
+            input_file=input_file,
+            categorical_columns=[f"col_{i}" for i in range(columns)],
+            output_dir=os.path.join(work_dir, "output"),
+            engine=args.engine,
+            metrics_level=args.metrics_level
+        )
+        stages: Dict = {}
+        try:
+            with stage(stages, "load_data"):
+                real_data = pipeline.load_data()
+            with stage(stages, "preprocess_data"):
+                processed = pipeline.preprocess_data(real_data)
+            with stage(stages, "fit"):
+                synthesizer = pipeline.fit_synthesizer(processed, epochs=args.epochs, max_train_seconds=args.max_train_seconds)
+            with stage(stages, "sample"):
+                synthetic = pd.concat(
+                    pipeline.iter_synthetic_data(synthesizer, args.num_samples or rows, args.chunk_size),
+                    ignore_index=True
+                )
+            with stage(stages, "validate_synthetic_data"):
+                metrics = pipeline.validate_synthetic_data(real_data, synthetic)
+            with stage(stages, "save_outputs"):
+                pipeline.save_outputs(synthetic, metrics, output_format=args.output_format)
+            with stage(stages, "compress_files"):
+                pipeline.compress_files(datetime.now().strftime("%Y%m%d_%H%M%S"))
+            output_bytes = os.path.getsize(pipeline.output_file)
+        finally:
+            pipeline.close_logging()
+
+    return {
+        "rows": rows,
+        "columns": columns,
+        "cardinality": cardinality,
+        "num_samples": args.num_samples or rows,
+        "stages": stages,
+        "total_seconds": round(sum(s["seconds"] for s in stages.values()), 4),
+        "peak_rss_mb": max(s["peak_rss_mb"] for s in stages.values()),
+        "output_bytes": output_bytes,
+        "training": pipeline.metadata.get("training", {})
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ordered_stages(stages: Dict) -> List[str]:
+    """Stage names in pipeline order; any not in ``STAGES`` (e.g. from older results) follow."""
+    return [name for name in STAGES if name in stages] + [name for name in stages if name not in STAGES]
+
+
+def case_key(case: Dict) -> tuple:
+    return case["rows"], case["columns"], case["cardinality"]
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Describe every stage that is more than ``threshold`` (relative) slower than the baseline."""
+    baseline_cases = {case_key(c): c for c in baseline["cases"]}
+    regressions = []
+    for case in current["cases"]:
+        old = baseline_cases.get(case_key(case))
+        if old is None:
+            continue
+        for name in ordered_stages(case["stages"]):
+            timing = case["stages"][name]
+            before = old["stages"].get(name, {}).get("seconds")
+            if before and timing["seconds"] > before * (1 + threshold):
+                regressions.append(
+                    f"rows={case['rows']} columns={case['columns']} cardinality={case['cardinality']} "
+                    f"{name}: {before:.3f}s -> {timing['seconds']:.3f}s"
+                )
+    return regressions
+
+
+def parse_ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=parse_ints, default=[1000, 10000], help="comma-separated row counts")
+    parser.add_argument("--columns", type=parse_ints, default=[5, 20], help="comma-separated column counts")
+    parser.add_argument("--cardinality", type=parse_ints, default=[5, 50], help="comma-separated categories per column")
+    parser.add_argument("--engine", default="chow_liu", help="synthesizer engine (ctgan or chow_liu)")
+    parser.add_argument("--epochs", type=int, default=10, help="maximum CTGAN epochs")
+    parser.add_argument("--max-train-seconds", type=float, default=None)
+    parser.add_argument("--num-samples", type=int, default=None, help="rows to sample (default: same as input)")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--metrics-level", default="full")
+    parser.add_argument("--output-format", default="csv")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", default=None, help="earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "total_memory_mb": round(psutil.virtual_memory().total / 1024 ** 2)
+        },
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "cases": []
+    }
+    for rows, columns, cardinality in itertools.product(args.rows, args.columns, args.cardinality):
+        print(f"rows={rows} columns={columns} cardinality={cardinality} ...", flush=True)
+        case = run_case(rows, columns, cardinality, args)
+        results["cases"].append(case)
+        print("  " + ", ".join(f"{name}={case['stages'][name]['seconds']:.3f}s" for name in ordered_stages(case["stages"]))
+              + f", peak RSS {case['peak_rss_mb']}MB", flush=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
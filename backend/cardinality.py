@@ -0,0 +1,190 @@
+import os
+import zlib
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+OTHER_TOKEN = "__OTHER__"
+# Near-unique detection is skipped below this many rows, where every column looks unique
+NEAR_UNIQUE_MIN_ROWS = 100
+
+
+class CardinalityPolicy:
+    """How many distinct values a column may bring into the model.
+
+    ``max_categories`` keeps the K most frequent values, ``min_frequency`` drops values
+    seen less often than this share of rows (or count, when >= 1), and columns whose
+    distinct values reach ``near_unique_ratio`` of the rows (IDs, free text) are bucketed
+    entirely. Dropped values go to one ``__OTHER__`` token, or to ``hash_buckets``
+    stable hash buckets when set. ``None`` or 0 turns a setting off.
+    """
+
+    def __init__(
+        self,
+        max_categories: Optional[int] = None,
+        min_frequency: Optional[float] = None,
+        hash_buckets: Optional[int] = None,
+        near_unique_ratio: Optional[float] = 0.95
+    ):
+        self.max_categories = max_categories
+        self.min_frequency = min_frequency
+        self.hash_buckets = hash_buckets
+        self.near_unique_ratio = near_unique_ratio
+
+    @classmethod
+    def from_env(cls) -> "CardinalityPolicy":
+        def read(name, cast, default=None):
+            # An explicit 0 is kept, and turns the setting off
+            value = os.getenv(name)
+            return cast(value) if value not in (None, "") else default
+
+        return cls(
+            max_categories=read("CARDINALITY_MAX_CATEGORIES", int, 500),
+            min_frequency=read("CARDINALITY_MIN_FREQUENCY", float),
+            hash_buckets=read("CARDINALITY_HASH_BUCKETS", int),
+            near_unique_ratio=read("CARDINALITY_NEAR_UNIQUE_RATIO", float, 0.95)
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "max_categories": self.max_categories,
+            "min_frequency": self.min_frequency,
+            "hash_buckets": self.hash_buckets,
+            "near_unique_ratio": self.near_unique_ratio
+        }
+
+
+def _bucket_token(value: str, hash_buckets: Optional[int]) -> str:
+    if not hash_buckets:
+        return OTHER_TOKEN
+    return f"{OTHER_TOKEN}{zlib.crc32(value.encode()) % hash_buckets}"
+
+
+class CardinalityReducer:
+    """Applies a ``CardinalityPolicy`` before fitting and undoes it after sampling.
+
+    For every bucket token it stores the empirical distribution of the values it
+    replaced; sampled bucket tokens are redrawn from that distribution, so the output
+    keeps the real long tail while the model only sees a bounded number of categories.
+    """
+
+    def __init__(self, policy: CardinalityPolicy, random_state: Optional[int] = None):
+        self.policy = policy
+        # column -> token -> (values, cumulative probabilities)
+        self.buckets: Dict[str, Dict[str, tuple]] = {}
+        self.summary: Dict[str, Dict] = {}
+        self._rng = np.random.default_rng(random_state)
+
+    def _kept_mask(self, counts: pd.Series, num_rows: int) -> np.ndarray:
+        policy = self.policy
+        keep = np.ones(len(counts), dtype=bool)
+        if policy.near_unique_ratio and num_rows >= NEAR_UNIQUE_MIN_ROWS \
+                and len(counts) >= policy.near_unique_ratio * num_rows:
+            return np.zeros(len(counts), dtype=bool)
+        if policy.min_frequency:
+            threshold = policy.min_frequency * num_rows if policy.min_frequency < 1 else policy.min_frequency
+            keep &= counts.to_numpy() >= threshold
+        if policy.max_categories:
+            # counts is sorted by frequency, so the first K positions are the top K
+            keep[policy.max_categories:] = False
+        return keep
+
+    def fit_column(self, col: str, categories: np.ndarray, counts: np.ndarray) -> Optional[tuple]:
+        """Decide which of a column's categories are bucketed, from its per-code row counts.
+
+        Returns the lookup from old to new codes and the new categories, or None when
+        every value is kept. Unused categories map to -1.
+        """
+        counts = pd.Series(counts, index=pd.Index(categories, dtype=object).astype(str))
+        counts = counts[counts > 0].sort_values(ascending=False, kind="stable")
+        keep = self._kept_mask(counts, int(counts.sum()))
+        if keep.all():
+            return None
+
+        kept_values = list(counts.index[keep])
+        dropped = counts[~keep]
+        if self.policy.hash_buckets:
+            tokens = np.array([_bucket_token(v, self.policy.hash_buckets) for v in dropped.index], dtype=object)
+        else:
+            tokens = np.full(len(dropped), OTHER_TOKEN, dtype=object)
+        self.buckets[col] = {}
+        for token, group in dropped.groupby(tokens, sort=False):
+            probs = group.to_numpy(dtype=float) / group.sum()
+            self.buckets[col][token] = (np.asarray(group.index, dtype=object), np.cumsum(probs))
+
+        # Remap codes through a per-category lookup table instead of touching every row's string
+        new_categories = pd.Index(kept_values + sorted(self.buckets[col]))
+        token_for = pd.Series(counts.index, index=counts.index, dtype=object)
+        token_for.loc[dropped.index] = tokens
+        lookup = np.full(len(categories), -1, dtype=np.int64)
+        positions = pd.Index(categories, dtype=object).astype(str).get_indexer(counts.index)
+        lookup[positions] = new_categories.get_indexer(token_for.to_numpy())
+
+        self.summary[col] = {
+            "categories": int(len(counts)),
+            "kept": int(keep.sum()),
+            "bucketed": int((~keep).sum()),
+            "buckets": len(self.buckets[col]),
+            "near_unique": bool(not keep.any())
+        }
+        logger.info(f"Column {col}: kept {keep.sum()} of {len(counts)} categories, bucketed the rest into {len(self.buckets[col])} token(s)")
+        return lookup, new_categories
+
+    def fit_transform(self, data: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+        """Replace dropped values with bucket tokens, keeping columns dictionary-encoded."""
+        reduced = {}
+        for col in columns:
+            column = data[col]
+            if not isinstance(column.dtype, pd.CategoricalDtype):
+                column = column.astype("category")
+            codes = column.cat.codes.to_numpy()
+            counts = np.bincount(codes[codes >= 0], minlength=len(column.cat.categories))
+            remapped = self.fit_column(col, np.asarray(column.cat.categories, dtype=object), counts)
+            if remapped is None:
+                reduced[col] = column
+                continue
+            lookup, new_categories = remapped
+            new_codes = np.where(codes >= 0, lookup[codes], -1)
+            reduced[col] = pd.Series(pd.Categorical.from_codes(new_codes, categories=new_categories), index=column.index)
+        return pd.DataFrame(reduced)
+
+    def fit_transform_store(self, store, path: str):
+        """``fit_transform`` for an ``EncodedStore``: bucketed columns are recoded into ``path``."""
+        lookups = {}
+        for col in store.columns:
+            remapped = self.fit_column(col, store.categories[col], store.category_counts(col))
+            if remapped is not None:
+                lookups[col] = remapped
+        return store.remap(lookups, path) if lookups else store
+
+    def set_random_state(self, random_state: Optional[int]) -> None:
+        self._rng = np.random.default_rng(random_state)
+
+    def model_value(self, col: str, value: str) -> str:
+        """The value the model saw in place of ``value``: its bucket token, or itself when kept."""
+        for token, (originals, _) in self.buckets.get(col, {}).items():
+            if (originals == value).any():
+                return token
+        return value
+
+    def expand_column(self, col: str, values: np.ndarray) -> None:
+        """Redraw the bucket tokens of one object array in place."""
+        for token, (originals, cumulative) in self.buckets.get(col, {}).items():
+            rows = np.flatnonzero(values == token)
+            if len(rows):
+                picks = np.searchsorted(cumulative, self._rng.random(len(rows)), side='right')
+                values[rows] = originals[np.minimum(picks, len(originals) - 1)]
+
+    def expand(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Redraw every bucket token from the distribution of the values it replaced."""
+        for col in self.buckets:
+            if col not in data.columns:
+                continue
+            values = data[col].to_numpy(dtype=object)
+            self.expand_column(col, values)
+            data[col] = values
+        return data
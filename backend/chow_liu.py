@@ -0,0 +1,242 @@
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from encoded_store import EncodedStore
+
+logger = logging.getLogger(__name__)
+
+# Rows sampled per vectorized pass; bounds temporary arrays for very large requests
+SAMPLE_BATCH_ROWS = 1_000_000
+
+
+class _Recoded:
+    """Columns of codes mapped through per-column lookups when indexed."""
+
+    def __init__(self, parts: List[tuple]):
+        self.parts = parts
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        lookup, codes = self.parts[index]
+        return lookup[codes]
+
+
+class ChowLiuSynthesizer:
+    """Tree-structured Bayesian network over integer-coded categorical columns.
+
+    Fitting computes pairwise mutual information from contingency counts, keeps the maximum
+    spanning tree (the Chow-Liu tree) and stores one conditional probability table per edge.
+    Sampling draws the root from its marginal and every other column from its parent's row
+    of the table, all with batched ``np.random.Generator`` draws. Exposes the same
+    ``fit``/``sample`` interface as ``CTGAN`` so the pipeline can use either.
+    """
+
+    def __init__(self, random_state: Optional[int] = None):
+        self.random_state = random_state
+        self.columns: List[str] = []
+        self.categories: List[np.ndarray] = []
+        self.parents: List[int] = []
+        self.order: List[int] = []
+        self.cumulative_tables: List[np.ndarray] = []
+        self.counts: List[np.ndarray] = []
+        self.new_categories: Dict[str, List[str]] = {}
+        self._rng = np.random.default_rng(random_state)
+
+    @staticmethod
+    def _encode(train_data, col: str):
+        if isinstance(train_data, EncodedStore):
+            # Memory-mapped: only the columns of the pair being counted are read
+            return train_data.codes(col), train_data.categories[col]
+        column = train_data[col]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            return column.cat.codes.to_numpy().astype(np.int64), np.asarray(column.cat.categories, dtype=object)
+        codes, uniques = pd.factorize(column, use_na_sentinel=False)
+        return codes.astype(np.int64), np.asarray(uniques, dtype=object)
+
+    @staticmethod
+    def _joint_counts(a: np.ndarray, b: np.ndarray, ka: int, kb: int) -> np.ndarray:
+        return np.bincount(a.astype(np.int64) * kb + b, minlength=ka * kb).reshape(ka, kb)
+
+    @staticmethod
+    def _mutual_information(joint: np.ndarray) -> float:
+        total = joint.sum()
+        p_ab = joint / total
+        p_a = p_ab.sum(axis=1, keepdims=True)
+        p_b = p_ab.sum(axis=0, keepdims=True)
+        nonzero = p_ab > 0
+        return float(np.sum(p_ab[nonzero] * np.log(p_ab[nonzero] / (p_a @ p_b)[nonzero])))
+
+    def fit(self, train_data, discrete_columns=()) -> "ChowLiuSynthesizer":
+        """Fit the tree on a frame or an ``EncodedStore``; every column is treated as discrete."""
+        self.columns = list(train_data.columns)
+        encoded = [self._encode(train_data, col) for col in self.columns]
+        codes = [c for c, _ in encoded]
+        self.categories = [cats for _, cats in encoded]
+        sizes = [len(cats) for cats in self.categories]
+        n_cols = len(self.columns)
+
+        mutual_info = np.zeros((n_cols, n_cols))
+        for i in range(n_cols):
+            for j in range(i + 1, n_cols):
+                joint = self._joint_counts(codes[i], codes[j], sizes[i], sizes[j])
+                mutual_info[i, j] = mutual_info[j, i] = self._mutual_information(joint)
+
+        # Prim's algorithm for the maximum spanning tree, rooted at column 0
+        self.parents = [-1] * n_cols
+        self.order = [0]
+        in_tree = np.zeros(n_cols, dtype=bool)
+        in_tree[0] = True
+        best = mutual_info[0].copy()
+        best_parent = np.zeros(n_cols, dtype=int)
+        for _ in range(n_cols - 1):
+            candidates = np.where(in_tree, -np.inf, best)
+            child = int(np.argmax(candidates))
+            self.parents[child] = int(best_parent[child])
+            self.order.append(child)
+            in_tree[child] = True
+            improved = mutual_info[child] > best
+            best = np.where(improved, mutual_info[child], best)
+            best_parent = np.where(improved, child, best_parent)
+
+        self.counts = [self._edge_counts(codes, sizes, col) for col in range(n_cols)]
+        self.new_categories = {}
+        self._update_tables()
+
+        edges = [(self.columns[p], self.columns[c]) for c, p in enumerate(self.parents) if p >= 0]
+        logger.info(f"Fitted Chow-Liu tree over {n_cols} columns with edges {edges}")
+        return self
+
+    def _edge_counts(self, codes: List[np.ndarray], sizes: List[int], col: int) -> np.ndarray:
+        parent = self.parents[col]
+        if parent < 0:
+            return np.bincount(codes[col], minlength=sizes[col])[None, :].astype(float)
+        return self._joint_counts(codes[parent], codes[col], sizes[parent], sizes[col]).astype(float)
+
+    def _update_tables(self) -> None:
+        self.cumulative_tables = []
+        for table in self.counts:
+            self.cumulative_tables.append(np.cumsum(table / np.maximum(table.sum(axis=1, keepdims=True), 1), axis=1))
+
+    def partial_fit(self, train_data, discrete_columns=()) -> "ChowLiuSynthesizer":
+        """Add the counts of new rows to the fitted tree, keeping its structure.
+
+        Values not seen before are appended to their column's categories and the tables
+        grow to match, so appending rows to a dataset never requires a refit.
+        """
+        if not self.counts:
+            raise ValueError("This model was saved without its counts and cannot be updated")
+        self.new_categories = {}
+        codes = []
+        for i, col in enumerate(self.columns):
+            col_codes, col_categories = self._encode(train_data, col)
+            present = np.bincount(col_codes, minlength=len(col_categories)) > 0
+            unseen = pd.Index(col_categories[present]).difference(pd.Index(self.categories[i]), sort=False)
+            if len(unseen):
+                self.categories[i] = np.concatenate([self.categories[i], np.asarray(unseen, dtype=object)])
+                self.new_categories[col] = [str(v) for v in unseen]
+            codes.append((pd.Index(self.categories[i]).get_indexer(col_categories), col_codes))
+        # Recoded one edge at a time, so a store's columns are never all in memory at once
+        codes = _Recoded(codes)
+        sizes = [len(cats) for cats in self.categories]
+
+        for col in range(len(self.columns)):
+            old = self.counts[col]
+            rows = 1 if self.parents[col] < 0 else sizes[self.parents[col]]
+            grown = np.zeros((rows, sizes[col]))
+            grown[:old.shape[0], :old.shape[1]] = old
+            self.counts[col] = grown + self._edge_counts(codes, sizes, col)
+        self._update_tables()
+        logger.info(f"Updated Chow-Liu tree with {len(train_data)} rows; new categories: {self.new_categories}")
+        return self
+
+    def set_random_state(self, random_state: Optional[int]) -> None:
+        """Reseed sampling, e.g. so parallel shards draw independent streams."""
+        self._rng = np.random.default_rng(random_state)
+
+    def __getstate__(self) -> Dict:
+        # The generator state is not saved, or every cache and registry hit would replay the same rows
+        state = dict(self.__dict__)
+        state.pop("_rng", None)
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self._rng = np.random.default_rng(self.random_state)
+
+    def _conditioned_tables(self, conditions: Dict[str, str]) -> List[np.ndarray]:
+        """Cumulative tables of the tree conditioned on fixed column values.
+
+        One upward pass multiplies each parent by its children's evidence likelihoods, then
+        every table is reweighted by its own column's likelihood and renormalized. Sampling
+        the reweighted tree top-down draws exactly from the conditional distribution.
+        """
+        likelihood = [np.ones(len(cats)) for cats in self.categories]
+        for name, value in conditions.items():
+            col = self.columns.index(name)
+            matches = np.flatnonzero(self.categories[col].astype(str) == str(value))
+            if len(matches) == 0:
+                raise ValueError(f"Value '{value}' never occurs in column '{name}' of the training data")
+            likelihood[col] = np.zeros(len(self.categories[col]))
+            likelihood[col][matches[0]] = 1.0
+
+        tables = [np.diff(cumulative, axis=1, prepend=0.0) for cumulative in self.cumulative_tables]
+        for col in reversed(self.order):
+            parent = self.parents[col]
+            if parent >= 0:
+                message = tables[col] @ likelihood[col]
+                # Rescaled so long chains of evidence do not underflow
+                likelihood[parent] = likelihood[parent] * message / max(message.max(), 1e-300)
+
+        conditioned = []
+        for col, table in enumerate(tables):
+            weighted = table * likelihood[col][None, :]
+            totals = weighted.sum(axis=1, keepdims=True)
+            if self.parents[col] < 0 and totals[0, 0] == 0:
+                raise ValueError(f"Conditions {conditions} never occur together in the training data")
+            conditioned.append(np.cumsum(weighted / np.where(totals > 0, totals, 1.0), axis=1))
+        return conditioned
+
+    def sample_conditioned(self, n: int, conditions: Dict[str, str]) -> pd.DataFrame:
+        """Sample ``n`` rows that all have the given column values, with no rejected draws."""
+        return self.sample(n, self._conditioned_tables(conditions))
+
+    def _sample_codes(self, n: int, tables: List[np.ndarray]) -> np.ndarray:
+        codes = np.empty((n, len(self.columns)), dtype=np.int64)
+        for col in self.order:
+            cumulative = tables[col]
+            draws = self._rng.random(n)
+            parent = self.parents[col]
+            if parent < 0:
+                codes[:, col] = np.searchsorted(cumulative[0], draws, side='right')
+                continue
+            # Group rows by parent value so each group is one searchsorted call
+            parent_codes = codes[:, parent]
+            row_order = np.argsort(parent_codes, kind='stable')
+            bounds = np.cumsum(np.bincount(parent_codes, minlength=cumulative.shape[0]))
+            start = 0
+            for value, end in enumerate(bounds):
+                if end > start:
+                    rows = row_order[start:end]
+                    codes[rows, col] = np.searchsorted(cumulative[value], draws[rows], side='right')
+                start = end
+        # Guard against rounding in the last cumulative bin
+        for col, cats in enumerate(self.categories):
+            np.minimum(codes[:, col], len(cats) - 1, out=codes[:, col])
+        return codes
+
+    def sample(self, n: int, tables: Optional[List[np.ndarray]] = None) -> pd.DataFrame:
+        tables = tables if tables is not None else self.cumulative_tables
+        batches = []
+        remaining = n
+        while remaining > 0:
+            batch = min(remaining, SAMPLE_BATCH_ROWS)
+            codes = self._sample_codes(batch, tables)
+            batches.append(pd.DataFrame({
+                col: self.categories[i][codes[:, i]] for i, col in enumerate(self.columns)
+            }))
+            remaining -= batch
+        if not batches:
+            return pd.DataFrame({col: pd.Series(dtype=object) for col in self.columns})
+        return pd.concat(batches, ignore_index=True) if len(batches) > 1 else batches[0]
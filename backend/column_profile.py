@@ -0,0 +1,219 @@
+import io
+import csv
+import math
+import time
+from datetime import datetime
+from typing import BinaryIO, Dict, Optional
+
+from admission import CTGAN_FIT_SECONDS, NA_VALUES, env_number, estimate_job, extrapolate_distinct, model_width
+
+# Upload prefix parsed per profile; clients may send just this slice of the file
+PROFILE_SAMPLE_BYTES = 2 * 1024 * 1024
+# Values kept exactly per column before the count moves to a HyperLogLog sketch
+EXACT_DISTINCT_LIMIT = 2048
+HLL_PRECISION = 12
+BOOLEAN_VALUES = frozenset({"true", "false", "yes", "no", "t", "f", "y", "n"})
+# A type is inferred when all sampled non-missing values parse as it
+TYPE_ORDER = ("boolean", "integer", "float", "datetime")
+NEAR_UNIQUE_MIN_ROWS = 100
+
+
+class HyperLogLog:
+    """Distinct-count sketch with ``2 ** precision`` one-byte registers (~1.6% error at 12)."""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+        self._rest_bits = 64 - precision
+
+    def add(self, value: str) -> None:
+        # hash() is salted per process, which is fine for a sketch that lives one request
+        x = hash(value) & 0xFFFFFFFFFFFFFFFF
+        index = x >> self._rest_bits
+        rank = self._rest_bits - (x & ((1 << self._rest_bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        m = self.size
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are still empty
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class ColumnStats:
+    """Missing count, distinct count and candidate types of one column, updated value by value."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.missing = 0
+        self.counts = {}
+        self.sketch = None
+        self.types = list(TYPE_ORDER)
+
+    def add(self, value: str) -> None:
+        if value in NA_VALUES:
+            self.missing += 1
+            return
+        if self.sketch is not None:
+            self.sketch.add(value)
+        elif value in self.counts:
+            self.counts[value] += 1
+        else:
+            self.counts[value] = 1
+            if len(self.counts) > EXACT_DISTINCT_LIMIT:
+                self.sketch = HyperLogLog()
+                for seen in self.counts:
+                    self.sketch.add(seen)
+                self.counts = {}
+            # Types only need checking once per distinct value
+            if self.types:
+                self.types = [t for t in self.types if _parses_as(t, value)]
+
+    @property
+    def distinct(self) -> int:
+        return self.sketch.count() if self.sketch is not None else len(self.counts)
+
+    def singletons(self):
+        """Values seen exactly once and exactly twice, or ``None`` once the column is sketched."""
+        if self.sketch is not None:
+            return None
+        once = sum(1 for count in self.counts.values() if count == 1)
+        twice = sum(1 for count in self.counts.values() if count == 2)
+        return once, twice
+
+    @property
+    def inferred_type(self) -> str:
+        return self.types[0] if self.types else "string"
+
+
+def _parses_as(kind: str, value: str) -> bool:
+    if kind == "boolean":
+        return value.lower() in BOOLEAN_VALUES or value in ("0", "1")
+    try:
+        if kind == "integer":
+            int(value)
+        elif kind == "float":
+            float(value)
+        else:
+            datetime.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _cardinality(stats: ColumnStats, non_missing: int, sampled_rows: int, total_rows: int, exact: bool, near_unique_ratio: float) -> int:
+    """Distinct values expected in the whole file given those seen in the sample."""
+    distinct = stats.distinct
+    if exact or not sampled_rows:
+        return distinct
+    if near_unique_ratio and non_missing >= NEAR_UNIQUE_MIN_ROWS and distinct >= near_unique_ratio * non_missing:
+        # IDs keep producing new values at the same rate
+        return int(distinct * total_rows / sampled_rows)
+    return extrapolate_distinct(distinct, sampled_rows, total_rows, exact, stats.singletons())
+
+
+def profile_csv(
+    stream: BinaryIO,
+    total_bytes: Optional[int] = None,
+    sample_bytes: int = PROFILE_SAMPLE_BYTES,
+    engine: str = "ctgan",
+    epochs: int = 100,
+    max_train_seconds: Optional[float] = None
+) -> Dict:
+    """Profile every column of a CSV from its first ``sample_bytes``.
+
+    ``total_bytes`` is the size of the whole file when ``stream`` only holds its head.
+    Returns per-column inferred type, null fraction, distinct values in the sample and an
+    estimated cardinality for the whole file, whether the column looks like an ID, its
+    model width under the cardinality policy and the CTGAN training seconds it adds. Widths
+    and ``estimate`` come from the same Chao1 extrapolation and missing-value rule as
+    admission control, so they match the cardinality shown and what a job would reserve.
+    The columns suggested as categorical are the ones that are neither ID-like nor above
+    ``CARDINALITY_MAX_CATEGORIES``; ``estimate`` covers them together.
+    """
+    start = time.perf_counter()
+    head = stream.read(sample_bytes + 1)
+    exact = len(head) <= sample_bytes and (total_bytes is None or total_bytes <= len(head))
+    head = head[:sample_bytes]
+    if not exact:
+        # Drop the last, probably truncated line
+        head = head[:head.rfind(b"\n") + 1]
+    total_bytes = max(total_bytes or 0, len(head))
+
+    reader = csv.reader(io.StringIO(head.decode("utf-8", errors="replace"), newline=""))
+    header = next(reader, None)
+    if not header:
+        raise ValueError("The file has no header row")
+    columns = [ColumnStats(name.strip()) for name in header]
+    rows = 0
+    for record in reader:
+        if not record:
+            continue
+        rows += 1
+        for stats, value in zip(columns, record):
+            stats.add(value)
+        # Short rows are missing their trailing values
+        for stats in columns[len(record):]:
+            stats.missing += 1
+    total_rows = rows if exact or not head else int(rows * total_bytes / len(head))
+
+    near_unique_ratio = env_number("CARDINALITY_NEAR_UNIQUE_RATIO", float, 0.95)
+    max_categories = env_number("CARDINALITY_MAX_CATEGORIES", int, 500)
+    hash_buckets = env_number("CARDINALITY_HASH_BUCKETS", int)
+    profiles = []
+    values_with_missing = {}
+    singletons = {}
+    for stats in columns:
+        non_missing = rows - stats.missing
+        distinct = stats.distinct
+        # Missing values become a category of their own, as in ``admission.profile_upload``
+        values_with_missing[stats.name] = distinct + (stats.missing > 0)
+        singletons[stats.name] = stats.singletons()
+        id_like = bool(near_unique_ratio) and non_missing >= NEAR_UNIQUE_MIN_ROWS and distinct >= near_unique_ratio * non_missing
+        cardinality = _cardinality(stats, non_missing, rows, total_rows, exact, near_unique_ratio)
+        width = model_width(values_with_missing[stats.name], rows, total_rows, exact, max_categories, hash_buckets, singletons[stats.name])
+        profiles.append({
+            "name": stats.name,
+            "inferred_type": stats.inferred_type,
+            "null_fraction": round(stats.missing / rows, 4) if rows else None,
+            "distinct_sampled": distinct,
+            "distinct_exact": stats.sketch is None,
+            "approx_cardinality": cardinality,
+            "id_like": id_like,
+            "one_hot_width": width,
+            "ctgan_fit_seconds": round(epochs * total_rows * width * CTGAN_FIT_SECONDS, 1),
+            "suggested": not id_like and (not max_categories or cardinality <= max_categories)
+        })
+
+    suggested = [p for p in profiles if p["suggested"]]
+    estimate = None
+    if suggested:
+        estimate = estimate_job(
+            {
+                "bytes": total_bytes,
+                "rows": total_rows,
+                "sampled_rows": rows,
+                "exact": exact,
+                "distinct": {p["name"]: values_with_missing[p["name"]] for p in suggested},
+                "singletons": {p["name"]: singletons[p["name"]] for p in suggested}
+            },
+            engine=engine,
+            epochs=epochs,
+            max_train_seconds=max_train_seconds
+        )
+    return {
+        "bytes": total_bytes,
+        "sampled_bytes": len(head),
+        "sampled_rows": rows,
+        "rows": total_rows,
+        "rows_exact": exact,
+        "columns": profiles,
+        "suggested_columns": [p["name"] for p in suggested],
+        "estimate": estimate,
+        "profile_seconds": round(time.perf_counter() - start, 3)
+    }
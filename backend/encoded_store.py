@@ -0,0 +1,369 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, eviction does not see stores in use
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+META_FILE = "meta.json"
+# Runs hold a shared flock on this file while they use the store; eviction skips locked stores
+LEASE_FILE = "lease.lock"
+CODE_DTYPE = np.int32
+# Rows parsed, remapped or counted per pass; bounds the memory of every store operation
+ENCODE_CHUNK_ROWS = 1_000_000
+HASH_BLOCK_BYTES = 1024 * 1024
+MISSING = 'MISSING'
+
+
+def file_key(csv_path: str, columns: List[str]) -> str:
+    """Content hash of the upload and the selected columns, so a re-uploaded dataset is found again."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({"columns": columns}).encode())
+    with open(csv_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_meta(path: str, meta: Dict) -> None:
+    tmp_path = os.path.join(path, f"{META_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(path, META_FILE))
+
+
+class EncodedStore:
+    """Categorical columns as integer codes, one memory-mapped file per column.
+
+    Labels are stored once per column in ``meta.json``, already cleaned the way
+    ``SyntheticDataPipeline.preprocess_data`` cleans them (strings, ``MISSING`` for empty
+    cells). Code files are column-major, so counting one column or a pair of columns reads
+    only those files, and training reads just the rows of each minibatch (``take``).
+    Nothing is loaded into memory until it is read, which lets one worker train on CSVs
+    far larger than RAM.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        with open(os.path.join(self.path, META_FILE)) as f:
+            meta = json.load(f)
+        self.key: str = meta["key"]
+        self.columns: List[str] = meta["columns"]
+        self.num_rows: int = meta["num_rows"]
+        self.categories: Dict[str, np.ndarray] = {
+            col: np.asarray(labels, dtype=object) for col, labels in meta["categories"].items()
+        }
+        # Relative names live in this store; absolute ones are shared with the store it was remapped from
+        self._files = {col: os.path.join(self.path, name) for col, name in meta["files"].items()}
+        self._codes: Dict[str, np.ndarray] = {}
+        self._lease = None
+
+    def close(self) -> None:
+        """Release the store's lease (see ``EncodedStoreCache``), so it may be evicted again."""
+        if self._lease is not None:
+            self._lease.close()
+            self._lease = None
+
+    @classmethod
+    def build(cls, csv_path: str, columns: List[str], path: str, key: str, chunksize: int = ENCODE_CHUNK_ROWS) -> "EncodedStore":
+        """Parse ``csv_path`` in row chunks and append each column's codes to its file.
+
+        Codes are assigned in order of first appearance, so chunks never need to be
+        unioned and no chunk is kept once its codes are written.
+        """
+        os.makedirs(path, exist_ok=True)
+        labels = {col: [] for col in columns}
+        index = {col: {} for col in columns}
+        files = {col: f"col_{i}.bin" for i, col in enumerate(columns)}
+        handles = {col: open(os.path.join(path, files[col]), 'wb') for col in columns}
+        num_rows = 0
+        try:
+            for chunk in pd.read_csv(csv_path, usecols=columns, dtype="category", chunksize=chunksize):
+                for col in columns:
+                    column = chunk[col]
+                    codes = column.cat.codes.to_numpy()
+                    # One extra slot maps pandas' -1 (empty cell) to the MISSING label
+                    lookup = np.empty(len(column.cat.categories) + 1, dtype=CODE_DTYPE)
+                    for i, value in enumerate(column.cat.categories):
+                        lookup[i] = cls._code_for(index[col], labels[col], str(value))
+                    if (codes < 0).any():
+                        lookup[-1] = cls._code_for(index[col], labels[col], MISSING)
+                    lookup[codes].tofile(handles[col])
+                num_rows += len(chunk)
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+        _write_meta(path, {"key": key, "columns": columns, "num_rows": num_rows, "categories": labels, "files": files})
+        logger.info(f"Encoded {num_rows} rows of {len(columns)} columns into {path}")
+        return cls(path)
+
+    @staticmethod
+    def _code_for(index: Dict[str, int], labels: List[str], value: str) -> int:
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(labels)
+            labels.append(value)
+        return code
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.num_rows, len(self.columns)
+
+    def codes(self, col: str) -> np.ndarray:
+        """The column's codes as a read-only memory map."""
+        if col not in self._codes:
+            if self.num_rows == 0:
+                # np.memmap cannot map an empty file
+                self._codes[col] = np.empty(0, dtype=CODE_DTYPE)
+            else:
+                self._codes[col] = np.memmap(self._files[col], dtype=CODE_DTYPE, mode='r', shape=(self.num_rows,))
+        return self._codes[col]
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        """Codes of the given rows, one column per selected column."""
+        return np.stack([self.codes(col)[rows] for col in self.columns], axis=1)
+
+    def category_counts(self, col: str) -> np.ndarray:
+        """Rows per code, counted in blocks."""
+        codes = self.codes(col)
+        counts = np.zeros(len(self.categories[col]), dtype=np.int64)
+        for start in range(0, self.num_rows, ENCODE_CHUNK_ROWS):
+            counts += np.bincount(codes[start:start + ENCODE_CHUNK_ROWS], minlength=len(counts))
+        return counts
+
+    def value_share(self, col: str, value: str) -> float:
+        """Share of rows holding ``value``."""
+        matches = np.flatnonzero(self.categories[col] == value)
+        if not len(matches) or not self.num_rows:
+            return 0.0
+        return float(self.category_counts(col)[matches[0]] / self.num_rows)
+
+    def unique_count(self, col: str) -> int:
+        """Distinct non-missing values, as ``nunique`` counts them on the raw frame."""
+        return int(len(self.categories[col]) - (self.categories[col] == MISSING).any())
+
+    def rows_by_code(self, col: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Row ids sorted by code, and the offset of each code's rows in that order.
+
+        Built on first use and kept next to the column's code file, so a reused store
+        skips it too. Rows of code ``c`` are ``order[offsets[c]:offsets[c + 1]]``.
+        """
+        order_path = self._files[col] + ".order"
+        offsets_path = self._files[col] + ".offsets.npy"
+        dtype = np.int32 if self.num_rows < 2 ** 31 else np.int64
+        if not os.path.exists(offsets_path):
+            codes = np.asarray(self.codes(col))
+            order = np.argsort(codes, kind='stable').astype(dtype)
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(self.categories[col])))])
+            suffix = f".{os.getpid()}.tmp"
+            order.tofile(order_path + suffix)
+            np.save(offsets_path + suffix + ".npy", offsets)
+            os.replace(order_path + suffix, order_path)
+            os.replace(offsets_path + suffix + ".npy", offsets_path)
+            del codes, order
+        offsets = np.load(offsets_path)
+        if self.num_rows == 0:
+            return np.empty(0, dtype=dtype), offsets
+        return np.memmap(order_path, dtype=dtype, mode='r', shape=(self.num_rows,)), offsets
+
+    def vocabulary_frame(self) -> pd.DataFrame:
+        """Every category once per column, in code order, as a small frame to fit encoders on.
+
+        Shorter columns repeat their categories to the longest column's length; encoders
+        that keep first-appearance order then number categories exactly like the codes.
+        """
+        length = max((len(labels) for labels in self.categories.values()), default=0)
+        return pd.DataFrame({
+            col: pd.Categorical(np.resize(self.categories[col], length), categories=self.categories[col])
+            for col in self.columns
+        })
+
+    def sample_frame(self, num_rows: int, seed: Optional[int] = None) -> pd.DataFrame:
+        """Up to ``num_rows`` random rows decoded like ``load_data`` returns them (NaN for missing)."""
+        rng = np.random.default_rng(seed)
+        rows = np.sort(rng.choice(self.num_rows, size=min(num_rows, self.num_rows), replace=False))
+        frame = {}
+        for col in self.columns:
+            column = pd.Categorical.from_codes(self.codes(col)[rows], categories=self.categories[col])
+            if MISSING in column.categories:
+                column = column.remove_categories([MISSING])
+            frame[col] = column
+        return pd.DataFrame(frame)
+
+    def remap(self, lookups: Dict[str, Tuple[np.ndarray, pd.Index]], path: str) -> "EncodedStore":
+        """A store whose listed columns are recoded through ``lookup`` to new categories.
+
+        Only the remapped columns are written, block by block, into ``path``; the other
+        columns keep pointing at this store's files.
+        """
+        os.makedirs(path, exist_ok=True)
+        files, categories = {}, {}
+        digest = hashlib.sha256(self.key.encode())
+        for i, col in enumerate(self.columns):
+            if col not in lookups:
+                files[col] = self._files[col]
+                categories[col] = [str(c) for c in self.categories[col]]
+                continue
+            lookup, new_categories = lookups[col]
+            lookup = lookup.astype(CODE_DTYPE)
+            files[col] = f"col_{i}.bin"
+            categories[col] = [str(c) for c in new_categories]
+            digest.update(col.encode())
+            digest.update(lookup.tobytes())
+            digest.update(json.dumps(categories[col]).encode())
+            codes = self.codes(col)
+            with open(os.path.join(path, files[col]), 'wb') as f:
+                for start in range(0, self.num_rows, ENCODE_CHUNK_ROWS):
+                    lookup[codes[start:start + ENCODE_CHUNK_ROWS]].tofile(f)
+        _write_meta(path, {
+            "key": digest.hexdigest(),
+            "columns": self.columns,
+            "num_rows": self.num_rows,
+            "categories": categories,
+            "files": files
+        })
+        return EncodedStore(path)
+
+    def fingerprint(self) -> str:
+        """Identifies the encoded content, for model cache keys."""
+        return self.key
+
+
+class EncodedStoreCache:
+    """Encoded stores of recent uploads, keyed by content hash and shared by every worker.
+
+    A dataset uploaded again, e.g. to train with another engine or to sample more rows,
+    is trained from its existing store instead of being parsed and encoded again. Stores
+    are built in a temporary directory and renamed into place, and the least recently
+    used ones are deleted once the directory exceeds ``max_disk_bytes``. A store handed
+    out by ``get_or_build`` holds a shared ``flock`` until ``EncodedStore.close``; stores
+    that are locked, including the parents of a run's remapped store, are never evicted.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_disk_bytes: Optional[int] = None):
+        self.root = os.path.abspath(root or os.getenv("ENCODED_STORE_DIR", "encoded_store"))
+        self.max_disk_bytes = max_disk_bytes if max_disk_bytes is not None else int(os.getenv("ENCODED_STORE_MAX_MB", "10240")) * 1024 * 1024
+        os.makedirs(self.root, exist_ok=True)
+
+    def get_or_build(self, csv_path: str, columns: List[str], chunksize: int = ENCODE_CHUNK_ROWS) -> Tuple[EncodedStore, bool]:
+        """The store for this upload and columns, and whether it already existed."""
+        key = file_key(csv_path, columns)
+        path = os.path.join(self.root, key)
+        store = self._open_leased(path)
+        if store is not None:
+            # Touch the metadata so eviction sees the store as recently used
+            try:
+                os.utime(os.path.join(path, META_FILE))
+            except OSError:
+                pass
+            logger.info(f"Encoded store hit for {key[:12]}")
+            return store, True
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        EncodedStore.build(csv_path, columns, tmp_path, key, chunksize=chunksize)
+        # Leased before the rename, so no other worker can evict it in between
+        lease = self._lease(tmp_path, fcntl.LOCK_SH if fcntl is not None else None)
+        try:
+            os.replace(tmp_path, path)
+            store = EncodedStore(path)
+            store._lease = lease
+        except OSError:
+            # Another worker finished the same store first
+            if lease is not None:
+                lease.close()
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            store = self._open_leased(path) or EncodedStore(path)
+        self._evict(keep=key)
+        return store, False
+
+    @staticmethod
+    def _lease(path: str, operation: Optional[int]):
+        """The store's lease file locked with ``operation``, or None without ``fcntl``."""
+        if fcntl is None:
+            return None
+        handle = open(os.path.join(path, LEASE_FILE), 'a+')
+        try:
+            fcntl.flock(handle, operation)
+        except OSError:
+            handle.close()
+            raise
+        return handle
+
+    def _open_leased(self, path: str) -> Optional[EncodedStore]:
+        """The store at ``path`` under a shared lease, or None if it does not exist (any more)."""
+        try:
+            lease = self._lease(path, fcntl.LOCK_SH if fcntl is not None else None)
+        except FileNotFoundError:
+            return None
+        # Eviction holds the exclusive lock while it deletes, so a store still complete now stays
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            if lease is not None:
+                lease.close()
+            return None
+        store = EncodedStore(path)
+        store._lease = lease
+        return store
+
+    @staticmethod
+    def _size(path: str) -> int:
+        total = 0
+        for name in os.listdir(path):
+            try:
+                total += os.path.getsize(os.path.join(path, name))
+            except OSError:
+                pass
+        return total
+
+    def _evict(self, keep: str) -> None:
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name == keep or name.endswith(".tmp"):
+                continue
+            try:
+                entries.append((os.stat(os.path.join(path, META_FILE)).st_mtime, self._size(path), path))
+            except (FileNotFoundError, NotADirectoryError):
+                continue  # Evicted concurrently by another worker
+        total = sum(size for _, size, _ in entries) + self._size(os.path.join(self.root, keep))
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                lease = self._lease(path, fcntl.LOCK_EX | fcntl.LOCK_NB if fcntl is not None else None)
+            except BlockingIOError:
+                continue  # A run is training or sampling from it
+            except FileNotFoundError:
+                continue  # Evicted concurrently by another worker
+            try:
+                shutil.rmtree(path, ignore_errors=True)
+            finally:
+                if lease is not None:
+                    lease.close()
+            total -= size
+            logger.info(f"Evicted encoded store {os.path.basename(path)}")
+
+
+_default_store_cache = None
+
+
+def get_default_store_cache() -> EncodedStoreCache:
+    """Process-wide store cache configured from the environment."""
+    global _default_store_cache
+    if _default_store_cache is None:
+        _default_store_cache = EncodedStoreCache()
+    return _default_store_cache
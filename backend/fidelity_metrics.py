@@ -0,0 +1,161 @@
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.stats import chi2
+
+from pipeline_options import METRIC_LEVELS
+
+logger = logging.getLogger(__name__)
+
+# Pairwise associations are estimated on a row sample of each frame
+PAIRWISE_SAMPLE_ROWS = 50_000
+# Columns with more categories than this (ids, free text) are left out of pairwise scores
+MAX_PAIRWISE_CATEGORIES = 1000
+WORST_PAIRS_REPORTED = 10
+MISSING_LABEL = "MISSING"
+
+
+def encode_columns(real: pd.DataFrame, synthetic: pd.DataFrame, columns: List[str]) -> Tuple[np.ndarray, np.ndarray, List[int]]:
+    """Integer-code both frames against one shared vocabulary per column.
+
+    Returns ``(real_codes, synthetic_codes, sizes)`` where the code matrices are
+    ``(rows, columns)`` and ``sizes[i]`` is the vocabulary size of column ``i``.
+    Missing values in either frame map to the same ``MISSING`` code.
+    """
+    real_codes = np.empty((len(real), len(columns)), dtype=np.int64)
+    synthetic_codes = np.empty((len(synthetic), len(columns)), dtype=np.int64)
+    sizes = []
+    for i, col in enumerate(columns):
+        values = pd.concat([real[col].astype(object), synthetic[col].astype(object)], ignore_index=True)
+        codes, uniques = pd.factorize(values.fillna(MISSING_LABEL).astype(str))
+        real_codes[:, i] = codes[:len(real)]
+        synthetic_codes[:, i] = codes[len(real):]
+        sizes.append(len(uniques))
+    return real_codes, synthetic_codes, sizes
+
+
+def column_metrics(real_counts: np.ndarray, synthetic_counts: np.ndarray) -> Dict:
+    """Univariate fidelity of one column from its aligned category counts."""
+    real_total = max(real_counts.sum(), 1)
+    synthetic_total = max(synthetic_counts.sum(), 1)
+    p = real_counts / real_total
+    q = synthetic_counts / synthetic_total
+
+    # Goodness of fit of the synthetic counts against the real proportions
+    expected = p * synthetic_total
+    seen = expected > 0
+    statistic = float(np.sum((synthetic_counts[seen] - expected[seen]) ** 2 / expected[seen]))
+    dof = max(int(seen.sum()) - 1, 1)
+
+    real_present = real_counts > 0
+    synthetic_present = synthetic_counts > 0
+    return {
+        "unique_values_real": int(real_present.sum()),
+        "unique_values_synthetic": int(synthetic_present.sum()),
+        "total_variation_distance": float(0.5 * np.abs(p - q).sum()),
+        "chi_square": statistic,
+        "chi_square_p_value": float(chi2.sf(statistic, dof)),
+        "category_coverage": float((real_present & synthetic_present).sum() / max(real_present.sum(), 1)),
+        "novel_categories": int((synthetic_present & ~real_present).sum())
+    }
+
+
+def cramers_v_matrix(codes: np.ndarray, sizes: List[int]) -> np.ndarray:
+    """Cramér's V for every column pair from one sparse one-hot Gram matrix.
+
+    ``X.T @ X`` of the one-hot encoding holds every pairwise contingency table as a
+    block, so all tables come out of a single sparse product.
+    """
+    n_rows, n_cols = codes.shape
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    one_hot = sparse.csr_matrix(
+        (np.ones(n_rows * n_cols, dtype=np.float64), (np.repeat(np.arange(n_rows), n_cols), (codes + offsets[:-1]).ravel())),
+        shape=(n_rows, int(offsets[-1]))
+    )
+    gram = (one_hot.T @ one_hot).tocsr()
+    marginals = np.asarray(gram.diagonal())
+
+    result = np.eye(n_cols)
+    for i in range(n_cols):
+        band = gram[offsets[i]:offsets[i + 1]].tocsc()
+        row_totals = marginals[offsets[i]:offsets[i + 1]]
+        rows_present = row_totals > 0
+        for j in range(i + 1, n_cols):
+            table = band[:, offsets[j]:offsets[j + 1]].toarray()[rows_present]
+            col_totals = marginals[offsets[j]:offsets[j + 1]]
+            cols_present = col_totals > 0
+            table = table[:, cols_present]
+            k = min(table.shape) - 1
+            if k <= 0:
+                result[i, j] = result[j, i] = 0.0
+                continue
+            expected = np.outer(row_totals[rows_present], col_totals[cols_present]) / n_rows
+            phi2 = np.sum(table ** 2 / expected) / n_rows - 1
+            result[i, j] = result[j, i] = float(np.sqrt(max(phi2, 0.0) / k))
+    return result
+
+
+def _sample_rows(codes: np.ndarray, max_rows: int, rng: np.random.Generator) -> np.ndarray:
+    if len(codes) <= max_rows:
+        return codes
+    return codes[rng.choice(len(codes), size=max_rows, replace=False)]
+
+
+def pairwise_metrics(real_codes: np.ndarray, synthetic_codes: np.ndarray, sizes: List[int], columns: List[str]) -> Dict:
+    """Compare Cramér's V of every column pair between the real and synthetic frames."""
+    eligible = [i for i, size in enumerate(sizes) if size <= MAX_PAIRWISE_CATEGORIES]
+    skipped = [columns[i] for i in range(len(columns)) if i not in eligible]
+    if len(eligible) < 2 or not len(real_codes) or not len(synthetic_codes):
+        return {"pairs": 0, "skipped_columns": skipped}
+
+    rng = np.random.default_rng(0)
+    eligible_sizes = [sizes[i] for i in eligible]
+    real_v = cramers_v_matrix(_sample_rows(real_codes[:, eligible], PAIRWISE_SAMPLE_ROWS, rng), eligible_sizes)
+    synthetic_v = cramers_v_matrix(_sample_rows(synthetic_codes[:, eligible], PAIRWISE_SAMPLE_ROWS, rng), eligible_sizes)
+
+    upper = np.triu_indices(len(eligible), k=1)
+    similarity = 1 - np.abs(real_v[upper] - synthetic_v[upper])
+    worst = np.argsort(similarity)[:WORST_PAIRS_REPORTED]
+    return {
+        "pairs": int(len(similarity)),
+        "mean_association_similarity": float(similarity.mean()),
+        "min_association_similarity": float(similarity.min()),
+        "worst_pairs": [
+            {
+                "columns": [columns[eligible[upper[0][k]]], columns[eligible[upper[1][k]]]],
+                "cramers_v_real": float(real_v[upper][k]),
+                "cramers_v_synthetic": float(synthetic_v[upper][k]),
+                "similarity": float(similarity[k])
+            }
+            for k in worst
+        ],
+        "sampled_rows": min(PAIRWISE_SAMPLE_ROWS, len(real_codes), len(synthetic_codes)),
+        "skipped_columns": skipped
+    }
+
+
+def compute_fidelity_metrics(real: pd.DataFrame, synthetic: pd.DataFrame, columns: List[str]) -> Dict:
+    """Per-column distribution distances plus pairwise association similarity."""
+    columns = [col for col in columns if col in real.columns and col in synthetic.columns]
+    real_codes, synthetic_codes, sizes = encode_columns(real, synthetic, columns)
+
+    per_column = {}
+    for i, col in enumerate(columns):
+        per_column[col] = column_metrics(
+            np.bincount(real_codes[:, i], minlength=sizes[i]),
+            np.bincount(synthetic_codes[:, i], minlength=sizes[i])
+        )
+
+    tvds = [m["total_variation_distance"] for m in per_column.values()]
+    coverages = [m["category_coverage"] for m in per_column.values()]
+    pairwise = pairwise_metrics(real_codes, synthetic_codes, sizes, columns)
+    summary = {
+        "mean_total_variation_distance": float(np.mean(tvds)) if tvds else None,
+        "mean_category_coverage": float(np.mean(coverages)) if coverages else None,
+        "mean_association_similarity": pairwise.get("mean_association_similarity")
+    }
+    logger.info(f"Fidelity summary: {summary}")
+    return {"summary": summary, "columns": per_column, "pairwise": pairwise}
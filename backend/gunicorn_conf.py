@@ -1,6 +1,15 @@
+import gc
 import os
+import shutil
+import logging
 import psutil
 
+from admission import memory_budget
+
+# Shared sample directory for prometheus_client multiprocess mode; must be set before any
+# worker or job pool process imports the metrics, which is why it is set here in the master
+prometheus_multiproc_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+
 # Gunicorn config variables
 workers_per_core_str = os.getenv("WORKERS_PER_CORE", "2")  # Optimized for HF Space (2 vCPUs)
 web_concurrency_str = os.getenv("WEB_CONCURRENCY", None)
@@ -37,6 +46,13 @@ else:
 workers = web_concurrency
 threads = worker_threads
 worker_class = "uvicorn.workers.UvicornWorker"
+
+# Preload mode: the master imports the app and the training runtime (numpy, pandas, torch,
+# ctgan) once, and workers fork from it, sharing those pages copy-on-write. Job pool
+# processes then fork from their worker too, instead of spawning a fresh interpreter.
+preload_app = os.getenv("PRELOAD_APP", "false").lower() in ("1", "true", "yes")
+if preload_app:
+    os.environ.setdefault("JOB_START_METHOD", "fork")
 worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
 keepalive = 120
 timeout = 300  # Longer timeout for synthetic data generation
@@ -44,10 +60,39 @@ graceful_timeout = 30
 accesslog = "-"  # Log to stdout
 errorlog = "-"  # Log to stderr
 
+def warm_runtime():
+    """Import the heavy training modules in the master so forked processes inherit them."""
+    try:
+        import torch  # noqa: F401
+        import ctgan  # noqa: F401
+        import synthetic_data_pipeline  # noqa: F401
+        import adaptive_ctgan  # noqa: F401
+    except ImportError as e:
+        logging.getLogger(__name__).warning(f"Could not preload training runtime: {e}")
+
+def on_starting(server):
+    # Samples left by a previous run would be summed into this one
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+    os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+    if preload_app:
+        warm_runtime()
+
+def when_ready(server):
+    if preload_app:
+        # Move everything loaded so far out of the GC's reach, so collections in the
+        # workers do not touch (and un-share) the preloaded objects
+        gc.freeze()
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
 # Log configuration
 print(f"Gunicorn configuration:")
 print(f"- Bind: {bind}")
 print(f"- Workers: {workers}")
 print(f"- Threads per worker: {threads}")
 print(f"- Worker class: {worker_class}")
-print(f"- Timeout: {timeout}s")
\ No newline at end of file
+print(f"- Timeout: {timeout}s")
+print(f"- Preload: {preload_app}")
+print(f"- Admission memory budget: {memory_budget() / (1024 * 1024 * 1024):.1f} GB of {total_memory:.1f} GB")
\ No newline at end of file
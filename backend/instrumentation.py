@@ -0,0 +1,158 @@
+import os
+import time
+import functools
+import threading
+from typing import Dict, Optional, Tuple
+
+import psutil
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# With PROMETHEUS_MULTIPROC_DIR set (see gunicorn_conf.py), every API worker and job pool
+# process writes its samples to that directory and /metrics sums them all up
+
+RSS_SAMPLE_SECONDS = 0.05
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+BYTES_BUCKETS = tuple(2 ** p for p in range(24, 37))  # 16MB .. 64GB
+ROW_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+WIDTH_BUCKETS = (10, 50, 100, 500, 1_000, 5_000, 10_000, 50_000)
+EPOCH_BUCKETS = (1, 5, 10, 20, 50, 100, 200, 500)
+
+STAGE_SECONDS = Histogram(
+    "pipeline_stage_duration_seconds", "Wall-clock time of a pipeline stage",
+    ["stage", "engine"], buckets=DURATION_BUCKETS
+)
+STAGE_PEAK_RSS = Histogram(
+    "pipeline_stage_peak_rss_bytes", "Peak resident memory of the process during a pipeline stage",
+    ["stage"], buckets=BYTES_BUCKETS
+)
+STAGE_ROWS = Histogram(
+    "pipeline_stage_rows", "Rows consumed (in) or produced (out) by a pipeline stage",
+    ["stage", "direction"], buckets=ROW_BUCKETS
+)
+STAGE_FAILURES = Counter(
+    "pipeline_stage_failures_total", "Pipeline stages that raised", ["stage", "engine"]
+)
+ONE_HOT_WIDTH = Histogram(
+    "pipeline_one_hot_width", "Total categories across the training columns", ["engine"], buckets=WIDTH_BUCKETS
+)
+EPOCHS_RUN = Histogram(
+    "pipeline_training_epochs", "Epochs run before training stopped", ["engine", "stop_reason"], buckets=EPOCH_BUCKETS
+)
+JOB_QUEUE_SECONDS = Histogram(
+    "job_queue_wait_seconds", "Time a job spent queued before a pool process picked it up", buckets=DURATION_BUCKETS
+)
+TRAINING_SLOT_WAIT_SECONDS = Histogram(
+    "training_slot_wait_seconds", "Time a fit waited for a host-wide training slot", buckets=DURATION_BUCKETS
+)
+JOBS_FINISHED = Counter("jobs_finished_total", "Jobs that reached a terminal state", ["status"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time until the response headers are sent",
+    ["method", "route", "status"], buckets=DURATION_BUCKETS
+)
+
+
+class PeakRssSampler:
+    """Polls the RSS of this process in a background thread and keeps the maximum."""
+
+    def __init__(self, interval: float = RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "PeakRssSampler":
+        self.peak = self.process.memory_info().rss
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+def _is_frame(value) -> bool:
+    # Duck-typed so the API process can import this module without pandas
+    return hasattr(value, "columns") and hasattr(value, "__len__")
+
+
+def _row_count(value) -> Optional[int]:
+    if _is_frame(value):
+        return len(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def record_stage(
+    metadata: Optional[Dict],
+    stage: str,
+    engine: str,
+    seconds: float,
+    peak_rss: Optional[int] = None,
+    rows_in: Optional[int] = None,
+    rows_out: Optional[int] = None
+) -> None:
+    """Observe one stage run and add it to the run's ``metadata["stages"]``."""
+    STAGE_SECONDS.labels(stage, engine).observe(seconds)
+    summary = {"seconds": round(seconds, 4)}
+    if peak_rss is not None:
+        STAGE_PEAK_RSS.labels(stage).observe(peak_rss)
+        summary["peak_rss_mb"] = round(peak_rss / 1024 ** 2, 1)
+    if rows_in is not None:
+        STAGE_ROWS.labels(stage, "in").observe(rows_in)
+        summary["rows_in"] = rows_in
+    if rows_out is not None:
+        STAGE_ROWS.labels(stage, "out").observe(rows_out)
+        summary["rows_out"] = rows_out
+    if metadata is not None:
+        metadata.setdefault("stages", {})[stage] = summary
+
+
+def instrumented_stage(stage: str):
+    """Decorate a ``SyntheticDataPipeline`` method to record it as ``stage``.
+
+    Rows in is the length of the first DataFrame argument; rows out is the length of a
+    returned DataFrame, or the returned int for methods that report rows written.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            engine = getattr(self, "engine", "unknown")
+            rows_in = next((len(a) for a in args if _is_frame(a)), None)
+            with PeakRssSampler() as sampler:
+                start = time.perf_counter()
+                try:
+                    result = method(self, *args, **kwargs)
+                except Exception:
+                    STAGE_FAILURES.labels(stage, engine).inc()
+                    raise
+                seconds = time.perf_counter() - start
+            record_stage(getattr(self, "metadata", None), stage, engine, seconds, sampler.peak, rows_in, _row_count(result))
+            return result
+        return wrapper
+    return decorator
+
+
+def metrics_payload() -> Tuple[bytes, str]:
+    """Exposition of all metrics, aggregated across processes in multiprocess mode."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,339 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from admission import get_default_budget
+from instrumentation import JOB_QUEUE_SECONDS, JOBS_FINISHED
+from output_writers import DEFAULT_OUTPUT_FORMAT, output_extension
+from process_utils import pid_alive
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+TERMINAL_STATES = (COMPLETED, FAILED)
+
+STATUS_FILE = "status.json"
+INPUT_FILE = "input.csv"
+OUTPUT_DIR = "output"
+STREAM_FILE_STEM = "synthetic_data"
+PROGRESS_FILE = "progress.jsonl"
+
+# Finished workspaces are kept this long so results can still be downloaded
+WORKSPACE_TTL_SECONDS = int(os.getenv("WORKSPACE_TTL_SECONDS", "3600"))
+# Jobs queued or running for longer than this are taken to be abandoned and marked failed
+JOB_MAX_AGE_SECONDS = int(os.getenv("JOB_MAX_AGE_SECONDS", "86400"))
+
+
+def _timestamp() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _write_status(job_dir: str, status: Dict) -> None:
+    """Atomically replace the status file so readers never see a partial write."""
+    status_path = os.path.join(job_dir, STATUS_FILE)
+    tmp_path = f"{status_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(status, f, indent=2)
+    os.replace(tmp_path, status_path)
+
+
+def _read_status(job_dir: str) -> Optional[Dict]:
+    status_path = os.path.join(job_dir, STATUS_FILE)
+    try:
+        with open(status_path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class ProgressLog:
+    """Append-only JSON-lines log of a job's progress events, tailed by ``/jobs/{id}/events``.
+
+    The pool process appends one line per event; a reader in any API worker follows the
+    file by offset, so no event is lost between polls and late subscribers can replay it.
+    """
+
+    def __init__(self, job_dir: str):
+        self.path = os.path.join(job_dir, PROGRESS_FILE)
+
+    def append(self, event: Dict) -> None:
+        # One write per line keeps each event whole for a concurrent reader
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(event, default=str) + "\n")
+
+
+def read_progress(job_dir: str, offset: int = 0) -> List[tuple]:
+    """Complete events written after byte ``offset``, each with the offset just past it."""
+    try:
+        with open(os.path.join(job_dir, PROGRESS_FILE), 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    events = []
+    for line in data.splitlines(keepends=True):
+        if not line.endswith(b"\n"):
+            break  # Still being written
+        offset += len(line)
+        if line.strip():
+            events.append((offset, json.loads(line)))
+    return events
+
+
+def _fail_abandoned_job(path: str, status: Dict, now: float) -> bool:
+    """Mark a queued or running job failed when its process is gone or it is over age.
+
+    A queued job waits in the pool of the API worker that submitted it (``owner_pid``),
+    a running one in a pool process (``pid``); if that process died, e.g. with a restarted
+    worker, nothing is left to finish the job. Returns True if the job was marked failed.
+    """
+    pid = status.get("pid") if status.get("status") == RUNNING else status.get("owner_pid")
+    age = now - os.path.getmtime(os.path.join(path, STATUS_FILE))
+    alive = pid_alive(pid)
+    if alive and age < JOB_MAX_AGE_SECONDS:
+        return False
+    reason = f"{status.get('status')} for over {JOB_MAX_AGE_SECONDS}s" if alive else f"process {pid} exited"
+    status.update({"status": FAILED, "finished_at": _timestamp(), "error": f"Job was abandoned: {reason}"})
+    _write_status(path, status)
+    ProgressLog(path).append({"event": "status", "time": status["finished_at"], "status": FAILED, "error": status["error"]})
+    JOBS_FINISHED.labels(FAILED).inc()
+    logger.warning(f"Marked job {os.path.basename(path)} failed: {reason}")
+    return True
+
+
+def collect_stale_workspaces(root: str, ttl_seconds: int = WORKSPACE_TTL_SECONDS) -> int:
+    """Delete workspace directories under ``root`` that have outlived ``ttl_seconds``.
+
+    A workspace with a status file is removed only once it reached a terminal state and
+    finished more than ``ttl_seconds`` ago; one without a status file is judged by the
+    modification time of its directory. Queued or running jobs whose process has died,
+    or that are older than ``JOB_MAX_AGE_SECONDS``, are marked failed first, so they are
+    collected like any other failed job. Returns the number of workspaces removed.
+    """
+    if not os.path.isdir(root):
+        return 0
+    now = time.time()
+    removed = 0
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if not os.path.isdir(path):
+            continue
+        status = _read_status(path)
+        try:
+            if status is None:
+                age = now - os.path.getmtime(path)
+            elif status.get("status") in TERMINAL_STATES:
+                age = now - os.path.getmtime(os.path.join(path, STATUS_FILE))
+            else:
+                _fail_abandoned_job(path, status, now)
+                continue
+        except FileNotFoundError:
+            continue  # Collected concurrently by another worker
+        if age < ttl_seconds:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    if removed:
+        logger.info(f"Removed {removed} stale workspace(s) from {root}")
+    return removed
+
+
+def run_job(job_dir: str, categorical_columns: List[str], pipeline_kwargs: Dict, engine: str = "ctgan", metrics_level: str = "basic", queued_at: Optional[float] = None, cardinality: Optional[Dict] = None, admission: Optional[Dict] = None) -> str:
+    """Run one pipeline inside a pool process, once its estimated memory is free on the host.
+
+    ``admission`` is the estimate the API admitted the job with; the job stays queued
+    until the memory budget has room for its peak (see ``admission.MemoryBudget``).
+    """
+    if admission is None:
+        return _run_pipeline_job(job_dir, categorical_columns, pipeline_kwargs, engine, metrics_level, queued_at, cardinality)
+    progress = ProgressLog(job_dir)
+    job_id = os.path.basename(job_dir)
+
+    def on_wait():
+        progress.append({"event": "admission", "time": _timestamp(), "status": "waiting_for_memory", "peak_mb": admission["peak_mb"]})
+
+    with get_default_budget().reserve(job_id, admission["peak_bytes"], admission["estimated_seconds"], on_wait=on_wait) as waited:
+        return _run_pipeline_job(job_dir, categorical_columns, pipeline_kwargs, engine, metrics_level, queued_at, cardinality, memory_wait_seconds=waited)
+
+
+def _run_pipeline_job(job_dir: str, categorical_columns: List[str], pipeline_kwargs: Dict, engine: str, metrics_level: str, queued_at: Optional[float], cardinality: Optional[Dict], memory_wait_seconds: Optional[float] = None) -> str:
+    """Run one pipeline inside a pool process and record its progress in the job directory."""
+    # Imported here so the API process never pays for torch/ctgan unless it trains itself
+    from synthetic_data_pipeline import SyntheticDataPipeline
+    from model_cache import get_default_cache
+    from model_registry import get_default_registry
+    from encoded_store import get_default_store_cache
+    from cardinality import CardinalityPolicy
+    from stub_pipeline import STUB_PIPELINE_SECONDS, StubPipeline
+
+    status = _read_status(job_dir) or {}
+    status.update({"status": RUNNING, "started_at": _timestamp(), "pid": os.getpid()})
+    if queued_at is not None:
+        status["queued_seconds"] = round(time.time() - queued_at, 3)
+        JOB_QUEUE_SECONDS.observe(status["queued_seconds"])
+    if memory_wait_seconds is not None:
+        status["memory_wait_seconds"] = memory_wait_seconds
+    _write_status(job_dir, status)
+    progress = ProgressLog(job_dir)
+    progress.append({"event": "status", "time": status["started_at"], "status": RUNNING})
+
+    # Server-wide policy from the environment, with any per-request overrides on top
+    cardinality_policy = CardinalityPolicy.from_env()
+    for name, value in (cardinality or {}).items():
+        if value is not None:
+            setattr(cardinality_policy, name, value)
+
+    input_file = os.path.join(job_dir, INPUT_FILE)
+    pipeline = None
+    # Load tests swap the synthesizer for a fixed delay (see stub_pipeline)
+    pipeline_class = StubPipeline if STUB_PIPELINE_SECONDS > 0 else SyntheticDataPipeline
+    try:
+        pipeline = pipeline_class(
+            input_file=input_file,
+            categorical_columns=categorical_columns,
+            output_dir=os.path.join(job_dir, OUTPUT_DIR),
+            model_cache=get_default_cache(),
+            model_registry=get_default_registry(),
+            store_cache=get_default_store_cache(),
+            metadata={"queued_seconds": status.get("queued_seconds"), "admission": status.get("admission")},
+            engine=engine,
+            metrics_level=metrics_level,
+            cardinality_policy=cardinality_policy,
+            progress_callback=progress.append
+        )
+        pipeline.run_pipeline(**pipeline_kwargs)
+
+        status.update({
+            "status": COMPLETED,
+            "finished_at": _timestamp(),
+            "result_file": pipeline.output_file
+        })
+        if pipeline.output_files:
+            # JSON keys are strings, so sizes are too
+            status["result_files"] = {str(size): path for size, path in pipeline.output_files.items()}
+        _write_status(job_dir, status)
+        progress.append({"event": "status", "time": status["finished_at"], "status": COMPLETED})
+        JOBS_FINISHED.labels(COMPLETED).inc()
+        return pipeline.output_file
+    except Exception as e:
+        status.update({"status": FAILED, "finished_at": _timestamp(), "error": str(e)})
+        _write_status(job_dir, status)
+        progress.append({"event": "status", "time": status["finished_at"], "status": FAILED, "error": str(e)})
+        JOBS_FINISHED.labels(FAILED).inc()
+        raise
+    finally:
+        if pipeline is not None:
+            pipeline.close_logging()
+        if os.path.exists(input_file):
+            os.unlink(input_file)
+
+
+class JobManager:
+    """Queue pipeline runs on a bounded process pool.
+
+    Every job runs in its own workspace, ``<jobs_dir>/<job_id>/``, holding the upload, the
+    pipeline log and the output directory, so concurrent jobs never touch each other's
+    files; ``collect_garbage`` removes workspaces once they outlive their TTL. Job state
+    lives in ``status.json`` in the workspace rather than in memory, so any Gunicorn
+    worker can answer status and result requests for a job submitted to another.
+    """
+
+    def __init__(self, jobs_dir: str = "jobs", max_workers: Optional[int] = None):
+        self.jobs_dir = os.path.abspath(jobs_dir)
+        self.max_workers = max_workers or int(os.getenv("JOB_WORKERS", "1"))
+        self.start_method = os.getenv("JOB_START_METHOD", "spawn")
+        self._executor = None
+        self._futures: Dict[str, Future] = {}
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created lazily so a preloading master never forks with a live pool
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(self.start_method)
+            )
+            logger.info(f"Started job pool with {self.max_workers} worker(s)")
+        return self._executor
+
+    def job_dir(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, job_id)
+
+    def create_job(self) -> str:
+        """Reserve a job directory; the caller writes the upload to ``input_path``."""
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.job_dir(job_id))
+        return job_id
+
+    def input_path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir(job_id), INPUT_FILE)
+
+    def stream_path(self, job_id: str, output_format: str = DEFAULT_OUTPUT_FORMAT) -> str:
+        """Fixed output location for streaming jobs, known before the job starts writing."""
+        return os.path.join(self.job_dir(job_id), OUTPUT_DIR, STREAM_FILE_STEM + output_extension(output_format))
+
+    def submit(self, job_id: str, categorical_columns: List[str], engine: str = "ctgan", metrics_level: str = "basic", cardinality: Optional[Dict] = None, admission: Optional[Dict] = None, **pipeline_kwargs) -> Future:
+        """Queue a prepared job and return the future of its result file.
+
+        ``admission`` is the job's resource estimate, already admitted to the memory budget.
+        """
+        job_dir = self.job_dir(job_id)
+        _write_status(job_dir, {
+            "job_id": job_id,
+            "status": QUEUED,
+            "created_at": _timestamp(),
+            "categorical_columns": categorical_columns,
+            "engine": engine,
+            "metrics_level": metrics_level,
+            "num_samples": pipeline_kwargs.get("num_samples"),
+            "sample_sizes": pipeline_kwargs.get("sample_sizes"),
+            "output_format": pipeline_kwargs.get("output_format", DEFAULT_OUTPUT_FORMAT),
+            "admission": admission,
+            # The pool of this process holds the job until it starts
+            "owner_pid": os.getpid()
+        })
+
+        future = self._get_executor().submit(run_job, job_dir, categorical_columns, pipeline_kwargs, engine, metrics_level, time.time(), cardinality, admission)
+        self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+        logger.info(f"Queued job {job_id}")
+        return future
+
+    def _on_done(self, job_id: str, future: Future) -> None:
+        self._futures.pop(job_id, None)
+        # A pool process that crashed never released its reservation
+        get_default_budget().release(job_id)
+        error = future.exception()
+        if error is None:
+            return
+        logger.error(f"Job {job_id} failed: {error}")
+        # A crashed pool process never got to record its own failure
+        status = _read_status(self.job_dir(job_id)) or {"job_id": job_id}
+        if status.get("status") not in TERMINAL_STATES:
+            status.update({"status": FAILED, "finished_at": _timestamp(), "error": str(error)})
+            _write_status(self.job_dir(job_id), status)
+            JOBS_FINISHED.labels(FAILED).inc()
+
+    def collect_garbage(self, ttl_seconds: int = WORKSPACE_TTL_SECONDS) -> int:
+        """Remove finished job workspaces older than ``ttl_seconds``."""
+        return collect_stale_workspaces(self.jobs_dir, ttl_seconds)
+
+    def get_status(self, job_id: str) -> Optional[Dict]:
+        if not job_id.isalnum():
+            return None
+        return _read_status(self.job_dir(job_id))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
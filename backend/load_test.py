@@ -0,0 +1,347 @@
+"""Load-test the HTTP service with concurrent /generate uploads and /health checks.
+
+Example:
+
+    python load_test.py --requests 200 --concurrency 16 --stub 0.5 --output load.json
+    python load_test.py --workers 4 --job-workers 2 --epochs 1 --engine ctgan
+    python load_test.py --url http://localhost:7860 --server-pid 1234 --requests 50
+
+Without ``--url`` the service is started with Gunicorn and gunicorn_conf.py in a scratch
+directory, so its jobs, caches and host-wide state do not touch a running deployment.
+``--stub SECONDS`` replaces training and sampling with a fixed delay in the job pool
+(``STUB_PIPELINE_SECONDS``), so runs measure the serving stack; otherwise fits are capped
+at ``--epochs`` (``TRAIN_EPOCHS``). Every upload is a distinct generated CSV, so the
+model cache never short-cuts a fit.
+
+Reports throughput, p50/p95/p99 latency per endpoint, error and timeout rates, and the
+peak RSS of every Gunicorn worker and of its job pool, as JSON tagged with the git commit.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import numpy as np
+import psutil
+
+from benchmark_pipeline import generate_dataset, git_commit
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+RSS_SAMPLE_SECONDS = 0.2
+HEALTH_POLL_SECONDS = 0.5
+PERCENTILES = (50, 95, 99)
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """``generate=0.8,health=0.2`` -> normalized request shares."""
+    mix = {}
+    for part in value.split(","):
+        name, _, share = part.partition("=")
+        if name.strip() not in ("generate", "health"):
+            raise argparse.ArgumentTypeError(f"Unknown request kind '{name}', expected generate or health")
+        mix[name.strip()] = float(share or 1)
+    total = sum(mix.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError("The request mix needs a positive share")
+    return {name: share / total for name, share in mix.items()}
+
+
+def encode_multipart(fields: Dict[str, str], filename: str, content: bytes) -> tuple:
+    """Body and content type of a multipart form with ``fields`` and one CSV file."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: text/csv\r\n\r\n'.encode() + content + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class HttpClient:
+    """One keep-alive connection per client thread; a failed request reopens it."""
+
+    def __init__(self, url: str, timeout: float):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if getattr(self._local, "connection", None) is None:
+            self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return self._local.connection
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None, headers: Optional[Dict] = None) -> Dict:
+        """Send one request and read the whole response; returns status, seconds and bytes."""
+        start = time.perf_counter()
+        connection = self._connection()
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            size = len(response.read())
+            result = {"status": response.status, "bytes": size}
+            if response.will_close:
+                connection.close()
+                self._local.connection = None
+        except socket.timeout:
+            result = {"status": None, "error": "timeout"}
+        except (OSError, http.client.HTTPException) as e:
+            result = {"status": None, "error": type(e).__name__}
+        if result["status"] is None:
+            connection.close()
+            self._local.connection = None
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+
+class ProcessTreeSampler:
+    """Polls the RSS of a Gunicorn master's workers and of each worker's job pool, keeping the peaks."""
+
+    def __init__(self, pid: int, interval: float = RSS_SAMPLE_SECONDS):
+        self.master = psutil.Process(pid)
+        self.interval = interval
+        self.peaks: Dict[int, Dict] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self) -> None:
+        try:
+            workers = self.master.children()
+        except psutil.NoSuchProcess:
+            return
+        for worker in workers:
+            try:
+                rss = worker.memory_info().rss
+                pool_rss = sum(child.memory_info().rss for child in worker.children(recursive=True))
+            except psutil.NoSuchProcess:
+                continue  # Restarted or exiting worker
+            peak = self.peaks.setdefault(worker.pid, {"rss_mb": 0.0, "job_pool_rss_mb": 0.0})
+            peak["rss_mb"] = max(peak["rss_mb"], round(rss / 1024 ** 2, 1))
+            peak["job_pool_rss_mb"] = max(peak["job_pool_rss_mb"], round(pool_rss / 1024 ** 2, 1))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "ProcessTreeSampler":
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def start_server(args, work_dir: str) -> subprocess.Popen:
+    """Start Gunicorn with gunicorn_conf.py in ``work_dir`` and wait until /health answers."""
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": os.pathsep.join(filter(None, [BACKEND_DIR, env.get("PYTHONPATH")])),
+        "BIND": f"127.0.0.1:{args.port}",
+        "WEB_CONCURRENCY": str(args.workers),
+        "JOB_WORKERS": str(args.job_workers),
+        "TRAIN_EPOCHS": str(args.epochs),
+        "STUB_PIPELINE_SECONDS": str(args.stub or 0),
+        "PRELOAD_APP": "true" if args.preload else "false",
+        "PROMETHEUS_MULTIPROC_DIR": os.path.join(work_dir, "prometheus"),
+        "TRAINING_STATE_DIR": os.path.join(work_dir, "training_slots"),
+        "ADMISSION_STATE_DIR": os.path.join(work_dir, "admission")
+    })
+    log = open(os.path.join(work_dir, "server.log"), "wb")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", os.path.join(BACKEND_DIR, "gunicorn_conf.py"), "app:app"],
+        cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    client = HttpClient(f"http://127.0.0.1:{args.port}", timeout=5)
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with status {server.returncode}, see {log.name}")
+        if client.request("GET", "/health").get("status") == 200:
+            return server
+        time.sleep(HEALTH_POLL_SECONDS)
+    stop_server(server)
+    raise RuntimeError(f"Server did not answer /health within {args.startup_timeout}s, see {log.name}")
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def plan_requests(args) -> List[Dict]:
+    """The request sequence, with the uploads generated up front so the clock only times HTTP."""
+    rng = np.random.default_rng(args.seed)
+    kinds = rng.choice(list(args.mix), size=args.requests, p=list(args.mix.values()))
+    columns = ",".join(f"col_{i}" for i in range(args.columns))
+    fields = {
+        "categorical_columns": columns,
+        "num_samples": str(args.num_samples),
+        "engine": args.engine,
+        "metrics_level": args.metrics_level,
+        "output_format": "csv"
+    }
+    planned = []
+    for i, kind in enumerate(kinds):
+        if kind == "health":
+            planned.append({"kind": "health", "method": "GET", "path": "/health"})
+            continue
+        # A seed per request keeps every upload distinct, so the model cache never hits
+        csv = generate_dataset(args.rows, args.columns, args.cardinality, seed=args.seed + i).to_csv(index=False)
+        body, content_type = encode_multipart(fields, f"load_{i}.csv", csv.encode())
+        planned.append({
+            "kind": "generate", "method": "POST", "path": "/generate",
+            "body": body, "headers": {"Content-Type": content_type}
+        })
+    return planned
+
+
+def summarize(results: List[Dict], elapsed: float) -> Dict:
+    """Throughput, latency percentiles and error and timeout rates, overall and per request kind."""
+    def stats(rows: List[Dict]) -> Dict:
+        ok = [r["seconds"] for r in rows if r["status"] is not None and r["status"] < 400]
+        statuses: Dict[str, int] = {}
+        for r in rows:
+            key = str(r["status"]) if r["status"] is not None else r["error"]
+            statuses[key] = statuses.get(key, 0) + 1
+        summary = {
+            "requests": len(rows),
+            "throughput_rps": round(len(rows) / elapsed, 3) if elapsed else None,
+            "error_rate": round(sum(1 for r in rows if r["status"] is None or r["status"] >= 400) / len(rows), 4),
+            "timeout_rate": round(sum(1 for r in rows if r.get("error") == "timeout") / len(rows), 4),
+            "statuses": statuses
+        }
+        for q in PERCENTILES:
+            summary[f"p{q}_seconds"] = round(float(np.percentile(ok, q)), 4) if ok else None
+        return summary
+
+    by_kind = {}
+    for r in results:
+        by_kind.setdefault(r["kind"], []).append(r)
+    return {
+        "elapsed_seconds": round(elapsed, 3),
+        "overall": stats(results),
+        "endpoints": {kind: stats(rows) for kind, rows in sorted(by_kind.items())}
+    }
+
+
+def run_load(args, url: str, server_pid: Optional[int]) -> Dict:
+    planned = plan_requests(args)
+    client = HttpClient(url, timeout=args.timeout)
+
+    def send(request: Dict) -> Dict:
+        result = client.request(request["method"], request["path"], request.get("body"), request.get("headers"))
+        result["kind"] = request["kind"]
+        return result
+
+    print(f"Sending {len(planned)} requests to {url} with concurrency {args.concurrency} ...", flush=True)
+    with ProcessTreeSampler(server_pid) if server_pid else nullcontext() as sampler:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(send, planned))
+        elapsed = time.perf_counter() - start
+
+    report = summarize(results, elapsed)
+    report["workers"] = {str(pid): peak for pid, peak in sampler.peaks.items()} if sampler is not None else None
+    return report
+
+
+def print_report(report: Dict) -> None:
+    for kind, s in report["endpoints"].items():
+        latency = ", ".join(
+            f"p{q}={s[f'p{q}_seconds']:.3f}s" if s[f"p{q}_seconds"] is not None else f"p{q}=n/a"
+            for q in PERCENTILES
+        )
+        print(f"  {kind}: {s['requests']} requests, {s['throughput_rps']} req/s, {latency}, "
+              f"errors {s['error_rate']:.1%}, timeouts {s['timeout_rate']:.1%}, statuses {s['statuses']}")
+    for pid, peak in (report["workers"] or {}).items():
+        print(f"  worker {pid}: peak RSS {peak['rss_mb']}MB, job pool {peak['job_pool_rss_mb']}MB")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="existing server to test instead of starting one")
+    parser.add_argument("--server-pid", type=int, default=None, help="Gunicorn master of --url, for worker RSS")
+    parser.add_argument("--port", type=int, default=7861, help="port of the started server")
+    parser.add_argument("--workers", type=int, default=2, help="Gunicorn workers (WEB_CONCURRENCY)")
+    parser.add_argument("--job-workers", type=int, default=1, help="job pool processes per worker (JOB_WORKERS)")
+    parser.add_argument("--preload", action="store_true", help="start with PRELOAD_APP=true")
+    parser.add_argument("--stub", type=float, default=None, metavar="SECONDS", help="replace training with a fixed delay")
+    parser.add_argument("--epochs", type=int, default=1, help="maximum CTGAN epochs (TRAIN_EPOCHS)")
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("generate=0.8,health=0.2"),
+                        help="request shares, e.g. generate=0.8,health=0.2")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds before a request counts as timed out")
+    parser.add_argument("--rows", type=int, default=1000, help="rows per uploaded CSV")
+    parser.add_argument("--columns", type=int, default=5)
+    parser.add_argument("--cardinality", type=int, default=10)
+    parser.add_argument("--num-samples", type=int, default=1000)
+    parser.add_argument("--engine", default="chow_liu")
+    parser.add_argument("--metrics-level", default="none")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="error rate above which the exit status is 1")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        report = run_load(args, args.url, args.server_pid)
+    else:
+        work_dir = tempfile.mkdtemp(prefix="load_test_")
+        server = start_server(args, work_dir)
+        try:
+            report = run_load(args, f"http://127.0.0.1:{args.port}", server.pid)
+        finally:
+            stop_server(server)
+        # Kept after a failed run, for its server.log
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "total_memory_mb": round(psutil.virtual_memory().total / 1024 ** 2)
+        },
+        "settings": {k: v for k, v in vars(args).items() if k != "output"},
+        **report
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"Wrote {args.output}")
+    return 1 if report["overall"]["error_rate"] > args.max_error_rate else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,9 +4,12 @@ from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import traceback
 import logging
-import shutil
+import uuid
 from synthetic_data_pipeline import SyntheticDataPipeline
-import time
+from pipeline_options import ENGINES, METRIC_LEVELS
+from output_writers import OUTPUT_FORMATS, media_type, negotiate_format, output_extension
+from job_manager import collect_stale_workspaces
+from cardinality import CardinalityPolicy
 
 # Setup logging
 logging.basicConfig(level=logging.DEBUG)
@@ -21,32 +24,12 @@ CORS(app, origins=["*"],
 
 app.config['UPLOAD_FOLDER'] = 'temp_uploads'
 app.config['OUTPUT_FOLDER'] = 'output'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 512)) * 1024 * 1024  # Uploads stream to disk
 
 # Create necessary directories
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
 
-def cleanup_output_directory(directory):
-    """Remove all files in the output directory except .gitkeep"""
-    for filename in os.listdir(directory):
-        if filename != '.gitkeep':
-            file_path = os.path.join(directory, filename)
-            try:
-                if os.path.isfile(file_path):
-                    # Add retry logic for locked files
-                    max_retries = 3
-                    for _ in range(max_retries):
-                        try:
-                            os.unlink(file_path)
-                            break
-                        except PermissionError:
-                            time.sleep(1)  # Wait before retry
-                elif os.path.isdir(file_path):
-                    shutil.rmtree(file_path, ignore_errors=True)
-            except Exception as e:
-                logger.error(f'Error deleting {file_path}: {e}')
-
 @app.route('/health', methods=['GET'])
 def health_check():
     try:
@@ -58,9 +41,8 @@ def health_check():
 @app.route('/generate', methods=['POST'])
 def generate_synthetic_data():
     try:
-        # Clean up output directory before starting
-        cleanup_output_directory(app.config['OUTPUT_FOLDER'])
-        logger.info("Cleaned up output directory")
+        # Each request works in its own workspace; expired ones are collected by age
+        collect_stale_workspaces(app.config['OUTPUT_FOLDER'])
 
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
@@ -70,8 +52,9 @@ def generate_synthetic_data():
             return jsonify({'error': 'No file selected'}), 400
 
         # Save uploaded file
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        workspace = os.path.join(app.config['OUTPUT_FOLDER'], uuid.uuid4().hex)
+        os.makedirs(workspace)
+        filepath = os.path.join(workspace, secure_filename(file.filename) or 'input.csv')
         file.save(filepath)
 
         logger.info(f"File saved to {filepath}")
@@ -92,6 +75,23 @@ def generate_synthetic_data():
         except ValueError:
             return jsonify({'error': 'Invalid number of samples'}), 400
 
+        try:
+            max_train_seconds = float(config.get('max_train_seconds', os.environ.get('MAX_TRAIN_SECONDS', 240)))
+        except ValueError:
+            return jsonify({'error': 'Invalid max_train_seconds'}), 400
+
+        engine = config.get('engine', 'ctgan')
+        if engine not in ENGINES:
+            return jsonify({'error': f"Unknown engine '{engine}', expected one of {', '.join(ENGINES)}"}), 400
+
+        metrics_level = config.get('metrics_level', os.environ.get('METRICS_LEVEL', 'basic'))
+        if metrics_level not in METRIC_LEVELS:
+            return jsonify({'error': f"Unknown metrics level '{metrics_level}', expected one of {', '.join(METRIC_LEVELS)}"}), 400
+
+        output_format = config.get('output_format') or negotiate_format(request.headers.get('Accept'))
+        if output_format not in OUTPUT_FORMATS:
+            return jsonify({'error': f"Unknown output format '{output_format}', expected one of {', '.join(OUTPUT_FORMATS)}"}), 400
+
         logger.info(f"Processing with categorical columns: {categorical_columns}")
         logger.info(f"Number of samples requested: {num_samples}")
 
@@ -99,34 +99,36 @@ def generate_synthetic_data():
         pipeline = SyntheticDataPipeline(
             input_file=filepath,
             categorical_columns=categorical_columns,
-            output_dir=os.path.abspath(app.config['OUTPUT_FOLDER'])
+            output_dir=os.path.join(os.path.abspath(workspace), 'output'),
+            engine=engine,
+            metrics_level=metrics_level,
+            cardinality_policy=CardinalityPolicy.from_env()
         )
         
-        pipeline.run_pipeline(
-            num_samples=num_samples,
-            epochs=100,
-            chunk_size=10000
-        )
-
-        # Get latest generated file
-        output_dir = pipeline.output_dir
-        files = [f for f in os.listdir(output_dir) if f.startswith("synthetic_data_")]
-        
-        if not files:
+        try:
+            pipeline.run_pipeline(
+                num_samples=num_samples,
+                epochs=100,
+                max_train_seconds=max_train_seconds,
+                output_format=output_format,
+                chunk_size=10000
+            )
+        finally:
+            pipeline.close_logging()
+            # Clean up
+            os.remove(filepath)
+
+        output_path = pipeline.output_file
+        if not output_path:
             raise Exception("No output file generated")
-            
-        latest_file = sorted(files)[-1]
-        output_path = os.path.join(output_dir, latest_file)
         
         logger.info(f"Sending file: {output_path}")
         
-        # Clean up
-        os.remove(filepath)
-        
         return send_file(
             output_path,
             as_attachment=True,
-            download_name='synthetic_data.csv'
+            download_name='synthetic_data' + output_extension(output_format),
+            mimetype=media_type(output_format)
         )
 
     except Exception as e:
@@ -0,0 +1,144 @@
+import os
+import json
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MODEL_SUFFIX = ".pkl"
+
+
+class ModelCache:
+    """Two-tier cache of fitted synthesizers.
+
+    Models are keyed by a hash of the preprocessed training data, the selected columns and
+    the training hyperparameters. The in-memory tier is a small per-process LRU; the disk
+    tier is a directory shared by every Gunicorn worker and is trimmed to ``max_disk_bytes``
+    by evicting the least recently used files.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        memory_items: Optional[int] = None,
+        max_disk_bytes: Optional[int] = None
+    ):
+        self.cache_dir = os.path.abspath(cache_dir or os.getenv("MODEL_CACHE_DIR", "model_cache"))
+        self.memory_items = memory_items if memory_items is not None else int(os.getenv("MODEL_CACHE_MEMORY_ITEMS", "4"))
+        self.max_disk_bytes = max_disk_bytes if max_disk_bytes is not None else int(os.getenv("MODEL_CACHE_MAX_MB", "1024")) * 1024 * 1024
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(data: pd.DataFrame, columns: List[str], params: Dict) -> str:
+        """Content hash of the training frame plus everything that shapes the fitted model.
+
+        An ``EncodedStore`` is identified by its own content hash instead of being read.
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps({"columns": columns, "params": params}, sort_keys=True, default=str).encode())
+        if hasattr(data, "fingerprint"):
+            digest.update(data.fingerprint().encode())
+        else:
+            digest.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + MODEL_SUFFIX)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                logger.info(f"Model cache hit (memory) for {key[:12]}")
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                model = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cached model {path}: {e}")
+            self._remove(path)
+            return None
+
+        # Touch the file so disk eviction sees it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._remember(key, model)
+        logger.info(f"Model cache hit (disk) for {key[:12]}")
+        return model
+
+    def put(self, key: str, model: Any) -> None:
+        self._remember(key, model)
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not write model to cache: {e}")
+            self._remove(tmp_path)
+            return
+
+        self._evict_disk()
+
+    def _remember(self, key: str, model: Any) -> None:
+        if self.memory_items <= 0:
+            return
+        with self._lock:
+            self._memory[key] = model
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith(MODEL_SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue  # Evicted concurrently by another worker
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            self._remove(path)
+            total -= size
+            logger.info(f"Evicted cached model {os.path.basename(path)}")
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+_default_cache = None
+
+
+def get_default_cache() -> ModelCache:
+    """Process-wide cache, so the memory tier survives across jobs run by one pool process."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ModelCache()
+    return _default_cache
@@ -0,0 +1,69 @@
+import os
+import re
+import pickle
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MODEL_SUFFIX = ".pkl"
+MODEL_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+def valid_model_name(name: str) -> bool:
+    return bool(MODEL_NAME_PATTERN.match(name or ""))
+
+
+class ModelRegistry:
+    """Named models that later runs fine-tune instead of training from scratch.
+
+    Unlike ``ModelCache``, whose entries are keyed by a hash of the exact training data
+    and evicted by size, a registry entry is addressed by a client-chosen name and kept
+    until replaced: each refresh of a dataset loads the model saved by the previous one,
+    updates it on the new rows and saves it back under the same name. Entries live in a
+    directory shared by every worker and are replaced atomically.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = os.path.abspath(root or os.getenv("MODEL_REGISTRY_DIR", "model_registry"))
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        if not valid_model_name(name):
+            raise ValueError(f"Invalid model name '{name}'")
+        return os.path.join(self.root, name + MODEL_SUFFIX)
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        """The saved entry (``synthesizer``, ``engine``, ``columns``, ``saved_at``, ``refreshes``) or None."""
+        try:
+            with open(self._path(name), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, name: str, synthesizer: Any, engine: str, columns: List[str], refreshes: int = 0) -> None:
+        path = self._path(name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        entry = {
+            "synthesizer": synthesizer,
+            "engine": engine,
+            "columns": list(columns),
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+            "refreshes": refreshes
+        }
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved model '{name}' ({engine}, refresh {refreshes})")
+
+
+_default_registry = None
+
+
+def get_default_registry() -> ModelRegistry:
+    """Process-wide registry configured from the environment."""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = ModelRegistry()
+    return _default_registry
@@ -0,0 +1,164 @@
+import gzip
+import shutil
+from typing import Dict, List, Optional
+
+# format -> (file extension, media type)
+OUTPUT_FORMATS: Dict[str, tuple] = {
+    "csv": (".csv", "text/csv"),
+    "csv.gz": (".csv.gz", "application/gzip"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+}
+DEFAULT_OUTPUT_FORMAT = "csv"
+PART_COPY_BYTES = 1024 * 1024
+
+# Media types a client may send in Accept to pick a format without the form field
+ACCEPT_TYPES = {
+    "text/csv": "csv",
+    "application/gzip": "csv.gz",
+    "application/x-gzip": "csv.gz",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+    "application/vnd.apache.arrow.file": "arrow",
+}
+
+
+def output_extension(output_format: str) -> str:
+    return OUTPUT_FORMATS[output_format][0]
+
+
+def media_type(output_format: str) -> str:
+    return OUTPUT_FORMATS[output_format][1]
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Pick an output format from an Accept header, honouring q-values; CSV otherwise."""
+    best, best_q = DEFAULT_OUTPUT_FORMAT, 0.0
+    for part in (accept or "").split(","):
+        fields = [f.strip() for f in part.split(";")]
+        q = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        output_format = ACCEPT_TYPES.get(fields[0].lower())
+        if output_format and q > best_q:
+            best, best_q = output_format, q
+    return best
+
+
+class CsvChunkWriter:
+    """Appends chunks to a CSV file, gzip-compressed on the fly for ``csv.gz``.
+
+    ``header=False`` leaves out the header row, for parts that are appended to another file.
+    """
+
+    def __init__(self, path: str, columns: List[str], compress: bool = False, header: bool = True):
+        # pandas is imported lazily so the API process can use the format helpers without it
+        import pandas as pd
+
+        self.columns = columns
+        self._file = gzip.open(path, 'wt', newline='') if compress else open(path, 'w', newline='')
+        if header:
+            self._file.write(pd.DataFrame(columns=columns).to_csv(index=False))
+            self._file.flush()
+
+    def write(self, chunk) -> None:
+        chunk[self.columns].to_csv(self._file, header=False, index=False)
+        # A gzip flush ends the deflate block, so a reader tailing the file can decode it
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ArrowChunkWriter:
+    """Writes each chunk as a Parquet row group or an Arrow IPC record batch.
+
+    Every column is a nullable string. Parquet dictionary-encodes its pages, which is what
+    makes repetitive categorical output small; Arrow IPC batches are zstd-compressed.
+    """
+
+    def __init__(self, path: str, columns: List[str], output_format: str):
+        # pyarrow is only needed for these formats
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.columns = columns
+        self.output_format = output_format
+        self.schema = pa.schema([(col, pa.string()) for col in columns])
+        self._file = open(path, 'wb')
+        if output_format == "parquet":
+            self._writer = pq.ParquetWriter(self._file, self.schema, use_dictionary=True, compression="zstd")
+        else:
+            options = pa.ipc.IpcWriteOptions(compression="zstd")
+            self._writer = pa.ipc.new_file(self._file, self.schema, options=options)
+
+    def write(self, chunk) -> None:
+        table = self._pa.Table.from_pandas(chunk[self.columns], schema=self.schema, preserve_index=False)
+        self._writer.write_table(table)
+        self._file.flush()
+
+    def append_file(self, part_path: str) -> None:
+        """Copy the row groups or record batches of a part file written in the same format."""
+        if self.output_format == "parquet":
+            import pyarrow.parquet as pq
+
+            part = pq.ParquetFile(part_path)
+            for index in range(part.num_row_groups):
+                self._writer.write_table(part.read_row_group(index))
+        else:
+            with self._pa.memory_map(part_path) as source:
+                reader = self._pa.ipc.open_file(source)
+                for index in range(reader.num_record_batches):
+                    self._writer.write_batch(reader.get_batch(index))
+        self._file.flush()
+
+    def close(self) -> None:
+        self._writer.close()
+        self._file.close()
+
+
+def open_chunk_writer(path: str, columns: List[str], output_format: str = DEFAULT_OUTPUT_FORMAT, header: bool = True):
+    """Writer with ``write(chunk)``/``close()`` that encodes rows as they are written."""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of {', '.join(OUTPUT_FORMATS)}")
+    if output_format in ("csv", "csv.gz"):
+        return CsvChunkWriter(path, columns, compress=output_format == "csv.gz", header=header)
+    return ArrowChunkWriter(path, columns, output_format)
+
+
+class PartMerger:
+    """Concatenates part files, in order, into one output file.
+
+    CSV parts are written without a header and copied byte for byte; gzip members may be
+    concatenated, so ``csv.gz`` parts are never decompressed. Parquet row groups and Arrow
+    record batches are copied into a single file.
+    """
+
+    def __init__(self, path: str, columns: List[str], output_format: str = DEFAULT_OUTPUT_FORMAT):
+        self.output_format = output_format
+        if output_format in ("csv", "csv.gz"):
+            open_chunk_writer(path, columns, output_format).close()
+            self._file = open(path, 'ab')
+            self._writer = None
+        else:
+            self._file = None
+            self._writer = open_chunk_writer(path, columns, output_format)
+
+    def append(self, part_path: str) -> None:
+        if self._writer is not None:
+            self._writer.append_file(part_path)
+            return
+        with open(part_path, 'rb') as part:
+            shutil.copyfileobj(part, self._file, PART_COPY_BYTES)
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        else:
+            self._file.close()
@@ -0,0 +1,9 @@
+# Option values accepted by the pipeline. Nothing heavy is imported here, so the API
+# process validates requests against the same values the pipeline modules use.
+
+# "ctgan" is the high-fidelity GAN; "chow_liu" is a NumPy tree model that fits in seconds
+ENGINES = ("ctgan", "chow_liu")
+# "none" skips validation, "basic" reports shapes and unique counts, "full" adds fidelity scores
+METRIC_LEVELS = ("none", "basic", "full")
+# What a run does with synthetic rows that reproduce a rare real record
+PRIVACY_FILTERS = ("drop", "resample")
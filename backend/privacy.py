@@ -0,0 +1,263 @@
+import os
+import time
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from pipeline_options import PRIVACY_FILTERS
+
+logger = logging.getLogger(__name__)
+
+MISSING_LABEL = "MISSING"
+# Matches to real combinations seen at most this many times count as leaked records;
+# common combinations are reproduced by any faithful model of low-cardinality data
+LEAK_MAX_REAL_COUNT = int(os.getenv("PRIVACY_LEAK_MAX_COUNT", "1"))
+# Real rows hashed per pass while the index is built
+INDEX_CHUNK_ROWS = 1_000_000
+# The exact distance-1 index holds one hash per real row and column; above this many
+# hashes distances are only measured against the reference sample
+NEAR_DUPLICATE_MAX_HASHES = 50_000_000
+# Distance to closest record is measured for this many synthetic rows ...
+DCR_SAMPLE_ROWS = 5_000
+# ... against this many real rows
+DCR_REFERENCE_ROWS = 20_000
+# Bounds the dense block of the match-count product (synthetic rows x reference rows)
+DCR_BLOCK_CELLS = 4_000_000
+
+_SEED = np.uint64(0xCBF29CE484222325)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, in place on a uint64 array."""
+    h ^= h >> np.uint64(30)
+    h *= _MIX_1
+    h ^= h >> np.uint64(27)
+    h *= _MIX_2
+    h ^= h >> np.uint64(31)
+    return h
+
+
+def hash_rows(codes: np.ndarray, skip: Optional[int] = None) -> np.ndarray:
+    """64-bit hash of every row of a ``(rows, columns)`` code matrix.
+
+    Columns are folded in one at a time, so the cost is a few vectorized passes per
+    column. With ``skip`` that column is left out, which makes rows that differ only
+    there collide on purpose (see ``LeakageIndex``).
+    """
+    h = np.full(len(codes), _SEED, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for j in range(codes.shape[1]):
+            if j == skip:
+                continue
+            h ^= codes[:, j].astype(np.uint64) + np.uint64(j + 1) * _GOLDEN
+            _mix(h)
+    return h
+
+
+def _member(sorted_hashes: np.ndarray, hashes: np.ndarray) -> tuple:
+    """Positions of ``hashes`` in ``sorted_hashes`` and whether each one is there."""
+    if not len(sorted_hashes):
+        return np.zeros(len(hashes), dtype=np.int64), np.zeros(len(hashes), dtype=bool)
+    # Searching in sorted order walks the index once instead of jumping around it
+    order = np.argsort(hashes)
+    positions = np.empty(len(hashes), dtype=np.int64)
+    positions[order] = np.searchsorted(sorted_hashes, hashes[order])
+    np.minimum(positions, len(sorted_hashes) - 1, out=positions)
+    return positions, sorted_hashes[positions] == hashes
+
+
+class LeakageIndex:
+    """Hashed index of the real rows that synthetic rows are checked against.
+
+    Every real row is integer-coded against one vocabulary per column and reduced to a
+    64-bit hash, so the index holds the sorted distinct hashes and how often each one
+    occurs, not the rows. Rows one column apart are found exactly with one more hash
+    set per column that leaves that column out. A random sample of distinct real rows
+    serves as the reference for distances of two columns and more.
+    """
+
+    def __init__(self, columns: List[str], vocabularies: Dict[str, pd.Index], code_chunks, num_rows: int, seed: int = 0):
+        self.columns = columns
+        self.vocabularies = vocabularies
+        self.num_rows = num_rows
+        near = num_rows * len(columns) <= NEAR_DUPLICATE_MAX_HASHES
+        hashes, near_hashes, reference = [], [[] for _ in columns] if near else None, []
+        rng = np.random.default_rng(seed)
+        # Each chunk contributes its share of the reference sample
+        share = min(1.0, DCR_REFERENCE_ROWS / max(num_rows, 1))
+        for codes in code_chunks:
+            hashes.append(hash_rows(codes))
+            if near_hashes is not None:
+                for j in range(len(columns)):
+                    near_hashes[j].append(np.unique(hash_rows(codes, skip=j)))
+            picked = rng.random(len(codes)) < share
+            reference.append(codes[picked])
+
+        self.hashes, self.counts = np.unique(np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64), return_counts=True)
+        self.near_hashes = [np.unique(np.concatenate(parts)) for parts in near_hashes] if near_hashes is not None else None
+        reference = np.concatenate(reference) if reference else np.empty((0, len(columns)), dtype=np.int64)
+        self.reference = np.unique(reference, axis=0) if len(reference) else reference
+        self._reference_one_hot = self._one_hot(self.reference).T.tocsr() if len(self.reference) else None
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, columns: List[str]) -> "LeakageIndex":
+        """Index a loaded real frame; ``category`` columns reuse their codes."""
+        vocabularies, codes = {}, np.empty((len(data), len(columns)), dtype=np.int64)
+        for i, col in enumerate(columns):
+            column = data[col]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                labels = pd.Index([str(c) for c in column.cat.categories], dtype=object)
+                column_codes = column.cat.codes.to_numpy().astype(np.int64)
+            else:
+                column_codes, labels = pd.factorize(column.astype(object).where(column.notna(), MISSING_LABEL).astype(str))
+                labels = pd.Index(labels, dtype=object)
+            if MISSING_LABEL not in labels:
+                labels = labels.append(pd.Index([MISSING_LABEL], dtype=object))
+            codes[:, i] = np.where(column_codes >= 0, column_codes, labels.get_loc(MISSING_LABEL))
+            vocabularies[col] = labels
+        chunks = (codes[start:start + INDEX_CHUNK_ROWS] for start in range(0, len(codes), INDEX_CHUNK_ROWS))
+        return cls(columns, vocabularies, chunks, len(codes))
+
+    @classmethod
+    def from_store(cls, store, columns: List[str]) -> "LeakageIndex":
+        """Index an ``EncodedStore`` in row blocks, without loading it."""
+        vocabularies = {col: pd.Index(store.categories[col], dtype=object) for col in columns}
+        chunks = (
+            np.stack([np.asarray(store.codes(col)[start:start + INDEX_CHUNK_ROWS], dtype=np.int64) for col in columns], axis=1)
+            for start in range(0, len(store), INDEX_CHUNK_ROWS)
+        )
+        return cls(columns, vocabularies, chunks, len(store))
+
+    def encode(self, frame: pd.DataFrame) -> np.ndarray:
+        """Code a synthetic frame against the real vocabularies; unseen values get -1."""
+        codes = np.empty((len(frame), len(self.columns)), dtype=np.int64)
+        for i, col in enumerate(self.columns):
+            values = frame[col].astype(object)
+            unique_codes, uniques = pd.factorize(values.where(values.notna(), MISSING_LABEL).astype(str))
+            codes[:, i] = self.vocabularies[col].get_indexer(uniques)[unique_codes]
+        return codes
+
+    def _one_hot(self, codes: np.ndarray) -> sparse.csr_matrix:
+        sizes = [len(self.vocabularies[col]) for col in self.columns]
+        offsets = np.concatenate([[0], np.cumsum(sizes)])[:-1]
+        rows, cols = np.nonzero(codes >= 0)
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, codes[rows, cols] + offsets[cols])),
+            shape=(len(codes), int(sum(sizes)))
+        )
+
+    def real_counts(self, codes: np.ndarray) -> np.ndarray:
+        """How often each row's exact combination occurs in the real data (0 when never)."""
+        positions, found = _member(self.hashes, hash_rows(codes))
+        return np.where(found, self.counts[positions] if len(self.counts) else 0, 0)
+
+    def near_duplicates(self, codes: np.ndarray) -> Optional[np.ndarray]:
+        """Whether each row equals some real row in all columns but one, or None without the index."""
+        if self.near_hashes is None:
+            return None
+        near = np.zeros(len(codes), dtype=bool)
+        for j, sorted_hashes in enumerate(self.near_hashes):
+            near |= _member(sorted_hashes, hash_rows(codes, skip=j))[1]
+        return near
+
+    def reference_distances(self, codes: np.ndarray) -> np.ndarray:
+        """Hamming distance from each row to its closest row of the reference sample.
+
+        Matching cells come out of one sparse one-hot product per block, so the cost
+        follows the cells that actually match rather than rows x references x columns.
+        """
+        if self._reference_one_hot is None:
+            return np.full(len(codes), len(self.columns), dtype=np.int64)
+        block = max(1, DCR_BLOCK_CELLS // len(self.reference))
+        distances = np.empty(len(codes), dtype=np.int64)
+        for start in range(0, len(codes), block):
+            matches = (self._one_hot(codes[start:start + block]) @ self._reference_one_hot).toarray().max(axis=1)
+            distances[start:start + block] = len(self.columns) - matches.astype(np.int64)
+        return distances
+
+
+class LeakageCheck:
+    """Counts reproduced real records in synthetic chunks as they are written.
+
+    ``screen`` codes each chunk against a ``LeakageIndex`` and counts exact matches, rows
+    matching a real combination seen at most ``max_real_count`` times (leaked records)
+    and rows one column away from a real row. Distances to the closest record are taken
+    for the first ``dcr_rows`` rows: exact for 0 and 1, and against the reference sample
+    beyond that. With ``drop`` the leaked rows are removed from the chunk.
+    """
+
+    def __init__(self, index: LeakageIndex, max_real_count: int = LEAK_MAX_REAL_COUNT, dcr_rows: int = DCR_SAMPLE_ROWS):
+        self.index = index
+        self.max_real_count = max_real_count
+        self.dcr_rows = dcr_rows
+        self.rows = 0
+        self.exact_matches = 0
+        self.leaked = 0
+        self.near_duplicates = 0
+        self.removed = 0
+        self.seconds = 0.0
+        self.distance_counts = np.zeros(len(index.columns) + 1, dtype=np.int64)
+
+    def screen(self, chunk: pd.DataFrame, drop: bool = False) -> pd.DataFrame:
+        if not len(chunk):
+            return chunk
+        start = time.perf_counter()
+        codes = self.index.encode(chunk)
+        counts = self.index.real_counts(codes)
+        exact = counts > 0
+        leaked = exact & (counts <= self.max_real_count)
+        near = self.index.near_duplicates(codes)
+        self.rows += len(chunk)
+        self.exact_matches += int(exact.sum())
+        self.leaked += int(leaked.sum())
+        if near is not None:
+            self.near_duplicates += int((near & ~exact).sum())
+
+        sampled = min(len(chunk), self.dcr_rows - int(self.distance_counts.sum()))
+        if sampled > 0:
+            distances = np.zeros(sampled, dtype=np.int64)
+            rest = ~exact[:sampled]
+            if near is not None:
+                distances[rest & near[:sampled]] = 1
+                rest &= ~near[:sampled]
+            # The index ruled out 0 (and 1) for these rows, which the reference sample may not contain
+            floor = 2 if near is not None else 1
+            distances[rest] = np.maximum(self.index.reference_distances(codes[:sampled][rest]), floor)
+            self.distance_counts += np.bincount(distances, minlength=len(self.distance_counts))
+
+        self.seconds += time.perf_counter() - start
+        if drop and leaked.any():
+            self.removed += int(leaked.sum())
+            return chunk[~leaked]
+        return chunk
+
+    def summary(self, action: Optional[str] = None) -> Dict:
+        sampled = int(self.distance_counts.sum())
+        cumulative = np.cumsum(self.distance_counts)
+        return {
+            "real_rows": self.index.num_rows,
+            "distinct_real_rows": int(len(self.index.hashes)),
+            "real_unique_share": round(float((self.index.counts == 1).sum() / max(self.index.num_rows, 1)), 4),
+            "synthetic_rows_checked": self.rows,
+            "exact_matches": self.exact_matches,
+            "exact_match_share": round(self.exact_matches / max(self.rows, 1), 4),
+            "leaked_records": self.leaked,
+            "leak_max_real_count": self.max_real_count,
+            "near_duplicates": self.near_duplicates if self.index.near_hashes is not None else None,
+            "distance_to_closest_record": {
+                "rows_sampled": sampled,
+                "reference_rows": int(len(self.index.reference)),
+                "histogram": {str(d): int(n) for d, n in enumerate(self.distance_counts) if n},
+                "median": int(np.searchsorted(cumulative, sampled / 2)) if sampled else None,
+                "share_within_1": round(float(cumulative[min(1, len(cumulative) - 1)] / sampled), 4) if sampled else None
+            },
+            "action": action,
+            "removed_rows": self.removed,
+            "screen_seconds": round(self.seconds, 3)
+        }
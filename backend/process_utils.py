@@ -0,0 +1,19 @@
+import os
+from typing import Optional
+
+
+def pid_alive(pid: Optional[int]) -> bool:
+    """Whether a process with this id exists on the host; missing or non-positive ids never do.
+
+    ``os.kill`` with signal 0 only checks for the process. A non-positive id would address a
+    whole process group instead, so it is rejected up front.
+    """
+    if not pid or pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists, but belongs to another user
+    return True
@@ -0,0 +1,288 @@
+import os
+import sys
+import time
+import pickle
+import shutil
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from output_writers import DEFAULT_OUTPUT_FORMAT, PartMerger, open_chunk_writer, output_extension
+from training_scheduler import available_cpus
+
+logger = logging.getLogger(__name__)
+
+# Processes used to sample one run; 1 keeps sampling in the pipeline process
+SAMPLE_WORKERS = int(os.getenv("SAMPLE_WORKERS", "1"))
+# spawn by default: forking a process that already ran torch can deadlock its thread pools
+SAMPLE_START_METHOD = os.getenv("SAMPLE_START_METHOD", "spawn")
+# Below this many rows, starting the pool costs more than it saves
+PARALLEL_MIN_ROWS = int(os.getenv("PARALLEL_SAMPLE_MIN_ROWS", "200000"))
+# Shards per worker; more shards balance better, fewer mean fewer part files
+SHARDS_PER_WORKER = 4
+MODEL_FILE = "model.pkl"
+# Conditional CTGAN draws are sized from the acceptance rate seen so far, with this margin
+REJECTION_OVERSAMPLE = 1.2
+# A condition that is still short after this many draws is reported as too rare
+MAX_REJECTION_ROUNDS = 50
+MAX_DRAW_ROWS = 1_000_000
+
+# Set once per pool process by _init_worker
+_worker: Dict = {}
+
+
+def postprocess_frame(synthetic_data: pd.DataFrame, categorical_columns: List[str], reducer=None) -> pd.DataFrame:
+    """Cast sampled categorical columns to str, re-expand bucketed values and restore NaNs.
+
+    Each column becomes one object array that is expanded and masked in place, instead of
+    a full ``astype`` copy followed by a full ``replace`` copy of every column.
+    """
+    columns = {}
+    for col in synthetic_data.columns:
+        if col not in categorical_columns:
+            columns[col] = synthetic_data[col]
+            continue
+        values = synthetic_data[col].astype(str).to_numpy(dtype=object)
+        if reducer is not None:
+            reducer.expand_column(col, values)
+        values[values == 'MISSING'] = np.nan
+        columns[col] = values
+    return pd.DataFrame(columns, index=synthetic_data.index)
+
+
+def seed_synthesizer(synthesizer, seed: int) -> None:
+    """Give a synthesizer its own random stream, so shards never repeat each other's rows."""
+    if hasattr(synthesizer, "set_random_state"):
+        synthesizer.set_random_state(seed)
+    else:
+        np.random.seed(seed)
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            torch.manual_seed(seed)
+
+
+def shard_sizes(num_samples: int, workers: int, chunk_size: int) -> List[int]:
+    """Split ``num_samples`` into near-equal shards of at least one chunk each."""
+    shards = max(1, min(workers * SHARDS_PER_WORKER, -(-num_samples // chunk_size)))
+    base, extra = divmod(num_samples, shards)
+    return [base + (1 if i < extra else 0) for i in range(shards)]
+
+
+def iter_matching(
+    synthesizer,
+    conditions: Dict[str, str],
+    num_rows: int,
+    anchor: str,
+    chunk_size: int = 10000,
+    stats: Optional[Dict] = None
+):
+    """Yield model-space chunks, ``num_rows`` in total, that have every value in ``conditions``.
+
+    Synthesizers with ``sample_conditioned`` (Chow-Liu) draw from the exact conditional
+    distribution. CTGAN's conditional vector is set to the ``anchor`` column, the rarest
+    condition, which makes most draws match it; rows missing any other condition are
+    rejected and the next draw is sized from the acceptance rate seen so far. A chunk
+    still short after ``MAX_REJECTION_ROUNDS`` draws raises ``ValueError``. ``stats``
+    receives the rows drawn and the acceptance rate.
+    """
+    stats = stats if stats is not None else {}
+    drawn = accepted = produced = 0
+    while produced < num_rows:
+        n = min(chunk_size, num_rows - produced)
+        if hasattr(synthesizer, "sample_conditioned"):
+            chunk = synthesizer.sample_conditioned(n, conditions)
+            drawn += n
+            accepted += n
+        else:
+            parts, got, rounds = [], 0, 0
+            while got < n:
+                if rounds >= MAX_REJECTION_ROUNDS:
+                    raise ValueError(
+                        f"Only {produced + got} of {num_rows} rows matched {conditions} after {drawn} draws; "
+                        "the combination is too rare for the trained model"
+                    )
+                acceptance = accepted / drawn if drawn else 1.0
+                batch = int(min(MAX_DRAW_ROWS, np.ceil((n - got) / max(acceptance, 1e-3) * REJECTION_OVERSAMPLE)))
+                sampled = synthesizer.sample(batch, condition_column=anchor, condition_value=conditions[anchor])
+                mask = np.ones(len(sampled), dtype=bool)
+                for col, value in conditions.items():
+                    mask &= sampled[col].astype(str).to_numpy() == value
+                drawn += len(sampled)
+                accepted += int(mask.sum())
+                rounds += 1
+                matched = sampled[mask].iloc[:n - got]
+                parts.append(matched)
+                got += len(matched)
+            chunk = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].reset_index(drop=True)
+        produced += n
+        stats.update({"drawn": drawn, "acceptance": round(accepted / drawn, 4) if drawn else None})
+        yield chunk
+
+
+def _init_worker(model_path: str, categorical_columns: List[str], reducer, threads: int) -> None:
+    from threadpoolctl import threadpool_limits
+
+    with open(model_path, 'rb') as f:
+        _worker["synthesizer"] = pickle.load(f)
+    _worker["categorical_columns"] = categorical_columns
+    _worker["reducer"] = reducer
+    # Workers share the cores, so each keeps its torch and BLAS pools to its own share
+    _worker["thread_limits"] = threadpool_limits(limits=threads)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+
+def _sample_shard(
+    index: int,
+    num_rows: int,
+    seed: int,
+    chunk_size: int,
+    part_path: str,
+    output_format: str,
+    header: bool,
+    track_values: bool,
+    metric_rows: int
+) -> Dict:
+    """Sample, post-process and write one shard in a pool process."""
+    synthesizer = _worker["synthesizer"]
+    columns = _worker["categorical_columns"]
+    reducer = _worker["reducer"]
+    seed_synthesizer(synthesizer, seed)
+    if reducer is not None:
+        reducer.set_random_state(seed)
+
+    start = time.perf_counter()
+    seen_values = {col: set() for col in columns} if track_values else None
+    metric_chunks = []
+    written = 0
+    writer = open_chunk_writer(part_path, columns, output_format, header=header)
+    try:
+        while written < num_rows:
+            n = min(chunk_size, num_rows - written)
+            chunk = postprocess_frame(synthesizer.sample(n), columns, reducer)
+            writer.write(chunk)
+            if written < metric_rows:
+                metric_chunks.append(chunk[columns].iloc[:metric_rows - written])
+            if seen_values is not None:
+                for col in columns:
+                    seen_values[col].update(chunk[col].dropna().unique())
+            written += n
+    finally:
+        writer.close()
+    return {
+        "index": index,
+        "path": part_path,
+        "rows": written,
+        "seconds": time.perf_counter() - start,
+        "seen_values": seen_values,
+        "metric_sample": pd.concat(metric_chunks, ignore_index=True) if metric_chunks else None
+    }
+
+
+class ParallelSampler:
+    """Samples a fitted synthesizer in a process pool, one independently seeded shard per task.
+
+    The model is pickled once to the work directory and loaded by every worker when it
+    starts, instead of being sent with each task. Workers post-process and encode their
+    shard into a part file; with ``merge=True`` the parts are appended to ``output_file``
+    in shard order as soon as each one is done, so a reader tailing the output still sees
+    rows while later shards are being sampled. Otherwise the parts are kept in a directory.
+    """
+
+    def __init__(self, workers: Optional[int] = None, start_method: Optional[str] = None):
+        self.workers = max(1, min(workers or SAMPLE_WORKERS, available_cpus()))
+        self.start_method = start_method or SAMPLE_START_METHOD
+        self.threads_per_worker = max(1, available_cpus() // self.workers)
+
+    def sample_to_file(
+        self,
+        synthesizer,
+        categorical_columns: List[str],
+        num_samples: int,
+        output_file: str,
+        work_dir: str,
+        chunk_size: int = 10000,
+        output_format: str = DEFAULT_OUTPUT_FORMAT,
+        reducer=None,
+        merge: bool = True,
+        seed: Optional[int] = None,
+        track_values: bool = False,
+        metric_rows: int = 0,
+        on_shard: Optional[Callable[[int], None]] = None
+    ) -> Dict:
+        """Write ``num_samples`` rows to ``output_file`` (or a part directory when not merging).
+
+        Returns the rows written, the output path, the seed the shard seeds were derived
+        from, per-column sets of sampled values when ``track_values`` is set and up to
+        ``metric_rows`` rows for fidelity scoring, taken evenly from every shard.
+        ``on_shard`` is called with the rows written so far after every shard.
+        """
+        sizes = shard_sizes(num_samples, self.workers, chunk_size)
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % 2 ** 32)
+        shard_seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(len(sizes))]
+        extension = output_extension(output_format)
+        parts_dir = os.path.join(work_dir, f"parts_{os.getpid()}_{int(time.time() * 1000)}") if merge \
+            else output_file
+        os.makedirs(parts_dir, exist_ok=True)
+        model_path = os.path.join(parts_dir, MODEL_FILE)
+        with open(model_path, 'wb') as f:
+            pickle.dump(synthesizer, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        logger.info(f"Sampling {num_samples} rows in {len(sizes)} shards on {self.workers} processes")
+        seen_values = {col: set() for col in categorical_columns} if track_values else None
+        metric_samples = []
+        merger = PartMerger(output_file, categorical_columns, output_format) if merge else None
+        shards = []
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_init_worker,
+                initargs=(model_path, categorical_columns, reducer, self.threads_per_worker)
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        _sample_shard, index, rows, shard_seeds[index], chunk_size,
+                        os.path.join(parts_dir, f"part-{index:05d}{extension}"), output_format,
+                        not merge, track_values, -(-metric_rows // len(sizes))
+                    )
+                    for index, rows in enumerate(sizes)
+                ]
+                # Collected in shard order, so each part is appended as soon as it and
+                # every part before it are done
+                for future in futures:
+                    shard = future.result()
+                    shards.append(shard)
+                    if merger is not None:
+                        merger.append(shard["path"])
+                        os.unlink(shard["path"])
+                    if seen_values is not None:
+                        for col, values in shard["seen_values"].items():
+                            seen_values[col].update(values)
+                    if shard["metric_sample"] is not None:
+                        metric_samples.append(shard["metric_sample"])
+                    if on_shard is not None:
+                        on_shard(sum(done["rows"] for done in shards))
+        finally:
+            if merger is not None:
+                merger.close()
+                shutil.rmtree(parts_dir, ignore_errors=True)
+            elif os.path.exists(model_path):
+                os.unlink(model_path)
+
+        return {
+            "rows": sum(shard["rows"] for shard in shards),
+            "output": output_file,
+            "workers": self.workers,
+            "shards": len(sizes),
+            "seed": seed,
+            "shard_seconds": round(sum(shard["seconds"] for shard in shards), 3),
+            "seen_values": seen_values,
+            "metric_sample": pd.concat(metric_samples, ignore_index=True) if metric_samples else None
+        }
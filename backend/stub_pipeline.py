@@ -0,0 +1,93 @@
+import os
+import time
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from output_writers import DEFAULT_OUTPUT_FORMAT, open_chunk_writer, output_extension
+
+logger = logging.getLogger(__name__)
+
+# Seconds a stubbed run spends in place of training; 0 runs the real pipeline
+STUB_PIPELINE_SECONDS = float(os.getenv("STUB_PIPELINE_SECONDS", "0"))
+
+
+class StubPipeline:
+    """Stand-in for ``SyntheticDataPipeline`` that load tests run in the job pool.
+
+    Training is replaced by a fixed sleep and sampling by drawing rows of the upload with
+    replacement, written through the same chunk writers in the requested format. Uploads,
+    admission, the job pool, progress events and file responses all run as usual, so a
+    load test measures the serving stack rather than the synthesizer.
+    """
+
+    def __init__(
+        self,
+        input_file: str,
+        categorical_columns: List[str],
+        output_dir: str = "output",
+        progress_callback: Optional[Callable[[Dict], None]] = None,
+        fit_seconds: float = STUB_PIPELINE_SECONDS,
+        **ignored
+    ):
+        self.input_file = input_file
+        self.categorical_columns = categorical_columns
+        self.output_dir = os.path.abspath(output_dir)
+        self.progress_callback = progress_callback
+        self.fit_seconds = fit_seconds
+        self.output_file = None
+        self.output_files = {}
+
+    def report_progress(self, event: str, **fields) -> None:
+        if self.progress_callback is not None:
+            self.progress_callback({"event": event, "time": datetime.now().isoformat(timespec="seconds"), **fields})
+
+    def run_pipeline(
+        self,
+        num_samples: int = 1000,
+        chunk_size: int = 10000,
+        output_file: Optional[str] = None,
+        output_format: str = DEFAULT_OUTPUT_FORMAT,
+        conditions: Optional[List[Dict]] = None,
+        sample_sizes: Optional[List[int]] = None,
+        **ignored
+    ) -> None:
+        if conditions:
+            num_samples = sum(condition["num_rows"] for condition in conditions)
+        real_data = pd.read_csv(self.input_file, usecols=self.categorical_columns, dtype=str)
+        self.report_progress("fit", status="started", stub=True)
+        time.sleep(self.fit_seconds)
+        self.report_progress("fit", status="finished", stub=True)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        if sample_sizes:
+            for size in sorted(set(sample_sizes)):
+                size_dir = os.path.join(self.output_dir, f"{size}_rows")
+                os.makedirs(size_dir, exist_ok=True)
+                self.output_files[size] = os.path.join(size_dir, "synthetic_data" + output_extension(output_format))
+                self._write_rows(real_data, self.output_files[size], size, chunk_size, output_format)
+            self.output_file = self.output_files[size]
+            return
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.output_file = output_file or os.path.join(self.output_dir, f"synthetic_data_{timestamp}{output_extension(output_format)}")
+        self._write_rows(real_data, self.output_file, num_samples, chunk_size, output_format)
+
+    def _write_rows(self, real_data: pd.DataFrame, output_file: str, num_samples: int, chunk_size: int, output_format: str) -> None:
+        rng = np.random.default_rng()
+        writer = open_chunk_writer(output_file, self.categorical_columns, output_format)
+        try:
+            written = 0
+            while written < num_samples:
+                n = min(chunk_size, num_samples - written)
+                writer.write(real_data.iloc[rng.integers(0, len(real_data), n)].reset_index(drop=True))
+                written += n
+                self.report_progress("sample", rows_done=written, rows_total=num_samples)
+        finally:
+            writer.close()
+        logger.info(f"Stub run wrote {num_samples} rows to {output_file}")
+
+    def close_logging(self) -> None:
+        pass
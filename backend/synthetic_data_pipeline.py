@@ -1,90 +1,184 @@
 import pandas as pd
 import numpy as np
-from ctgan import CTGAN
-from sklearn.model_selection import train_test_split
 import json
 import os
 from datetime import datetime
 import logging
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 import shutil
 import tempfile
+import time
+import uuid
+from model_cache import ModelCache
+from model_registry import ModelRegistry
+from encoded_store import EncodedStore, EncodedStoreCache
+from chow_liu import ChowLiuSynthesizer
+from cardinality import CardinalityPolicy, CardinalityReducer
+from fidelity_metrics import compute_fidelity_metrics
+from pipeline_options import ENGINES, METRIC_LEVELS, PRIVACY_FILTERS
+from privacy import LeakageCheck, LeakageIndex
+from instrumentation import EPOCHS_RUN, ONE_HOT_WIDTH, instrumented_stage, record_stage
+from training_scheduler import get_default_scheduler
+from output_writers import DEFAULT_OUTPUT_FORMAT, open_chunk_writer, output_extension
+from sampling import PARALLEL_MIN_ROWS, SAMPLE_WORKERS, ParallelSampler, iter_matching, postprocess_frame
+
+from pandas.api.types import union_categoricals
 
 # Check pandas version
 logger = logging.getLogger(__name__)
 logger.info(f"Using pandas version: {pd.__version__}")
 
+# Uploads above this size are parsed in row chunks
+LARGE_FILE_BYTES = 256 * 1024 * 1024
+DEFAULT_READ_CHUNKSIZE = 1_000_000
+
+PIPELINE_LOG = "pipeline.log"
+# Streamed runs score full fidelity on the first rows only; sampled rows are i.i.d.
+STREAM_METRICS_ROWS = 1_000_000
+# Epochs run when a saved CTGAN model is refreshed on new rows
+FINETUNE_EPOCHS = 10
+# Uploads from this size on are trained from a memory-mapped encoded store (see encoded_store)
+ENCODED_STORE_MIN_BYTES = int(os.getenv("ENCODED_STORE_MIN_MB", "256")) * 1024 * 1024
+# A resampling privacy filter gives up after drawing this many times the requested rows
+MAX_RESAMPLE_FACTOR = 10
+# Rows screened per pass when a materialized frame is checked for leaked records
+PRIVACY_CHUNK_ROWS = 100_000
+# CTGAN trains on distinct rows weighted by count when at most this share of the rows is distinct
+ROW_COMPACTION_MAX_RATIO = float(os.getenv("ROW_COMPACTION_MAX_RATIO", "0.5"))
+
 class SyntheticDataPipeline:
     def __init__(
         self,
         input_file: str,
         categorical_columns: List[str],
         output_dir: str = "output",
-        metadata: Dict = None
+        metadata: Dict = None,
+        model_cache: Optional[ModelCache] = None,
+        read_chunksize: Optional[int] = None,
+        engine: str = "ctgan",
+        log_file: Optional[str] = None,
+        metrics_level: str = "basic",
+        cardinality_policy: Optional[CardinalityPolicy] = None,
+        progress_callback: Optional[Callable[[Dict], None]] = None,
+        model_registry: Optional[ModelRegistry] = None,
+        store_cache: Optional[EncodedStoreCache] = None
     ):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {', '.join(ENGINES)}")
+        if metrics_level not in METRIC_LEVELS:
+            raise ValueError(f"Unknown metrics level '{metrics_level}', expected one of {', '.join(METRIC_LEVELS)}")
         self.input_file = input_file
         self.categorical_columns = categorical_columns
         self.output_dir = os.path.abspath(output_dir)
         self.metadata = metadata or {}
+        self.model_cache = model_cache
+        self.model_registry = model_registry
+        self.store_cache = store_cache
+        self.encoded_store = None
+        self.leakage_check = None
+        self.privacy_filter = None
+        self.read_chunksize = read_chunksize
+        self.engine = engine
+        self.metrics_level = metrics_level
+        self.cardinality_policy = cardinality_policy
+        self.cardinality_reducer = None
+        self.progress_callback = progress_callback
         self.logger = None
-        
-        # Ensure output directory exists and is empty
+        self.output_file = None
+        # Files by size of a run with several sample sizes
+        self.output_files = {}
+        self.run_id = uuid.uuid4().hex[:12]
+        # The log sits next to the output directory so it is not packaged with the dataset
+        self.log_file = log_file or os.path.join(os.path.dirname(self.output_dir), PIPELINE_LOG)
+
+        # Each run owns its output directory, so nothing is wiped here; stale workspaces
+        # are garbage-collected by age (see job_manager.collect_stale_workspaces)
         os.makedirs(self.output_dir, exist_ok=True)
-        self._cleanup_output_directory()
         self._setup_logging()
 
-    def _cleanup_output_directory(self):
-        """Remove all files in the output directory except .gitkeep"""
-        # Close logging handlers before cleanup
-        if self.logger:
-            for handler in self.logger.handlers:
-                handler.close()
-            self.logger.handlers.clear()
-
-        for filename in os.listdir(self.output_dir):
-            if filename != '.gitkeep':
-                file_path = os.path.join(self.output_dir, filename)
-                try:
-                    if os.path.isfile(file_path):
-                        os.unlink(file_path)
-                    elif os.path.isdir(file_path):
-                        shutil.rmtree(file_path)
-                except Exception as e:
-                    print(f'Error deleting {file_path}: {e}')
-
     def _setup_logging(self) -> None:
-        """Setup logging with a temporary log file."""
-        self.logger = logging.getLogger("SyntheticDataPipeline")
+        """Give this run its own logger and log file, so concurrent runs never share handlers."""
+        self.logger = logging.getLogger(f"SyntheticDataPipeline.{self.run_id}")
         self.logger.setLevel(logging.INFO)
-        
-        # Clear any existing handlers
-        if self.logger.handlers:
-            for handler in self.logger.handlers:
-                handler.close()
-            self.logger.handlers.clear()
-            
+
         formatter = logging.Formatter(
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         )
-        
-        # Use a temporary directory for the log file
-        temp_dir = tempfile.gettempdir()
-        log_file = os.path.join(temp_dir, "pipeline.log")
-        
-        fh = logging.FileHandler(log_file)
+
+        fh = logging.FileHandler(self.log_file)
         fh.setFormatter(formatter)
         self.logger.addHandler(fh)
 
+    def close_logging(self) -> None:
+        """Close the run's log file and drop its logger from the logging registry."""
+        if self.logger is None:
+            return
+        for handler in self.logger.handlers:
+            handler.close()
+        self.logger.handlers.clear()
+        logging.Logger.manager.loggerDict.pop(self.logger.name, None)
+
+    def report_progress(self, event: str, **fields) -> None:
+        """Pass a progress event to ``progress_callback``; a failing callback never fails the run."""
+        if self.progress_callback is None:
+            return
+        try:
+            self.progress_callback({"event": event, "time": datetime.now().isoformat(timespec="seconds"), **fields})
+        except Exception as e:
+            self.logger.warning(f"Progress callback failed: {str(e)}")
+
+    @instrumented_stage("load_data")
     def load_data(self) -> pd.DataFrame:
+        """Load only the selected columns, dictionary-encoded as ``category``.
+
+        Files larger than ``LARGE_FILE_BYTES`` (or any file when ``read_chunksize`` is set)
+        are parsed in row chunks whose categoricals are unioned, so the raw text is never
+        held in memory all at once.
+        """
         self.logger.info(f"Loading data from {self.input_file}")
         try:
-            data = pd.read_csv(self.input_file)
+            read_kwargs = {"usecols": self.categorical_columns, "dtype": "category"}
+            chunksize = self.read_chunksize
+            if chunksize is None and os.path.getsize(self.input_file) > LARGE_FILE_BYTES:
+                chunksize = DEFAULT_READ_CHUNKSIZE
+
+            if chunksize:
+                chunks = list(pd.read_csv(self.input_file, chunksize=chunksize, **read_kwargs))
+                data = pd.DataFrame({
+                    col: union_categoricals([chunk[col] for chunk in chunks])
+                    for col in self.categorical_columns
+                })
+                self.logger.info(f"Read {len(chunks)} chunks of up to {chunksize} rows")
+            else:
+                data = pd.read_csv(self.input_file, **read_kwargs)
+
+            data = data[self.categorical_columns]
             self.logger.info(f"Loaded {len(data)} rows of data")
             return data
         except Exception as e:
             self.logger.error(f"Error loading data: {str(e)}")
             raise
 
+    @instrumented_stage("encode_data")
+    def encode_data(self) -> EncodedStore:
+        """Encode the selected columns into a memory-mapped store, or reuse the store of an identical upload.
+
+        Training then reads minibatches from the store, so neither the raw frame nor
+        CTGAN's one-hot matrix is ever held in memory. Validation uses a row sample.
+        """
+        cache = self.store_cache or EncodedStoreCache()
+        self.logger.info(f"Encoding {self.input_file} into {cache.root}")
+        store, hit = cache.get_or_build(self.input_file, self.categorical_columns, chunksize=self.read_chunksize or DEFAULT_READ_CHUNKSIZE)
+        self.encoded_store = store
+        self.metadata["encoded_store"] = {"key": store.key, "rows": len(store), "reused": hit}
+        self.logger.info(f"{'Reusing' if hit else 'Built'} encoded store {store.key[:12]} with {len(store)} rows")
+        return store
+
+    def _use_encoded_store(self, use_store: Optional[bool]) -> bool:
+        if use_store is not None:
+            return use_store
+        return self.store_cache is not None and os.path.getsize(self.input_file) >= ENCODED_STORE_MIN_BYTES
+
     def _is_numeric_column(self, data: pd.DataFrame, column: str) -> bool:
         """Check if a column is numeric."""
         try:
@@ -93,51 +187,405 @@ class SyntheticDataPipeline:
         except (ValueError, TypeError):
             return False
 
+    @instrumented_stage("preprocess_data")
     def preprocess_data(self, data: pd.DataFrame) -> pd.DataFrame:
         """Preprocess data by properly handling types and missing values"""
-        processed_data = data.copy()
-        
-        # Only process and return user-selected categorical columns
-        selected_data = processed_data[self.categorical_columns].copy()
-        
-        # Handle categorical columns
+        if isinstance(data, EncodedStore):
+            return self._preprocess_store(data)
+        # Only process and return user-selected categorical columns; each column is
+        # rebuilt individually, so the input frame is never copied as a whole
+        selected_data = {}
         for col in self.categorical_columns:
-            # Convert to string and handle missing values
-            selected_data[col] = selected_data[col].fillna('MISSING')
-            selected_data[col] = selected_data[col].astype(str)
+            column = data[col]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                # Stay dictionary-encoded: only the category labels are touched
+                column = column.cat.rename_categories([str(c) for c in column.cat.categories])
+                if column.isna().any():
+                    if 'MISSING' not in column.cat.categories:
+                        column = column.cat.add_categories('MISSING')
+                    column = column.fillna('MISSING')
+            else:
+                # Convert to string and handle missing values
+                column = column.fillna('MISSING').astype(str)
+            selected_data[col] = column
+        selected_data = pd.DataFrame(selected_data)
+
+        if self.cardinality_policy is not None:
+            # Bound the model width; bucketed values are re-expanded after sampling
+            self.cardinality_reducer = CardinalityReducer(self.cardinality_policy)
+            selected_data = self.cardinality_reducer.fit_transform(selected_data, self.categorical_columns)
+            self.metadata["cardinality"] = {
+                "policy": self.cardinality_policy.to_dict(),
+                "columns": self.cardinality_reducer.summary
+            }
         
         self.logger.info(f"Preprocessed {len(self.categorical_columns)} categorical columns")
         return selected_data
 
-    def generate_synthetic_data(self, data: pd.DataFrame, num_samples: int = 1000, epochs: int = 100, chunk_size: int = 1000) -> pd.DataFrame:
-        """Generate synthetic data using CTGAN"""
+    def _preprocess_store(self, store: EncodedStore) -> EncodedStore:
+        # Labels were cleaned while encoding; only the cardinality policy is left to apply,
+        # and bucketed columns are recoded into a store of this run next to its output
+        if self.cardinality_policy is None:
+            return store
+        self.cardinality_reducer = CardinalityReducer(self.cardinality_policy)
+        store = self.cardinality_reducer.fit_transform_store(store, os.path.join(os.path.dirname(self.output_dir), f"encoded_{self.run_id}"))
+        self.metadata["cardinality"] = {
+            "policy": self.cardinality_policy.to_dict(),
+            "columns": self.cardinality_reducer.summary
+        }
+        self.logger.info(f"Preprocessed {len(self.categorical_columns)} encoded columns")
+        return store
+
+    @instrumented_stage("privacy_index")
+    def start_leakage_check(self, real_data, privacy_filter: Optional[str] = None) -> None:
+        """Index the real rows, so sampled chunks are screened for reproduced records as they are drawn.
+
+        Runs with ``full`` metrics or a ``privacy_filter`` (see ``privacy``): ``drop``
+        removes leaked records from the output, ``resample`` also draws replacements.
+        """
+        if privacy_filter is not None and privacy_filter not in PRIVACY_FILTERS:
+            raise ValueError(f"Unknown privacy filter '{privacy_filter}', expected one of {', '.join(PRIVACY_FILTERS)}")
+        self.privacy_filter = privacy_filter
+        if self.metrics_level != "full" and privacy_filter is None:
+            return
+        if isinstance(real_data, EncodedStore):
+            index = LeakageIndex.from_store(real_data, self.categorical_columns)
+        else:
+            index = LeakageIndex.from_frame(real_data, self.categorical_columns)
+        self.leakage_check = LeakageCheck(index)
+        self.logger.info(f"Indexed {index.num_rows} real rows ({len(index.hashes)} distinct) for the leakage check")
+
+    def _screen(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        if self.leakage_check is None:
+            return chunk
+        return self.leakage_check.screen(chunk, drop=self.privacy_filter is not None)
+
+    def _privacy_metrics(self, real_data, synthetic_data: Optional[pd.DataFrame] = None) -> Dict:
+        """Leakage summary of the rows screened while sampling, or of ``synthetic_data`` when none were."""
+        if self.leakage_check is None:
+            self.start_leakage_check(self.encoded_store if self.encoded_store is not None else real_data)
+        if not self.leakage_check.rows and synthetic_data is not None:
+            for start in range(0, len(synthetic_data), PRIVACY_CHUNK_ROWS):
+                self.leakage_check.screen(synthetic_data.iloc[start:start + PRIVACY_CHUNK_ROWS])
+        return self.leakage_check.summary(self.privacy_filter)
+
+    def _training_params(self, epochs: int, num_rows: int, max_train_seconds: Optional[float] = None) -> Dict:
+        """Hyperparameters of the synthesizer; also part of the model cache key."""
+        if self.engine == "chow_liu":
+            return {"engine": "chow_liu"}
+        # ctgan (and with it torch) is only imported once a CTGAN run needs it
+        from adaptive_ctgan import scaled_batch_size
+        return {
+            "engine": "ctgan",
+            "epochs": epochs,
+            "batch_size": scaled_batch_size(num_rows),
+            "generator_dim": (128, 128),
+            "discriminator_dim": (128, 128),
+            "embedding_dim": 128,
+            "max_train_seconds": max_train_seconds,
+            "patience": 10,
+            "tolerance": 0.02
+        }
+
+    @instrumented_stage("fit")
+    def fit_synthesizer(
+        self,
+        processed_data: pd.DataFrame,
+        epochs: int = 100,
+        max_train_seconds: Optional[float] = None,
+        model_name: Optional[str] = None,
+        finetune_epochs: int = FINETUNE_EPOCHS
+    ):
+        """Fit the selected engine on preprocessed data, reusing a cached model when one exists.
+
+        For CTGAN, ``epochs`` is an upper bound: training stops early once the losses
+        plateau or ``max_train_seconds`` elapses, and how it ended is recorded under
+        ``metadata["training"]``. With ``model_name``, a model saved under that name by an
+        earlier run with the same engine and columns is refreshed on ``processed_data``
+        instead (see ``_refresh_saved_model``), and the result is saved back under it.
+        """
+        params = self._training_params(epochs, len(processed_data), max_train_seconds)
+        if isinstance(processed_data, EncodedStore):
+            one_hot_width = int(sum(len(processed_data.categories[col]) for col in self.categorical_columns))
+        else:
+            one_hot_width = int(sum(processed_data[col].nunique() for col in self.categorical_columns))
+        ONE_HOT_WIDTH.labels(self.engine).observe(one_hot_width)
+        self.metadata["one_hot_width"] = one_hot_width
+
+        saved = self._load_saved_model(model_name)
+        if saved is not None:
+            synthesizer = self._refresh_saved_model(model_name, saved, processed_data, finetune_epochs, max_train_seconds)
+            self.model_registry.save(model_name, synthesizer, self.engine, self.categorical_columns, saved["refreshes"] + 1)
+            return synthesizer
+
+        cache_key = None
+        if self.model_cache is not None:
+            cache_key = ModelCache.make_key(processed_data, self.categorical_columns, params)
+            synthesizer = self.model_cache.get(cache_key)
+            if synthesizer is not None:
+                self.logger.info(f"Reusing cached model {cache_key[:12]}, skipping training")
+                self.metadata["model_cache"] = {"key": cache_key, "hit": True}
+                self._record_training(synthesizer)
+                self.report_progress("fit", status="cached", engine=self.engine)
+                if model_name and self.model_registry is not None:
+                    self.model_registry.save(model_name, synthesizer, self.engine, self.categorical_columns)
+                return synthesizer
+
+        self.report_progress("fit", status="waiting", engine=self.engine)
+
+        # Fits queue for a host-wide slot and run with a capped thread count
+        with get_default_scheduler().slot(label=f"{self.engine}:{self.run_id}") as slot:
+            self.metadata["training_slot"] = slot
+            self.report_progress("fit", status="started", engine=self.engine, waited_seconds=slot["waited_seconds"])
+            if self.engine == "chow_liu":
+                self.logger.info("Fitting Chow-Liu tree model...")
+                synthesizer = ChowLiuSynthesizer().fit(processed_data, discrete_columns=self.categorical_columns)
+            else:
+                from adaptive_ctgan import AdaptiveCTGAN
+
+                # Initialize CTGAN with conservative parameters
+                synthesizer = AdaptiveCTGAN(
+                    epochs=params["epochs"],
+                    batch_size=params["batch_size"],
+                    generator_dim=params["generator_dim"],
+                    discriminator_dim=params["discriminator_dim"],
+                    embedding_dim=params["embedding_dim"],
+                    max_train_seconds=params["max_train_seconds"],
+                    patience=params["patience"],
+                    tolerance=params["tolerance"],
+                    progress_callback=self._on_epoch
+                )
+
+                # Fit the model with all columns as discrete
+                self.logger.info(f"Training CTGAN model (up to {epochs} epochs, batch size {params['batch_size']})...")
+                try:
+                    synthesizer.fit(self.compact_rows(processed_data), discrete_columns=self.categorical_columns)
+                finally:
+                    # The cached model outlives this run and must not keep the pipeline alive
+                    synthesizer.progress_callback = None
+        self._record_training(synthesizer)
+        self.report_progress("fit", status="finished", **self.metadata["training"])
+
+        if cache_key is not None:
+            self.model_cache.put(cache_key, synthesizer)
+            self.metadata["model_cache"] = {"key": cache_key, "hit": False}
+        if model_name and self.model_registry is not None:
+            self.model_registry.save(model_name, synthesizer, self.engine, self.categorical_columns)
+        return synthesizer
+
+    @instrumented_stage("compact_rows")
+    def compact_rows(self, processed_data: pd.DataFrame):
+        """Collapse a CTGAN training frame to its distinct rows with counts when it repeats itself enough.
+
+        Minibatches are then drawn from the distinct rows in proportion to their counts
+        (see ``adaptive_ctgan.WeightedRows``), which is the distribution of the raw rows.
+        Batch size and gradient steps per epoch still follow the raw row count, so the
+        model gets the same updates; only the one-hot matrix and its transform shrink to
+        the distinct rows. Chow-Liu and encoded stores train on what they were given.
+        Only called once a CTGAN fit or fine-tune is actually going to run, so cache hits
+        do not pay for the grouping.
+        """
+        if self.engine != "ctgan" or isinstance(processed_data, EncodedStore) or not len(processed_data):
+            return processed_data
+        from adaptive_ctgan import WeightedRows
+        compacted = WeightedRows.from_frame(processed_data, self.categorical_columns)
+        if len(compacted) > ROW_COMPACTION_MAX_RATIO * len(processed_data):
+            return processed_data
+        self.metadata["row_compaction"] = {"rows": len(processed_data), "distinct_rows": len(compacted)}
+        self.logger.info(f"Training on {len(compacted)} distinct rows weighted by count instead of {len(processed_data)} rows")
+        return compacted
+
+    def _load_saved_model(self, model_name: Optional[str]) -> Optional[Dict]:
+        if not model_name or self.model_registry is None:
+            return None
+        saved = self.model_registry.load(model_name)
+        if saved is None:
+            self.logger.info(f"No saved model '{model_name}' yet, training from scratch")
+        elif saved["engine"] != self.engine or saved["columns"] != list(self.categorical_columns):
+            self.logger.info(
+                f"Saved model '{model_name}' was trained with {saved['engine']} on {saved['columns']}, "
+                "training from scratch"
+            )
+            saved = None
+        return saved
+
+    def _refresh_saved_model(self, model_name: str, saved: Dict, processed_data: pd.DataFrame, finetune_epochs: int, max_train_seconds: Optional[float]):
+        """Update a saved model on new or changed rows instead of training from scratch.
+
+        CTGAN is fine-tuned for ``finetune_epochs`` from its saved weights; Chow-Liu adds
+        the new rows' counts to its tree. Categories the model has not seen are appended
+        to its vocabulary in both cases.
+        """
+        synthesizer = saved["synthesizer"]
+        self.report_progress("fit", status="waiting", engine=self.engine)
+        with get_default_scheduler().slot(label=f"{self.engine}:{self.run_id}") as slot:
+            self.metadata["training_slot"] = slot
+            self.report_progress("fit", status="started", engine=self.engine, waited_seconds=slot["waited_seconds"], warm_start=True)
+            self.logger.info(f"Refreshing saved model '{model_name}' (saved {saved['saved_at']}) on {len(processed_data)} rows")
+            if self.engine == "chow_liu":
+                synthesizer.partial_fit(processed_data, discrete_columns=self.categorical_columns)
+            else:
+                synthesizer.progress_callback = self._on_epoch
+                synthesizer.max_train_seconds = max_train_seconds
+                try:
+                    synthesizer.fine_tune(self.compact_rows(processed_data), epochs=finetune_epochs, discrete_columns=self.categorical_columns)
+                finally:
+                    synthesizer.progress_callback = None
+        self._record_training(synthesizer)
+        self.metadata["warm_start"] = {
+            "model": model_name,
+            "base_saved_at": saved["saved_at"],
+            "refreshes": saved["refreshes"] + 1,
+            "new_categories": {col: len(values) for col, values in synthesizer.new_categories.items()}
+        }
+        self.report_progress("fit", status="finished", **self.metadata["training"])
+        return synthesizer
+
+    def _on_epoch(self, progress: Dict) -> None:
+        # Replaces CTGAN's verbose stdout output, which nobody reads in a pool process
+        self.logger.info(
+            f"Epoch {progress['epoch']}/{progress['max_epochs']}: generator loss {progress['generator_loss']:.4f}, "
+            f"discriminator loss {progress['discriminator_loss']:.4f}, ETA {progress['eta_seconds']:.0f}s"
+        )
+        self.report_progress("epoch", **progress)
+
+    def _record_training(self, synthesizer) -> None:
+        summary = getattr(synthesizer, "training_summary", {})
+        self.metadata["training"] = {"engine": self.engine, **summary}
+        if "epochs_run" in summary:
+            EPOCHS_RUN.labels(self.engine, summary.get("stop_reason", "unknown")).observe(summary["epochs_run"])
+        if summary:
+            self.logger.info(f"Training summary: {summary}")
+
+    def postprocess_synthetic_data(self, synthetic_data: pd.DataFrame) -> pd.DataFrame:
+        """Ensure string type, re-expand bucketed values and restore missing values on sampled rows"""
+        return postprocess_frame(synthetic_data, self.categorical_columns, self.cardinality_reducer)
+
+    def iter_synthetic_data(self, synthesizer, num_samples: int, chunk_size: int = 10000):
+        """Sample and post-process at most ``chunk_size`` rows at a time.
+
+        Sampling time is accumulated across chunks and recorded as the ``sample`` stage
+        once the generator is exhausted; time spent by the consumer is not included.
+        Chunks are screened for leaked records (see ``start_leakage_check``); rows removed
+        by the ``resample`` filter are drawn again.
+        """
+        remaining = num_samples
+        drawn = produced = 0
+        seconds = 0.0
+        while remaining > 0:
+            if drawn >= num_samples * MAX_RESAMPLE_FACTOR:
+                raise ValueError(f"Only {produced} of {num_samples} rows passed the privacy filter after {drawn} draws")
+            n = min(chunk_size, remaining)
+            start = time.perf_counter()
+            chunk = self.postprocess_synthetic_data(synthesizer.sample(n))
+            seconds += time.perf_counter() - start
+            chunk = self._screen(chunk)
+            drawn += n
+            produced += len(chunk)
+            remaining -= len(chunk) if self.privacy_filter == "resample" else n
+            if len(chunk):
+                yield chunk
+            self.report_progress("sample", rows_done=num_samples - remaining, rows_total=num_samples)
+        record_stage(self.metadata, "sample", self.engine, seconds, rows_out=produced)
+
+    def resolve_conditions(self, conditions: List[Dict], processed_data: pd.DataFrame) -> List[Dict]:
+        """Map each condition's values into model space and pick its anchor column.
+
+        ``conditions`` is a list of ``{"column_values": {column: value}, "num_rows": n}``;
+        a ``None`` value asks for missing values. Bucketed values are replaced by their
+        bucket token, and the anchor is the condition value that is rarest in the training
+        data, so CTGAN's conditional vector does the most work.
+        """
+        resolved = []
+        for condition in conditions:
+            model_values, frequencies = {}, {}
+            for col, value in condition["column_values"].items():
+                if col not in self.categorical_columns:
+                    raise ValueError(f"Condition column '{col}' is not one of the selected columns")
+                model_value = 'MISSING' if value is None else str(value)
+                if self.cardinality_reducer is not None:
+                    model_value = self.cardinality_reducer.model_value(col, model_value)
+                if isinstance(processed_data, EncodedStore):
+                    frequencies[col] = processed_data.value_share(col, model_value)
+                else:
+                    frequencies[col] = float((processed_data[col] == model_value).mean())
+                if frequencies[col] == 0:
+                    raise ValueError(f"Value '{value}' never occurs in column '{col}' of the training data")
+                model_values[col] = model_value
+            resolved.append({
+                "column_values": condition["column_values"],
+                "num_rows": int(condition["num_rows"]),
+                "model_values": model_values,
+                "anchor": min(frequencies, key=frequencies.get)
+            })
+        return resolved
+
+    def iter_conditional_data(self, synthesizer, conditions: List[Dict], chunk_size: int = 10000):
+        """Fill each resolved condition's quota directly and yield post-processed chunks.
+
+        Rows are drawn per condition (see ``sampling.iter_matching``), so the cost follows
+        the rows returned instead of the rows a client would otherwise generate and filter.
+        Draw counts and acceptance rates are recorded under ``metadata["conditions"]``.
+        With the ``resample`` privacy filter, a quota short of leaked records is drawn again.
+        """
+        summaries = []
+        self.metadata["conditions"] = summaries
+        total = 0
+        rows_total = sum(condition["num_rows"] for condition in conditions)
+        seconds = 0.0
+        for condition in conditions:
+            stats = {}
+            summaries.append({"column_values": condition["column_values"], "num_rows": condition["num_rows"], "stats": stats})
+            needed, requested = condition["num_rows"], 0
+            while needed > 0:
+                if requested >= condition["num_rows"] * MAX_RESAMPLE_FACTOR:
+                    raise ValueError(
+                        f"Only {condition['num_rows'] - needed} of {condition['num_rows']} rows for "
+                        f"{condition['column_values']} passed the privacy filter"
+                    )
+                matches = iter_matching(
+                    synthesizer, condition["model_values"], needed, condition["anchor"],
+                    chunk_size=chunk_size, stats=stats
+                )
+                requested += needed
+                passed = 0
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        chunk = next(matches)
+                    except StopIteration:
+                        break
+                    chunk = self.postprocess_synthetic_data(chunk)
+                    # Bucketed condition values were redrawn from their bucket; pin them again
+                    for col, value in condition["column_values"].items():
+                        chunk[col] = np.nan if value is None else str(value)
+                    seconds += time.perf_counter() - start
+                    chunk = self._screen(chunk)
+                    passed += len(chunk)
+                    total += len(chunk)
+                    if len(chunk):
+                        yield chunk
+                    self.report_progress("sample", rows_done=total, rows_total=rows_total)
+                needed = needed - passed if self.privacy_filter == "resample" else 0
+            self.logger.info(f"Sampled {condition['num_rows']} rows for {condition['column_values']} ({stats.get('drawn')} drawn)")
+        record_stage(self.metadata, "sample", self.engine, seconds, rows_out=total)
+
+    def generate_synthetic_data(self, data: pd.DataFrame, num_samples: int = 1000, epochs: int = 100, chunk_size: int = 1000, max_train_seconds: Optional[float] = None, **fit_kwargs) -> pd.DataFrame:
+        """Generate synthetic data using the configured engine"""
         self.logger.info("Starting synthetic data generation")
         try:
             # Only process selected categorical columns
             processed_data = self.preprocess_data(data)
-            
-            # Initialize CTGAN with conservative parameters
-            synthesizer = CTGAN(
-                epochs=epochs,
-                batch_size=500,
-                generator_dim=(128, 128),
-                discriminator_dim=(128, 128),
-                embedding_dim=128,
-                verbose=True
-            )
 
-            # Fit the model with all columns as discrete
-            self.logger.info("Training CTGAN model...")
-            synthesizer.fit(processed_data, discrete_columns=self.categorical_columns)
+            synthesizer = self.fit_synthesizer(processed_data, epochs=epochs, max_train_seconds=max_train_seconds, **fit_kwargs)
 
             # Generate synthetic data
             self.logger.info(f"Generating {num_samples} synthetic samples...")
-            synthetic_data = synthesizer.sample(num_samples)
-
-            # Post-process to ensure string type and handle missing values
-            for col in self.categorical_columns:
-                synthetic_data[col] = synthetic_data[col].astype(str)
-                synthetic_data[col] = synthetic_data[col].replace('MISSING', np.nan)
+            chunks = list(self.iter_synthetic_data(synthesizer, num_samples, chunk_size))
+            if chunks:
+                synthetic_data = pd.concat(chunks, ignore_index=True)
+            else:
+                synthetic_data = pd.DataFrame(columns=self.categorical_columns)
 
             self.logger.info(f"Generated {len(synthetic_data)} synthetic samples")
             return synthetic_data
@@ -146,11 +594,21 @@ class SyntheticDataPipeline:
             self.logger.error(f"Error in generate_synthetic_data: {str(e)}")
             raise
 
+    @instrumented_stage("validate_synthetic_data")
     def validate_synthetic_data(self, real_data: pd.DataFrame, synthetic_data: pd.DataFrame) -> Dict:
-        """Validate synthetic data against real data for specified categorical columns."""
-        self.logger.info("Validating synthetic data")
+        """Validate synthetic data against real data for specified categorical columns.
+
+        ``metrics_level`` sets the cost: ``none`` skips validation, ``basic`` reports shapes
+        and unique counts, and ``full`` adds per-column distances and pairwise association
+        similarity (see ``fidelity_metrics``). ``full`` metrics, and runs with a privacy
+        filter, also report the real records reproduced in the output (see ``privacy``).
+        """
+        if self.metrics_level == "none":
+            return self._with_privacy({"metrics_level": "none"})
+        self.logger.info(f"Validating synthetic data ({self.metrics_level} metrics)")
         
         metrics = {
+            "metrics_level": self.metrics_level,
             "real_shape": real_data.shape,
             "synthetic_shape": synthetic_data.shape,
             "column_match": all(col in synthetic_data.columns for col in real_data.columns),
@@ -163,25 +621,198 @@ class SyntheticDataPipeline:
                     "unique_values_real": real_data[col].nunique(),
                     "unique_values_synthetic": synthetic_data[col].nunique()
                 }
+
+        if self.metrics_level == "full":
+            metrics["fidelity"] = compute_fidelity_metrics(real_data, synthetic_data, self.categorical_columns)
+            metrics["privacy"] = self._privacy_metrics(real_data, synthetic_data)
         
+        return self._with_privacy(metrics)
+
+    def _with_privacy(self, metrics: Dict) -> Dict:
+        # Runs below full metrics still report what their privacy filter screened
+        if self.leakage_check is not None and "privacy" not in metrics:
+            metrics["privacy"] = self.leakage_check.summary(self.privacy_filter)
         return metrics
 
-    def save_outputs(self, synthetic_data: pd.DataFrame, validation_metrics: Dict) -> None:
-        """Save synthetic data and metadata."""
+    @instrumented_stage("save_outputs")
+    def save_outputs(self, synthetic_data: pd.DataFrame, validation_metrics: Dict, output_format: str = DEFAULT_OUTPUT_FORMAT) -> None:
+        """Save synthetic data in ``output_format`` and metadata."""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         # Filter only the user-selected categorical columns
-        output_data = synthetic_data[self.categorical_columns].copy()
         self.logger.info(f"Saving {len(self.categorical_columns)} categorical columns: {', '.join(self.categorical_columns)}")
         
-        # Save filtered data
-        output_file = os.path.join(self.output_dir, f"synthetic_data_{timestamp}.csv")
-        output_data.to_csv(output_file, index=False)
-        
+        # Save filtered data; the writer encodes and compresses as it writes
+        output_file = os.path.join(self.output_dir, f"synthetic_data_{timestamp}{output_extension(output_format)}")
+        writer = open_chunk_writer(output_file, self.categorical_columns, output_format)
+        try:
+            writer.write(synthetic_data)
+        finally:
+            writer.close()
+        self.output_file = output_file
+        self.logger.info(f"Saved synthetic data to {output_file}")
+
+        self._save_metadata(len(synthetic_data), validation_metrics, timestamp)
+
+    @instrumented_stage("stream_outputs")
+    def stream_outputs(self, real_data: pd.DataFrame, chunks, output_file: Optional[str] = None, output_format: str = DEFAULT_OUTPUT_FORMAT) -> int:
+        """Write sampled chunks in ``output_format`` as they arrive and save metadata; returns rows written.
+
+        Each chunk is flushed before the next one is sampled, so a reader tailing the file
+        sees rows while generation is still running. Validation stats are accumulated per
+        chunk instead of on a materialized frame; ``full`` metrics are scored on the first
+        ``STREAM_METRICS_ROWS`` rows.
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = output_file or os.path.join(self.output_dir, f"synthetic_data_{timestamp}{output_extension(output_format)}")
+        self.output_file = output_file
+
+        num_rows = 0
+        seen_values = {col: set() for col in self.categorical_columns}
+        metric_chunks = []
+        writer = open_chunk_writer(output_file, self.categorical_columns, output_format)
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+                if self.metrics_level == "full" and num_rows < STREAM_METRICS_ROWS:
+                    metric_chunks.append(chunk[self.categorical_columns].iloc[:STREAM_METRICS_ROWS - num_rows])
+                num_rows += len(chunk)
+                if self.metrics_level != "none":
+                    for col in self.categorical_columns:
+                        seen_values[col].update(chunk[col].dropna().unique())
+        finally:
+            writer.close()
+        self.logger.info(f"Streamed {num_rows} synthetic samples to {output_file}")
+
+        metric_sample = pd.concat(metric_chunks, ignore_index=True) if metric_chunks else None
+        self._save_metadata(num_rows, self._streamed_validation_metrics(real_data, num_rows, seen_values, metric_sample), timestamp)
+        return num_rows
+
+    def _streamed_validation_metrics(self, real_data: pd.DataFrame, num_rows: int, seen_values: Dict, metric_sample: Optional[pd.DataFrame]) -> Dict:
+        """Validation metrics from per-column value sets and a row sample, for runs that never hold all rows."""
+        if self.metrics_level == "none":
+            return self._with_privacy({"metrics_level": "none"})
+
+        validation_metrics = {
+            "metrics_level": self.metrics_level,
+            "real_shape": real_data.shape,
+            "synthetic_shape": (num_rows, len(self.categorical_columns)),
+            "column_match": all(col in self.categorical_columns for col in real_data.columns),
+            "basic_stats": {
+                col: {
+                    "unique_values_real": real_data[col].nunique(),
+                    "unique_values_synthetic": len(seen_values[col])
+                }
+                for col in self.categorical_columns if col in real_data.columns
+            }
+        }
+        if self.encoded_store is not None:
+            # real_data is a row sample of the store; shapes and counts come from the whole store
+            validation_metrics["real_shape"] = self.encoded_store.shape
+            for col, stats in validation_metrics["basic_stats"].items():
+                stats["unique_values_real"] = self.encoded_store.unique_count(col)
+        if self.metrics_level == "full" and metric_sample is not None:
+            validation_metrics["fidelity"] = compute_fidelity_metrics(real_data, metric_sample, self.categorical_columns)
+            validation_metrics["fidelity"]["synthetic_rows_used"] = len(metric_sample)
+            if self.encoded_store is not None:
+                validation_metrics["fidelity"]["real_rows_used"] = len(real_data)
+            # Parallel shards are not screened as they are written; their metric sample is
+            validation_metrics["privacy"] = self._privacy_metrics(real_data, metric_sample)
+        return self._with_privacy(validation_metrics)
+
+    def sample_parallel(
+        self,
+        real_data: pd.DataFrame,
+        synthesizer,
+        num_samples: int,
+        workers: int,
+        chunk_size: int = 10000,
+        output_file: Optional[str] = None,
+        output_format: str = DEFAULT_OUTPUT_FORMAT,
+        merge_parts: bool = True,
+        seed: Optional[int] = None
+    ) -> int:
+        """Sample on ``workers`` processes and write the output and metadata; returns rows written.
+
+        Every shard is independently seeded from ``seed``, recorded under
+        ``metadata["parallel_sampling"]`` so a run can be reproduced. With
+        ``merge_parts=False``, ``output_file`` is a directory of part files.
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = output_file or os.path.join(
+            self.output_dir, f"synthetic_data_{timestamp}" + (output_extension(output_format) if merge_parts else "_parts")
+        )
+        self.output_file = output_file
+
+        start = time.perf_counter()
+        result = ParallelSampler(workers).sample_to_file(
+            synthesizer, self.categorical_columns, num_samples, output_file, self.output_dir,
+            chunk_size=chunk_size,
+            output_format=output_format,
+            reducer=self.cardinality_reducer,
+            merge=merge_parts,
+            seed=seed,
+            track_values=self.metrics_level != "none",
+            metric_rows=STREAM_METRICS_ROWS if self.metrics_level == "full" else 0,
+            on_shard=lambda rows_done: self.report_progress("sample", rows_done=rows_done, rows_total=num_samples)
+        )
+        seconds = time.perf_counter() - start
+        record_stage(self.metadata, "sample", self.engine, seconds, rows_out=result["rows"])
+        self.metadata["parallel_sampling"] = {
+            "workers": result["workers"],
+            "shards": result["shards"],
+            "seed": result["seed"],
+            "merged": merge_parts,
+            "seconds": round(seconds, 3),
+            "shard_seconds": result["shard_seconds"]
+        }
+        self.logger.info(
+            f"Sampled {result['rows']} rows to {output_file} on {result['workers']} processes in {seconds:.1f}s "
+            f"({result['shard_seconds']:.1f}s of shard work)"
+        )
+
+        validation_metrics = self._streamed_validation_metrics(real_data, result["rows"], result["seen_values"], result["metric_sample"])
+        self._save_metadata(result["rows"], validation_metrics, timestamp)
+        return result["rows"]
+
+    def sample_batch(
+        self,
+        real_data: pd.DataFrame,
+        synthesizer,
+        sample_sizes: List[int],
+        workers: int = 1,
+        chunk_size: int = 10000,
+        output_format: str = DEFAULT_OUTPUT_FORMAT,
+        seed: Optional[int] = None
+    ) -> Dict[int, str]:
+        """Write one output per size from a single fitted synthesizer; returns the files by size.
+
+        Each size gets its own ``<n>_rows`` directory under the output directory, with its
+        rows and metadata, sampled in parallel or streamed like a single run would be.
+        """
+        base_dir = self.output_dir
+        self.output_files = {}
+        try:
+            for num_samples in sorted(set(sample_sizes)):
+                self.output_dir = os.path.join(base_dir, f"{num_samples}_rows")
+                os.makedirs(self.output_dir, exist_ok=True)
+                output_file = os.path.join(self.output_dir, "synthetic_data" + output_extension(output_format))
+                if workers > 1 and num_samples >= PARALLEL_MIN_ROWS and self.privacy_filter is None:
+                    self.sample_parallel(real_data, synthesizer, num_samples, workers, chunk_size=chunk_size, output_file=output_file, output_format=output_format, seed=seed)
+                else:
+                    chunks = self.iter_synthetic_data(synthesizer, num_samples, chunk_size)
+                    self.stream_outputs(real_data, chunks, output_file=output_file, output_format=output_format)
+                self.output_files[num_samples] = output_file
+        finally:
+            self.output_dir = base_dir
+        self.logger.info(f"Wrote {len(self.output_files)} outputs of {', '.join(map(str, self.output_files))} rows from one model")
+        return self.output_files
+
+    def _save_metadata(self, num_rows: int, validation_metrics: Dict, timestamp: str) -> None:
         metadata = {
             "generation_timestamp": timestamp,
             "original_file": self.input_file,
-            "num_samples": len(output_data),
+            "num_samples": num_rows,
             "categorical_columns": self.categorical_columns,
             "validation_metrics": validation_metrics,
             **self.metadata
@@ -191,41 +822,141 @@ class SyntheticDataPipeline:
         with open(metadata_file, 'w') as f:
             json.dump(metadata, f, indent=2)
         
-        self.logger.info(f"Saved synthetic data to {output_file}")
         self.logger.info(f"Saved metadata to {metadata_file}")
 
-    def create_metadata_file(self, synthetic_data: pd.DataFrame, timestamp: str) -> None:
-        """Create a metadata.json file with dataset details."""
+    def create_metadata_file(self, synthetic_data: Optional[pd.DataFrame], timestamp: str, num_rows: Optional[int] = None) -> None:
+        """Write a ``dataset_info`` JSON describing the dataset.
+
+        Kept apart from the run's metadata JSON (see ``_save_metadata``), which holds the
+        validation metrics and everything recorded under ``metadata``.
+        """
+        if num_rows is None:
+            num_rows = len(synthetic_data)
         metadata = {
             "name": "Synthetic Healthcare Dataset",
             "description": "A privacy-preserving synthetic dataset for healthcare analysis.",
             "columns": [
                 {"name": col, "type": "categorical"} for col in self.categorical_columns
             ],
-            "size": f"{len(synthetic_data)} rows"
+            "size": f"{num_rows} rows"
         }
-        metadata_file = os.path.join(self.output_dir, f"metadata_{timestamp}.json")
-        with open(metadata_file, 'w') as f:
+        info_file = os.path.join(self.output_dir, f"dataset_info_{timestamp}.json")
+        with open(info_file, 'w') as f:
             json.dump(metadata, f, indent=2)
-        self.logger.info(f"Saved metadata to {metadata_file}")
+        self.logger.info(f"Saved dataset info to {info_file}")
 
+    @instrumented_stage("compress_files")
     def compress_files(self, timestamp: str) -> None:
         """Compress the dataset and documentation into a zip file."""
         zip_filename = os.path.join(self.output_dir, f"dataset_package_{timestamp}.zip")
-        shutil.make_archive(zip_filename.replace('.zip', ''), 'zip', self.output_dir)
+        # Build the archive outside the directory being archived, or it would include itself
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_zip = shutil.make_archive(os.path.join(temp_dir, "package"), 'zip', self.output_dir)
+            shutil.move(temp_zip, zip_filename)
         self.logger.info(f"Compressed files into {zip_filename}")
 
-    def run_pipeline(self, num_samples: int = 1000, chunk_size: int = 10000, epochs: int = 100, **kwargs) -> None:
-        """Run the synthetic data generation pipeline."""
+    def run_pipeline(
+        self,
+        num_samples: int = 1000,
+        chunk_size: int = 10000,
+        epochs: int = 100,
+        stream: bool = False,
+        output_file: Optional[str] = None,
+        max_train_seconds: Optional[float] = None,
+        output_format: str = DEFAULT_OUTPUT_FORMAT,
+        package: bool = False,
+        sample_workers: Optional[int] = None,
+        merge_parts: bool = True,
+        seed: Optional[int] = None,
+        conditions: Optional[List[Dict]] = None,
+        model_name: Optional[str] = None,
+        finetune_epochs: int = FINETUNE_EPOCHS,
+        use_store: Optional[bool] = None,
+        privacy_filter: Optional[str] = None,
+        sample_sizes: Optional[List[int]] = None,
+        **kwargs
+    ) -> None:
+        """Run the synthetic data generation pipeline.
+
+        With ``stream=True`` rows are sampled ``chunk_size`` at a time and written straight
+        to ``output_file`` (or a timestamped file), so memory stays flat for any ``num_samples``.
+        With ``sample_workers`` (default ``SAMPLE_WORKERS``) above one and at least
+        ``PARALLEL_MIN_ROWS`` rows, sampling and encoding run on that many processes and
+        the shards are written to ``output_file`` in order, streamed or not.
+        ``conditions`` (see ``resolve_conditions``) replaces ``num_samples`` with one
+        quota per condition; those rows are always written chunk by chunk.
+        ``model_name`` refreshes and saves a named model (see ``fit_synthesizer``).
+        With ``use_store`` (default: with a ``store_cache``, for uploads of at least
+        ``ENCODED_STORE_MIN_BYTES``) training reads from an encoded store (see
+        ``encode_data``) and rows are written chunk by chunk.
+        ``privacy_filter`` (``drop`` or ``resample``) removes sampled rows that reproduce a
+        rare real record (see ``start_leakage_check``); such runs sample in this process.
+        ``sample_sizes`` replaces ``num_samples`` with several outputs drawn from one fitted
+        model (see ``sample_batch``).
+        ``output_format`` is one of ``output_writers.OUTPUT_FORMATS``; compression happens
+        while writing, so the zip package is only built when ``package=True``.
+        """
         try:
-            real_data = self.load_data()
-            synthetic_data = self.generate_synthetic_data(real_data, num_samples=num_samples, epochs=epochs, chunk_size=chunk_size, **kwargs)
-            validation_metrics = self.validate_synthetic_data(real_data, synthetic_data)
-            self.save_outputs(synthetic_data, validation_metrics)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            self.create_metadata_file(synthetic_data, timestamp)
-            self.compress_files(timestamp)
+            if self._use_encoded_store(use_store):
+                training_data = self.encode_data()
+                # The real rows are only needed for validation, which scores a sample
+                real_data = training_data.sample_frame(STREAM_METRICS_ROWS)
+                stream = True
+            else:
+                training_data = real_data = self.load_data()
+            self.start_leakage_check(training_data, privacy_filter)
+            fit_kwargs = {
+                "epochs": epochs,
+                "max_train_seconds": max_train_seconds,
+                "model_name": model_name,
+                "finetune_epochs": finetune_epochs
+            }
+            sample_workers = sample_workers or SAMPLE_WORKERS
+            if conditions:
+                processed_data = self.preprocess_data(training_data)
+                resolved = self.resolve_conditions(conditions, processed_data)
+                synthesizer = self.fit_synthesizer(processed_data, **fit_kwargs)
+                del processed_data
+                chunks = self.iter_conditional_data(synthesizer, resolved, chunk_size)
+                num_rows = self.stream_outputs(real_data, chunks, output_file=output_file, output_format=output_format)
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                self.create_metadata_file(None, timestamp, num_rows=num_rows)
+            elif sample_sizes:
+                synthesizer = self.fit_synthesizer(self.preprocess_data(training_data), **fit_kwargs)
+                self.sample_batch(real_data, synthesizer, sample_sizes, sample_workers, chunk_size=chunk_size, output_format=output_format, seed=seed)
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            elif sample_workers > 1 and num_samples >= PARALLEL_MIN_ROWS and privacy_filter is None:
+                synthesizer = self.fit_synthesizer(self.preprocess_data(training_data), **fit_kwargs)
+                num_rows = self.sample_parallel(
+                    real_data, synthesizer, num_samples, sample_workers,
+                    chunk_size=chunk_size,
+                    output_file=output_file,
+                    output_format=output_format,
+                    merge_parts=merge_parts,
+                    seed=seed
+                )
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                self.create_metadata_file(None, timestamp, num_rows=num_rows)
+            elif stream:
+                synthesizer = self.fit_synthesizer(self.preprocess_data(training_data), **fit_kwargs)
+                chunks = self.iter_synthetic_data(synthesizer, num_samples, chunk_size)
+                num_rows = self.stream_outputs(real_data, chunks, output_file=output_file, output_format=output_format)
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                self.create_metadata_file(None, timestamp, num_rows=num_rows)
+            else:
+                synthetic_data = self.generate_synthetic_data(real_data, num_samples=num_samples, chunk_size=chunk_size, **fit_kwargs, **kwargs)
+                validation_metrics = self.validate_synthetic_data(real_data, synthetic_data)
+                self.save_outputs(synthetic_data, validation_metrics, output_format=output_format)
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                self.create_metadata_file(synthetic_data, timestamp)
+            if package:
+                self.compress_files(timestamp)
             self.logger.info("Pipeline completed successfully")
         except Exception as e:
             self.logger.error(f"Pipeline failed: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+        finally:
+            shutil.rmtree(os.path.join(os.path.dirname(self.output_dir), f"encoded_{self.run_id}"), ignore_errors=True)
+            if self.encoded_store is not None:
+                # Lets the store cache evict it again
+                self.encoded_store.close()
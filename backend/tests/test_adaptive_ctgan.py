@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+from ctgan.data_sampler import DataSampler
+from ctgan.data_transformer import DataTransformer
+
+from adaptive_ctgan import AdaptiveCTGAN, WeightedDataSampler, WeightedRows, _widen_linear
+
+
+def _small_model() -> AdaptiveCTGAN:
+    return AdaptiveCTGAN(
+        epochs=1, batch_size=100, embedding_dim=8, generator_dim=(16,), discriminator_dim=(16,), cuda=False
+    )
+
+
+def _frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"colour": rng.choice(["red", "green", "blue"], rows), "size": rng.choice(["s", "m"], rows)})
+
+
+def _condvec_slots(model: AdaptiveCTGAN) -> list:
+    """Category behind each slot ``sample_original_condvec`` can draw, in draw order."""
+    dummies = [
+        (info.column_name, value)
+        for info in model._transformer._column_transform_info_list
+        for value in info.transform.dummies
+    ]
+    probs = model._data_sampler._discrete_column_category_prob
+    drawable = []
+    for index, info in enumerate(model._transformer._column_transform_info_list):
+        drawable.extend(probs[index, :info.output_dimensions] > 0)
+    return [dummy for dummy, keep in zip(dummies, drawable) if keep]
+
+
+def test_fine_tune_keeps_categories_missing_from_the_refresh():
+    model = _small_model()
+    data = _frame(300)
+    model.fit(data, discrete_columns=["colour", "size"])
+    slots = _condvec_slots(model)
+
+    model.fine_tune(data[data["colour"] != "green"], epochs=1, discrete_columns=["colour", "size"])
+
+    assert _condvec_slots(model) == slots
+    probs = model._data_sampler._discrete_column_category_prob
+    assert not np.isnan(probs).any()
+    assert np.allclose(probs.sum(axis=1), 1.0)
+
+
+def test_fine_tune_appends_new_categories_after_known_ones():
+    model = _small_model()
+    data = _frame(300)
+    model.fit(data, discrete_columns=["colour", "size"])
+    slots = _condvec_slots(model)
+
+    refresh = data[data["colour"] != "green"].copy()
+    refresh.loc[refresh.index[:50], "size"] = "l"
+    model.fine_tune(refresh, epochs=1, discrete_columns=["colour", "size"])
+
+    assert model.new_categories == {"size": ["l"]}
+    assert _condvec_slots(model) == slots + [("size", "l")]
+    assert set(model.sample(200)["size"]) <= {"s", "m", "l"}
+
+
+def test_weighted_rows_count_each_distinct_row():
+    data = pd.DataFrame({"a": ["x", "x", "y", "x", None], "b": ["p", "p", "q", "q", "p"]})
+    rows = WeightedRows.from_frame(data, ["a", "b"])
+
+    counts = {tuple(row): count for row, count in zip(rows.frame.itertuples(index=False), rows.counts)}
+    assert len(rows) == 4 and rows.num_rows == 5
+    assert counts[("x", "p")] == 2 and counts[("x", "q")] == 1 and counts[("y", "q")] == 1
+
+
+@pytest.mark.parametrize("log_frequency", [False, True])
+def test_weighted_sampler_matches_the_raw_sampler(log_frequency):
+    data = _frame(500)
+    transformer = DataTransformer()
+    transformer.fit(data, ["colour", "size"])
+    raw = DataSampler(transformer.transform(data), transformer.output_info_list, log_frequency)
+    rows = WeightedRows.from_frame(data, ["colour", "size"])
+    weighted = WeightedDataSampler(transformer.transform(rows.frame), transformer.output_info_list, log_frequency, rows.counts)
+
+    assert weighted._discrete_column_category_prob == pytest.approx(raw._discrete_column_category_prob)
+
+
+def test_weighted_sampler_draws_rows_by_count_within_the_condition():
+    frame = pd.DataFrame({"a": ["x", "x", "y"], "b": ["p", "q", "q"]})
+    counts = np.array([90, 10, 50])
+    transformer = DataTransformer()
+    transformer.fit(frame, ["a", "b"])
+    matrix = transformer.transform(frame)
+    sampler = WeightedDataSampler(matrix, transformer.output_info_list, False, counts)
+
+    np.random.seed(0)
+    x = list(transformer._column_transform_info_list[0].transform.dummies).index("x")
+    drawn = sampler.sample_data(matrix, 2000, np.zeros(2000, dtype=int), np.full(2000, x))
+    b_is_p = drawn[:, 2 + list(transformer._column_transform_info_list[1].transform.dummies).index("p")]
+    # Among rows with a == x, (x, p) carries 90 of the 100 counts
+    assert b_is_p.mean() == pytest.approx(0.9, abs=0.03)
+
+
+def test_widened_linear_keeps_old_outputs():
+    torch.manual_seed(0)
+    layer = torch.nn.Linear(3, 2)
+    # Old inputs 0, 1, 2 move to 0, 2, 3; old outputs 0, 1 move to 1, 2
+    wider = _widen_linear(layer, [0, 2, 3], 4, [1, 2], 3)
+    x = torch.randn(5, 3)
+    x_wide = torch.zeros(5, 4)
+    x_wide[:, [0, 2, 3]] = x
+    x_wide[:, 1] = torch.randn(5)
+
+    with torch.no_grad():
+        assert torch.allclose(wider(x_wide)[:, [1, 2]], layer(x))
+        assert torch.allclose(wider(x_wide)[:, 0], layer.bias.min().expand(5))
@@ -0,0 +1,60 @@
+import threading
+import time
+
+import admission
+from admission import MemoryBudget
+
+
+def _estimate(peak_bytes: int) -> dict:
+    return {"peak_bytes": peak_bytes, "peak_mb": 0, "estimated_seconds": 1.0}
+
+
+def _hold(budget: MemoryBudget, job_id: str, peak_bytes: int, order: list, release: threading.Event):
+    def run():
+        with budget.reserve(job_id, peak_bytes):
+            order.append(job_id)
+            release.wait(5)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_reservations_are_granted_in_admission_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(admission, "RESERVE_POLL_SECONDS", 0.01)
+    budget = MemoryBudget(state_dir=str(tmp_path), budget_bytes=100, max_queued=8)
+    order = []
+    done = {job_id: threading.Event() for job_id in ("running", "large", "small")}
+    for job_id, size in (("running", 60), ("large", 80), ("small", 30)):
+        budget.admit(job_id, _estimate(size))
+
+    threads = [_hold(budget, "running", 60, order, done["running"])]
+    _wait_for(lambda: order == ["running"])
+    threads.append(_hold(budget, "large", 80, order, done["large"]))
+    _wait_for(lambda: budget._entries("pending")[0].get("waiting"))
+    threads.append(_hold(budget, "small", 30, order, done["small"]))
+
+    # The small job would fit next to the running one, but the large one was admitted first
+    time.sleep(0.2)
+    assert order == ["running"]
+    done["running"].set()
+    _wait_for(lambda: order == ["running", "large"])
+    time.sleep(0.2)
+    assert order == ["running", "large"]
+    done["large"].set()
+    _wait_for(lambda: order == ["running", "large", "small"])
+    done["small"].set()
+    for thread in threads:
+        thread.join(5)
+
+
+def test_admit_queues_beyond_the_budget(tmp_path):
+    budget = MemoryBudget(state_dir=str(tmp_path), budget_bytes=100, max_queued=8)
+    assert budget.admit("first", _estimate(70)) == "admitted"
+    assert budget.admit("second", _estimate(70)) == "queued"
@@ -0,0 +1,94 @@
+import asyncio
+import importlib
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    # The app creates its upload, output and job folders in the working directory
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(tmp_path_factory.mktemp("api"))
+        app = importlib.import_module("app")
+        yield TestClient(app.app)
+
+
+@pytest.fixture
+def budget(client, tmp_path, monkeypatch):
+    import app
+    from admission import MemoryBudget
+
+    budget = MemoryBudget(state_dir=str(tmp_path / "admission"), budget_bytes=1 << 40, max_queued=8)
+    monkeypatch.setattr(app, "get_default_budget", lambda: budget)
+    return budget
+
+
+CSV = ("data.csv", b"a,b\nx,p\ny,q\n", "text/csv")
+
+
+@pytest.mark.parametrize("path", ["/generate", "/jobs"])
+def test_single_dataset_endpoints_share_validation(client, path):
+    response = client.post(path, files={"file": CSV}, data={"categorical_columns": "a,b", "engine": "gan"})
+    assert response.status_code == 400
+    assert response.json() == {"error": "Unknown engine 'gan', expected one of ctgan, chow_liu"}
+
+    response = client.post(path, files={"file": CSV}, data={"categorical_columns": " , "})
+    assert response.json() == {"error": "No valid categorical columns provided"}
+
+    response = client.post(path, files={"file": CSV}, data={"categorical_columns": "a", "conditions": '{"c": "x"}'})
+    assert response.status_code == 400
+    assert "not among the categorical columns" in response.json()["error"]
+
+
+def test_batches_validate_shared_options(client):
+    response = client.post(
+        "/batches",
+        files={"files": CSV},
+        data={"plan": '[{"categorical_columns": ["a"]}]', "metrics_level": "most"}
+    )
+    assert response.status_code == 400
+    assert response.json()["error"].startswith("Unknown metrics level 'most'")
+
+
+def test_output_format_is_negotiated_before_validation(client):
+    response = client.post(
+        "/jobs",
+        files={"file": CSV},
+        data={"categorical_columns": "a", "privacy_filter": "blur"},
+        headers={"Accept": "application/vnd.apache.parquet"}
+    )
+    assert response.status_code == 400
+    assert response.json()["error"].startswith("Unknown privacy filter 'blur'")
+
+
+def test_job_events_replay_progress_and_end_with_the_status(client):
+    from app import job_manager
+    from job_manager import ProgressLog, _write_status
+
+    job_id = job_manager.create_job()
+    job_dir = job_manager.job_dir(job_id)
+    ProgressLog(job_dir).append({"event": "fit", "status": "started"})
+    _write_status(job_dir, {"job_id": job_id, "status": "completed"})
+
+    body = client.get(f"/jobs/{job_id}/events").text
+    events = [line.split(": ", 1)[1] for line in body.splitlines() if line.startswith("event: ")]
+    assert events == ["status", "fit", "end"]
+
+
+def test_failed_submit_releases_the_reservation(client, budget, monkeypatch):
+    import app
+
+    def submit(*args, **kwargs):
+        raise RuntimeError("pool is broken")
+
+    monkeypatch.setattr(app.job_manager, "submit", submit)
+    job_id = app.job_manager.create_job()
+    with open(app.job_manager.input_path(job_id), "wb") as f:
+        f.write(CSV[1])
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(app.queue_job(job_id, ["a", "b"], 10, engine="chow_liu"))
+    assert budget.state()["queued"] == []
+    assert not os.path.exists(app.job_manager.job_dir(job_id))
@@ -0,0 +1,47 @@
+import os
+import time
+
+from batch_jobs import BatchStore
+
+
+def _age(path: str, seconds: float) -> None:
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def _batch(store: BatchStore, job_ids) -> str:
+    batch_id = store.create()
+    datasets = [{"file": 0, "categorical_columns": ["a"], "sample_sizes": [10], "job_id": job_id} for job_id in job_ids]
+    store.save(batch_id, ["data.csv"], datasets, {})
+    _age(os.path.join(store.batch_dir(batch_id), "batch.json"), 7200)
+    _age(store.batch_dir(batch_id), 7200)
+    return batch_id
+
+
+def test_collect_garbage_keeps_batches_with_running_jobs(tmp_path):
+    store = BatchStore(str(tmp_path))
+    jobs = {"a1": {"status": "completed", "finished_at": "2000-01-01T00:00:00"}, "b2": {"status": "running"}}
+    batch_id = _batch(store, ["a1", "b2"])
+
+    assert store.collect_garbage(jobs.get, ttl_seconds=3600) == 0
+    assert store.load(batch_id) is not None
+
+
+def test_collect_garbage_counts_age_from_the_last_finished_job(tmp_path):
+    store = BatchStore(str(tmp_path))
+    recent = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(time.time() - 60))
+    jobs = {"a1": {"status": "completed", "finished_at": recent}, "b2": {"status": "failed", "finished_at": "2000-01-01T00:00:00"}}
+    fresh = _batch(store, ["a1", "b2"])
+    stale = _batch(store, ["b2"])
+
+    assert store.collect_garbage(jobs.get, ttl_seconds=3600) == 1
+    assert store.load(fresh) is not None
+    assert store.load(stale) is None
+
+
+def test_collect_garbage_treats_collected_jobs_as_finished(tmp_path):
+    store = BatchStore(str(tmp_path))
+    batch_id = _batch(store, ["gone"])
+
+    assert store.collect_garbage(lambda job_id: None, ttl_seconds=3600) == 1
+    assert not os.path.exists(store.batch_dir(batch_id))
@@ -0,0 +1,62 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from chow_liu import ChowLiuSynthesizer
+
+
+def _frame(counts):
+    """Frame with ``count`` copies of each row tuple."""
+    rows = [row for row, count in counts.items() for _ in range(count)]
+    return pd.DataFrame(rows, columns=[f"c{i}" for i in range(len(rows[0]))])
+
+
+def _probabilities(cumulative: np.ndarray) -> np.ndarray:
+    return np.diff(cumulative, axis=1, prepend=0.0)
+
+
+def test_conditioning_a_child_reweights_the_root():
+    # P(c0 = x | c1 = q) = 10 / (10 + 50)
+    model = ChowLiuSynthesizer().fit(_frame({("x", "p"): 30, ("x", "q"): 10, ("y", "p"): 10, ("y", "q"): 50}))
+    root = _probabilities(model._conditioned_tables({"c1": "q"})[0])[0]
+    assert dict(zip(model.categories[0], root)) == pytest.approx({"x": 1 / 6, "y": 5 / 6})
+
+
+def test_conditioning_matches_the_joint_distribution_of_the_tree():
+    rng = np.random.default_rng(0)
+    a = rng.choice(["a0", "a1", "a2"], 2000)
+    b = np.where(rng.random(2000) < 0.8, np.char.replace(a, "a", "b"), "b9")
+    c = np.where(rng.random(2000) < 0.7, np.char.replace(b, "b", "c"), "c0")
+    model = ChowLiuSynthesizer().fit(pd.DataFrame({"a": a, "b": b, "c": c}))
+    assert model.parents == [-1, 0, 1]
+
+    # Brute force: P(a, b | c = c1) from the product of the fitted tables
+    tables = [_probabilities(t) for t in model.cumulative_tables]
+    target = list(model.categories[2]).index("c1")
+    joint = np.zeros((len(model.categories[0]), len(model.categories[1])))
+    for i, j in itertools.product(range(joint.shape[0]), range(joint.shape[1])):
+        joint[i, j] = tables[0][0, i] * tables[1][i, j] * tables[2][j, target]
+    joint /= joint.sum()
+
+    conditioned = [_probabilities(t) for t in model._conditioned_tables({"c": "c1"})]
+    assert conditioned[0][0] == pytest.approx(joint.sum(axis=1))
+    for i in range(joint.shape[0]):
+        if joint[i].sum() > 0:
+            assert conditioned[1][i] == pytest.approx(joint[i] / joint[i].sum())
+
+
+def test_conditioned_samples_hold_the_fixed_values():
+    model = ChowLiuSynthesizer(random_state=0).fit(_frame({("x", "p"): 30, ("x", "q"): 10, ("y", "p"): 10, ("y", "q"): 50}))
+    rows = model.sample_conditioned(600, {"c1": "q"})
+    assert set(rows["c1"]) == {"q"}
+    assert (rows["c0"] == "x").mean() == pytest.approx(1 / 6, abs=0.05)
+
+
+def test_impossible_conditions_are_rejected():
+    model = ChowLiuSynthesizer().fit(_frame({("x", "p"): 5, ("y", "q"): 5}))
+    with pytest.raises(ValueError):
+        model._conditioned_tables({"c1": "r"})
+    with pytest.raises(ValueError):
+        model._conditioned_tables({"c0": "x", "c1": "q"})
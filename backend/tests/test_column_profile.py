@@ -0,0 +1,47 @@
+import io
+
+import pytest
+
+from admission import extrapolate_distinct
+from column_profile import HyperLogLog, profile_csv
+
+
+def test_chao1_adds_unseen_values_from_singletons():
+    # 10 seen, 4 once and 1 twice: 10 + 4 * 3 / (2 * (1 + 1)) = 13
+    assert extrapolate_distinct(10, 100, 1000, False, [4, 1]) == 13
+
+
+def test_chao1_keeps_saturated_columns_as_sampled():
+    assert extrapolate_distinct(10, 100, 1000, False, [0, 0]) == 10
+
+
+def test_extrapolation_is_capped_and_exact_counts_are_kept():
+    assert extrapolate_distinct(50, 100, 120, False, [50, 0]) == 120
+    assert extrapolate_distinct(10, 100, 100, True, [4, 1]) == 10
+
+
+def test_extrapolation_without_singletons_grows_like_sqrt_rows():
+    assert extrapolate_distinct(10, 100, 400, False) == 20
+
+
+@pytest.mark.parametrize("distinct", [100, 50_000])
+def test_hyperloglog_count(distinct):
+    sketch = HyperLogLog()
+    for i in range(distinct):
+        sketch.add(f"value-{i}")
+        sketch.add(f"value-{i}")
+    # About 1.6% standard error at precision 12; linear counting is tighter for small counts
+    assert sketch.count() == pytest.approx(distinct, rel=0.05)
+
+
+def test_profile_of_an_exact_sample():
+    data = "id,colour,flag\n" + "".join(f"{i},{'red' if i % 3 else ''},{'yes' if i % 2 else 'no'}\n" for i in range(300))
+    profile = profile_csv(io.BytesIO(data.encode()))
+    columns = {column["name"]: column for column in profile["columns"]}
+
+    assert profile["rows"] == 300 and profile["rows_exact"]
+    assert columns["id"]["inferred_type"] == "integer" and columns["id"]["id_like"]
+    assert columns["colour"]["null_fraction"] == pytest.approx(100 / 300, abs=1e-4)
+    assert columns["colour"]["approx_cardinality"] == 1
+    assert columns["flag"]["inferred_type"] == "boolean"
+    assert profile["suggested_columns"] == ["colour", "flag"]
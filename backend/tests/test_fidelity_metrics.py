@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fidelity_metrics import column_metrics, compute_fidelity_metrics, cramers_v_matrix
+
+
+def _codes(table):
+    """Row codes of two columns whose contingency table is ``table``."""
+    pairs = [(i, j) for i, row in enumerate(table) for j, count in enumerate(row) for _ in range(count)]
+    return np.array(pairs, dtype=np.int64)
+
+
+def test_cramers_v_of_a_known_2x2_table():
+    # chi2 = 80 * (30 * 30 - 10 * 10) ** 2 / 40 ** 4 = 20, so V = sqrt(20 / 80) = 0.5
+    v = cramers_v_matrix(_codes([[30, 10], [10, 30]]), [2, 2])
+    assert v == pytest.approx(np.array([[1.0, 0.5], [0.5, 1.0]]))
+
+
+def test_cramers_v_of_independent_and_identical_columns():
+    assert cramers_v_matrix(_codes([[10, 10], [10, 10]]), [2, 2])[0, 1] == pytest.approx(0.0)
+    assert cramers_v_matrix(_codes([[5, 0, 0], [0, 7, 0], [0, 0, 9]]), [3, 3])[0, 1] == pytest.approx(1.0)
+
+
+def test_cramers_v_ignores_categories_absent_from_the_sample():
+    codes = _codes([[30, 10], [10, 30]])
+    # Vocabulary sizes shared with another frame may include unused categories
+    assert cramers_v_matrix(codes, [4, 3])[0, 1] == pytest.approx(0.5)
+
+
+def test_column_metrics_of_hand_counted_columns():
+    metrics = column_metrics(np.array([50, 30, 20, 0]), np.array([40, 40, 0, 20]))
+    # TVD = 0.5 * (0.1 + 0.1 + 0.2 + 0.2)
+    assert metrics["total_variation_distance"] == pytest.approx(0.3)
+    assert metrics["category_coverage"] == pytest.approx(2 / 3)
+    assert metrics["novel_categories"] == 1
+    # Against expected (50, 30, 20): 10**2/50 + 10**2/30 + 20**2/20
+    assert metrics["chi_square"] == pytest.approx(2 + 10 / 3 + 20)
+
+
+def test_identical_frames_score_perfectly():
+    frame = pd.DataFrame({"a": list("xxyyz") * 20, "b": list("pqpqp") * 20})
+    result = compute_fidelity_metrics(frame, frame.copy(), ["a", "b"])
+    assert result["summary"]["mean_total_variation_distance"] == 0.0
+    assert result["summary"]["mean_category_coverage"] == 1.0
+    assert result["summary"]["mean_association_similarity"] == pytest.approx(1.0)
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+import synthetic_data_pipeline
+from model_cache import ModelCache
+from synthetic_data_pipeline import SyntheticDataPipeline
+from training_scheduler import TrainingScheduler
+
+
+def test_cached_ctgan_does_not_keep_its_pipeline(tmp_path, monkeypatch):
+    scheduler = TrainingScheduler(state_dir=str(tmp_path / "slots"), max_concurrent=1, cpus=1)
+    monkeypatch.setattr(synthetic_data_pipeline, "get_default_scheduler", lambda: scheduler)
+    cache = ModelCache(cache_dir=str(tmp_path / "cache"), memory_items=2)
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({"a": rng.choice(["x", "y"], 200), "b": rng.choice(["p", "q", "r"], 200)})
+    pipeline = SyntheticDataPipeline("unused.csv", ["a", "b"], output_dir=str(tmp_path / "output"), model_cache=cache)
+    try:
+        pipeline.fit_synthesizer(data, epochs=1)
+    finally:
+        pipeline.close_logging()
+
+    key = pipeline.metadata["model_cache"]["key"]
+    assert cache.get(key).progress_callback is None
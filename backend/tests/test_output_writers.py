@@ -0,0 +1,52 @@
+import gzip
+
+import pandas as pd
+import pytest
+
+from output_writers import PartMerger, negotiate_format, open_chunk_writer
+
+COLUMNS = ["a", "b"]
+
+
+def _read(path: str, output_format: str) -> pd.DataFrame:
+    if output_format == "parquet":
+        return pd.read_parquet(path)
+    if output_format == "arrow":
+        import pyarrow as pa
+
+        with pa.memory_map(path) as source:
+            return pa.ipc.open_file(source).read_all().to_pandas()
+    with (gzip.open(path, "rt") if output_format == "csv.gz" else open(path)) as f:
+        return pd.read_csv(f, dtype=str, keep_default_na=False)
+
+
+@pytest.mark.parametrize("output_format", ["csv", "csv.gz", "parquet", "arrow"])
+def test_merged_parts_read_back_as_their_concatenation(tmp_path, output_format):
+    parts = [
+        pd.DataFrame({"a": [f"x{i}", f"y{i}"], "b": ["p", "q"]})
+        for i in range(3)
+    ]
+    paths = []
+    for index, part in enumerate(parts):
+        path = str(tmp_path / f"part_{index}")
+        writer = open_chunk_writer(path, COLUMNS, output_format, header=False)
+        writer.write(part.iloc[:1])
+        writer.write(part.iloc[1:])
+        writer.close()
+        paths.append(path)
+
+    output = str(tmp_path / "merged")
+    merger = PartMerger(output, COLUMNS, output_format)
+    for path in paths:
+        merger.append(path)
+    merger.close()
+
+    expected = pd.concat(parts, ignore_index=True)
+    pd.testing.assert_frame_equal(_read(output, output_format), expected, check_dtype=False)
+
+
+def test_negotiate_format_honours_q_values():
+    assert negotiate_format(None) == "csv"
+    assert negotiate_format("application/vnd.apache.parquet") == "parquet"
+    assert negotiate_format("application/gzip;q=0.5, application/vnd.apache.arrow.file;q=0.9") == "arrow"
+    assert negotiate_format("application/json") == "csv"
@@ -0,0 +1,61 @@
+import glob
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import synthetic_data_pipeline
+from synthetic_data_pipeline import SyntheticDataPipeline
+from training_scheduler import TrainingScheduler
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def run_pipeline(tmp_path, monkeypatch):
+    scheduler = TrainingScheduler(state_dir=str(tmp_path / "slots"), max_concurrent=1, cpus=1)
+    monkeypatch.setattr(synthetic_data_pipeline, "get_default_scheduler", lambda: scheduler)
+    # Every file of the run gets the same timestamp, as in a run that finishes within a second
+    monkeypatch.setattr(synthetic_data_pipeline, "datetime", FrozenDatetime)
+    rng = np.random.default_rng(0)
+    input_file = str(tmp_path / "data.csv")
+    pd.DataFrame({"a": rng.choice(["x", "y"], 200), "b": rng.choice(["p", "q", "r"], 200)}).to_csv(input_file, index=False)
+    output_dir = str(tmp_path / "output")
+
+    def run(**kwargs):
+        pipeline = SyntheticDataPipeline(input_file, ["a", "b"], output_dir=output_dir, engine="chow_liu", metrics_level=kwargs.pop("metrics_level", "basic"))
+        try:
+            pipeline.run_pipeline(num_samples=100, sample_workers=1, **kwargs)
+        finally:
+            pipeline.close_logging()
+        [metadata_file] = glob.glob(os.path.join(output_dir, "metadata_*.json"))
+        with open(metadata_file) as f:
+            return json.load(f)
+
+    return run
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_validation_metrics_reach_the_metadata_file(run_pipeline, stream):
+    metadata = run_pipeline(stream=stream)
+
+    assert metadata["validation_metrics"]["metrics_level"] == "basic"
+    assert metadata["num_samples"] == 100
+    assert metadata["training"]["engine"] == "chow_liu"
+
+
+@pytest.mark.parametrize("options", [{"metrics_level": "full"}, {"privacy_filter": "drop", "stream": True}])
+def test_privacy_summary_reaches_the_metadata_file(run_pipeline, options):
+    metadata = run_pipeline(**options)
+
+    privacy = metadata["validation_metrics"]["privacy"]
+    assert privacy["real_rows"] == 200
+    assert privacy["synthetic_rows_checked"] > 0
+    assert privacy["action"] == options.get("privacy_filter")
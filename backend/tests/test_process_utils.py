@@ -0,0 +1,11 @@
+import os
+
+from process_utils import pid_alive
+
+
+def test_pid_alive():
+    assert pid_alive(os.getpid())
+    assert not pid_alive(None)
+    assert not pid_alive(0)
+    assert not pid_alive(-1)
+    assert not pid_alive(2 ** 22 + 1)
@@ -0,0 +1,19 @@
+import json
+
+from training_scheduler import TrainingScheduler
+
+
+def test_state_reports_the_slot_held_by_a_fit(tmp_path):
+    scheduler = TrainingScheduler(state_dir=str(tmp_path), max_concurrent=2, cpus=2)
+    with scheduler.slot(label="ctgan:test") as slot:
+        state = scheduler.state()
+        assert state["running"] == 1
+        assert state["slots"][slot["slot"]]["holder"]["label"] == "ctgan:test"
+    assert scheduler.state()["running"] == 0
+
+
+def test_state_ignores_holders_of_dead_processes(tmp_path):
+    scheduler = TrainingScheduler(state_dir=str(tmp_path), max_concurrent=1, cpus=1)
+    with open(tmp_path / "slot_0.json", "w") as f:
+        json.dump({"pid": 2 ** 22 + 1, "label": "gone"}, f)
+    assert scheduler.state()["slots"] == [{"slot": 0, "busy": False, "holder": None}]
@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, fits are not coordinated across processes
+    fcntl = None
+
+from instrumentation import TRAINING_SLOT_WAIT_SECONDS
+from process_utils import pid_alive
+
+logger = logging.getLogger(__name__)
+
+SLOT_POLL_SECONDS = 0.5
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on, honouring affinity masks (e.g. container cpusets)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+@contextmanager
+def limit_threads(num_threads: int):
+    """Cap torch intra-op threads and BLAS/OpenMP pools for the duration of one fit."""
+    from threadpoolctl import threadpool_limits
+
+    torch = sys.modules.get("torch")
+    previous = torch.get_num_threads() if torch is not None else None
+    if torch is not None:
+        torch.set_num_threads(num_threads)
+    try:
+        with threadpool_limits(limits=num_threads):
+            yield
+    finally:
+        if torch is not None:
+            torch.set_num_threads(previous)
+
+
+class TrainingScheduler:
+    """Host-wide cap on concurrent fits, shared by every Gunicorn worker and job process.
+
+    Each of the ``max_concurrent`` slots is a lock file in ``state_dir``; a fit holds an
+    exclusive ``flock`` on one for its whole duration, so the kernel releases the slot even
+    if the process dies. A waiting fit holds a ticket file in ``waiting/`` named by its
+    arrival time, and only the oldest live ticket may take a free slot, so slots are
+    granted in arrival order. Each fit runs with ``cpus // max_concurrent`` torch and BLAS
+    threads so running fits never oversubscribe the cores.
+    """
+
+    def __init__(self, state_dir: Optional[str] = None, max_concurrent: Optional[int] = None, cpus: Optional[int] = None):
+        self.state_dir = os.path.abspath(state_dir or os.getenv("TRAINING_STATE_DIR", "/tmp/training_slots"))
+        self.cpus = cpus or available_cpus()
+        self.max_concurrent = max_concurrent or int(os.getenv("TRAINING_MAX_CONCURRENT", "0")) or max(1, self.cpus // 2)
+        self.threads_per_fit = max(1, self.cpus // self.max_concurrent)
+        self._waiting_dir = os.path.join(self.state_dir, "waiting")
+        os.makedirs(self._waiting_dir, exist_ok=True)
+
+    def _slot_path(self, index: int, suffix: str) -> str:
+        return os.path.join(self.state_dir, f"slot_{index}.{suffix}")
+
+    def _try_acquire(self):
+        for index in range(self.max_concurrent):
+            handle = open(self._slot_path(index, "lock"), 'a+')
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return index, handle
+            except BlockingIOError:
+                handle.close()
+        return None, None
+
+    def _waiters(self) -> List[tuple]:
+        """Tickets of queued fits as ``(file name, entry)``, oldest first; drops those of dead processes."""
+        waiters = []
+        for name in sorted(os.listdir(self._waiting_dir)):
+            if not name.endswith(".json"):
+                continue  # A ticket still being written
+            path = os.path.join(self._waiting_dir, name)
+            try:
+                with open(path) as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue  # Took a slot meanwhile
+            if not pid_alive(entry.get("pid")):
+                # Left behind by a process that died while queued
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            waiters.append((name, entry))
+        return waiters
+
+    @contextmanager
+    def slot(self, label: str = ""):
+        """Block until every earlier fit got a slot and one is free, then run the body with capped threads.
+
+        Yields a dict with the slot index, the seconds spent waiting and the thread count.
+        """
+        if fcntl is None:
+            with limit_threads(self.threads_per_fit):
+                yield {"slot": None, "waited_seconds": 0.0, "threads": self.threads_per_fit}
+            return
+
+        # Zero-padded arrival time first, so file names sort in ticket order
+        ticket = f"{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex}.json"
+        waiting_file = os.path.join(self._waiting_dir, ticket)
+        tmp_path = f"{waiting_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"pid": os.getpid(), "label": label, "since": datetime.now().isoformat(timespec="seconds")}, f)
+        os.replace(tmp_path, waiting_file)
+
+        start = time.monotonic()
+        queued = False
+        try:
+            while True:
+                # Only the oldest ticket may take a slot, so a newcomer cannot overtake the queue
+                if not any(name < ticket for name, _ in self._waiters()):
+                    index, handle = self._try_acquire()
+                    if handle is not None:
+                        break
+                if not queued:
+                    logger.info(f"No training slot free for {label}, queueing behind earlier fits")
+                    queued = True
+                time.sleep(SLOT_POLL_SECONDS)
+        finally:
+            os.unlink(waiting_file)
+        waited = time.monotonic() - start
+        TRAINING_SLOT_WAIT_SECONDS.observe(waited)
+
+        holder_file = self._slot_path(index, "json")
+        try:
+            # Written whole and renamed into place, since state() reads it without the lock
+            with open(f"{holder_file}.tmp", 'w') as f:
+                json.dump({
+                    "pid": os.getpid(),
+                    "label": label,
+                    "since": datetime.now().isoformat(timespec="seconds"),
+                    "threads": self.threads_per_fit
+                }, f)
+            os.replace(f"{holder_file}.tmp", holder_file)
+            logger.info(f"Training slot {index} acquired after {waited:.1f}s with {self.threads_per_fit} thread(s)")
+            with limit_threads(self.threads_per_fit):
+                yield {"slot": index, "waited_seconds": round(waited, 3), "threads": self.threads_per_fit}
+        finally:
+            try:
+                os.unlink(holder_file)
+            except FileNotFoundError:
+                pass
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+    def state(self) -> Dict:
+        """Which slots are busy, by whom, and who is queued; readable from any process."""
+        slots = []
+        for index in range(self.max_concurrent):
+            # Read from the holder file only: probing the lock could make a real fit skip a free slot
+            try:
+                with open(self._slot_path(index, "json")) as f:
+                    holder = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                holder = None
+            if holder is not None and not pid_alive(holder.get("pid")):
+                holder = None  # Left behind by a fit whose process died
+            slots.append({"slot": index, "busy": holder is not None, "holder": holder})
+
+        waiting = [entry for _, entry in self._waiters()]
+        return {
+            "cpus": self.cpus,
+            "max_concurrent_fits": self.max_concurrent,
+            "threads_per_fit": self.threads_per_fit,
+            "running": sum(s["busy"] for s in slots),
+            "queued": len(waiting),
+            "slots": slots,
+            "waiting": waiting
+        }
+
+
+_default_scheduler = None
+
+
+def get_default_scheduler() -> TrainingScheduler:
+    """Process-wide scheduler configured from the environment."""
+    global _default_scheduler
+    if _default_scheduler is None:
+        _default_scheduler = TrainingScheduler()
+    return _default_scheduler
@@ -4,6 +4,17 @@ import { motion } from "framer-motion";
 import GlassmorphismButton from "./components/GlassmorphismButton";
 import { ApiContext } from "./ApiContext";
 
+// Matches the backend's PROFILE_SAMPLE_BYTES: only this much of the file is profiled
+const PROFILE_SAMPLE_BYTES = 2 * 1024 * 1024;
+
+const columnHint = (profile) => {
+  if (profile.id_like) {
+    return "ID-like";
+  }
+  const nulls = profile.null_fraction > 0 ? `, ${Math.round(profile.null_fraction * 100)}% null` : "";
+  return `~${profile.approx_cardinality.toLocaleString()} values${nulls}`;
+};
+
 const UploadForm = () => {
   const {
     apiUrl,
@@ -18,9 +29,11 @@ const UploadForm = () => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
   const [uploadProgress, setUploadProgress] = useState(0);
+  const [progressMessage, setProgressMessage] = useState("");
   const [validationError, setValidationError] = useState("");
   const [availableColumns, setAvailableColumns] = useState([]);
   const [selectedColumns, setSelectedColumns] = useState([]);
+  const [columnProfiles, setColumnProfiles] = useState({});
   const [serverStatus, setServerStatus] = useState("checking");
 
   useEffect(() => {
@@ -36,21 +49,43 @@ const UploadForm = () => {
     }
   }, [contextServerStatus, usingFallback, loading]);
 
-  const handleFileChange = (e) => {
+  const readHeader = async (file) => {
+    const head = await file.slice(0, 64 * 1024).text();
+    return head.split("\n")[0].split(",").map((header) => header.trim());
+  };
+
+  const handleFileChange = async (e) => {
     const file = e.target.files[0];
     setFile(file);
+    setAvailableColumns([]);
+    setColumnProfiles({});
+    setSelectedColumns([]);
+    setCategoricalColumns("");
+    if (!file) {
+      return;
+    }
 
-    if (file) {
-      const reader = new FileReader();
-      reader.onload = (event) => {
-        const csvContent = event.target.result;
-        const firstLine = csvContent.split("\n")[0];
-        const headers = firstLine.split(",").map((header) => header.trim());
-        setAvailableColumns(headers);
-        setSelectedColumns([]);
-        setCategoricalColumns("");
-      };
-      reader.readAsText(file);
+    // Only the head of the file goes to the server; total_bytes lets it scale row counts
+    const formData = new FormData();
+    formData.append("file", file.slice(0, PROFILE_SAMPLE_BYTES), file.name);
+    formData.append("total_bytes", file.size);
+    try {
+      const response = await axios.post(`${apiUrl}/profile`, formData, {
+        headers: {
+          "Content-Type": "multipart/form-data",
+        },
+      });
+      const profiles = {};
+      response.data.columns.forEach((profile) => {
+        profiles[profile.name] = profile;
+      });
+      setColumnProfiles(profiles);
+      setAvailableColumns(response.data.columns.map((profile) => profile.name));
+      setSelectedColumns(response.data.suggested_columns);
+      setCategoricalColumns(response.data.suggested_columns.join(","));
+    } catch (error) {
+      console.error("Profiling failed, falling back to the header row:", error);
+      setAvailableColumns(await readHeader(file));
     }
   };
 
@@ -83,6 +118,47 @@ const UploadForm = () => {
     return true;
   };
 
+  // Follows the job's Server-Sent Events until it completes or fails
+  const followJob = (jobId) =>
+    new Promise((resolve, reject) => {
+      const source = new EventSource(`${apiUrl}/jobs/${jobId}/events`);
+      source.addEventListener("fit", (event) => {
+        const fit = JSON.parse(event.data);
+        if (fit.status === "waiting") {
+          setProgressMessage("Waiting for a free training slot...");
+        } else if (fit.status === "started") {
+          setProgressMessage("Training model...");
+        }
+      });
+      source.addEventListener("epoch", (event) => {
+        const epoch = JSON.parse(event.data);
+        setProgressMessage(
+          `Training epoch ${epoch.epoch}/${epoch.max_epochs}, about ${Math.round(epoch.eta_seconds)}s left`
+        );
+      });
+      source.addEventListener("sample", (event) => {
+        const sample = JSON.parse(event.data);
+        setProgressMessage(`Generated ${sample.rows_done} of ${sample.rows_total} rows`);
+      });
+      source.addEventListener("end", (event) => {
+        source.close();
+        const status = JSON.parse(event.data);
+        if (status.status === "completed") {
+          resolve();
+        } else {
+          const failure = new Error(status.error || "Error generating synthetic data");
+          failure.jobFailed = true;
+          reject(failure);
+        }
+      });
+      source.onerror = () => {
+        // The browser reconnects on its own unless the stream was closed for good
+        if (source.readyState === EventSource.CLOSED) {
+          reject(new Error("Lost connection to the server"));
+        }
+      };
+    });
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     if (serverStatus !== "online") {
@@ -94,6 +170,7 @@ const UploadForm = () => {
     setValidationError("");
     setDownloadLink("");
     setUploadProgress(0);
+    setProgressMessage("");
     
     // Tell context we're processing - prevents status changes
     setProcessing(true);
@@ -110,8 +187,8 @@ const UploadForm = () => {
     formData.append("num_samples", numSamples);
 
     try {
-      const response = await axios.post(`${apiUrl}/generate`, formData, {
-        responseType: "blob",
+      // Queue the job, follow its progress, then download the result
+      const response = await axios.post(`${apiUrl}/jobs`, formData, {
         headers: {
           "Content-Type": "multipart/form-data",
         },
@@ -122,22 +199,19 @@ const UploadForm = () => {
           setUploadProgress(progress);
         },
       });
+      setProgressMessage("Queued...");
+      await followJob(response.data.job_id);
 
-      const contentType = response.headers["content-type"];
-      if (contentType && contentType.includes("application/json")) {
-        const reader = new FileReader();
-        reader.onload = () => {
-          const errorData = JSON.parse(reader.result);
-          setError(errorData.error || "Unknown error occurred");
-        };
-        reader.readAsText(response.data);
-      } else {
-        const url = window.URL.createObjectURL(new Blob([response.data]));
-        setDownloadLink(url);
-      }
+      const result = await axios.get(`${apiUrl}${response.data.result_url}`, {
+        responseType: "blob",
+      });
+      const url = window.URL.createObjectURL(new Blob([result.data]));
+      setDownloadLink(url);
     } catch (error) {
       console.error("Error:", error);
-      if (error.response?.data instanceof Blob) {
+      if (error.jobFailed || !error.response) {
+        setError(error.message || "Error generating synthetic data");
+      } else if (error.response.data instanceof Blob) {
         const reader = new FileReader();
         reader.onload = () => {
           try {
@@ -156,6 +230,7 @@ const UploadForm = () => {
     } finally {
       setLoading(false);
       setUploadProgress(0);
+      setProgressMessage("");
       // Tell context we're done processing
       setProcessing(false);
     }
@@ -278,6 +353,11 @@ const UploadForm = () => {
                     />
                     <label
                       htmlFor={column}
+                      title={
+                        columnProfiles[column]
+                          ? `${columnProfiles[column].inferred_type}, ~${columnProfiles[column].ctgan_fit_seconds}s of training`
+                          : undefined
+                      }
                       className={`cursor-pointer text-sm text-white py-2 px-4 rounded-lg transition-all duration-300 ${
                         selectedColumns.includes(column)
                           ? "bg-violet-600 glow-effect"
@@ -285,6 +365,11 @@ const UploadForm = () => {
                       }`}
                     >
                       {column}
+                      {columnProfiles[column] && (
+                        <span className="ml-2 text-xs text-gray-300">
+                          {columnHint(columnProfiles[column])}
+                        </span>
+                      )}
                     </label>
                   </motion.div>
                 ))}
@@ -330,6 +415,10 @@ const UploadForm = () => {
           </motion.div>
         )}
 
+        {loading && progressMessage && (
+          <p className="text-sm text-center mt-6 text-white">{progressMessage}</p>
+        )}
+
         {error && (
           <motion.div
             className="mt-6 p-4 bg-red-500/10 border border-red-500/50 rounded-lg text-red-400 text-center"